@@ -16,9 +16,8 @@ csrf = CSRFProtect()
 limiter = Limiter(key_func=get_remote_address, default_limits=["200 per day", "50 per hour"])
 redis_client = None
 
-def create_app():
-    app = Flask(__name__)
-    
+def _configure_app(app):
+    """Configuration, extensions, Redis and ORM listeners shared by every app mode"""
     # Secure SECRET_KEY configuration
     secret_key = os.environ.get('SECRET_KEY')
     if not secret_key:
@@ -52,6 +51,23 @@ def create_app():
     app.config['RATELIMIT_STRATEGY'] = 'fixed-window'
     app.config['RATELIMIT_HEADERS_ENABLED'] = True
     
+    # Analytics response cache (Redis, falls back to an in-process LRU)
+    app.config['RESPONSE_CACHE_ENABLED'] = os.environ.get('RESPONSE_CACHE_ENABLED', 'true').lower() == 'true'
+    app.config['RESPONSE_CACHE_TTL'] = int(os.environ.get('RESPONSE_CACHE_TTL', 300))
+    
+    # Run scheduled jobs inside this process instead of a dedicated scheduler process
+    app.config['RUN_SCHEDULER'] = os.environ.get('RUN_SCHEDULER', 'false').lower() == 'true'
+    
+    # Background OCR worker threads per process (0 disables them)
+    app.config['OCR_WORKERS'] = int(os.environ.get('OCR_WORKERS', 1))
+    
+    # Insight jobs: users per shard and shards evaluated concurrently
+    app.config['INSIGHT_SHARD_SIZE'] = int(os.environ.get('INSIGHT_SHARD_SIZE', 500))
+    app.config['INSIGHT_WORKERS'] = int(os.environ.get('INSIGHT_WORKERS', 4))
+    
+    # Bearer token for Prometheus scrapes of /api/admin/metrics (unset: admin session only)
+    app.config['METRICS_TOKEN'] = os.environ.get('METRICS_TOKEN')
+    
     # Initialize extensions
     db.init_app(app)
     bcrypt.init_app(app)
@@ -69,6 +85,38 @@ def create_app():
         print(f"Redis connection failed: {e}")
         redis_client = None
     
+    # Keep daily spend/income rollups in sync with every ORM flush
+    from app.rollups import register_rollup_listeners
+    register_rollup_listeners()
+    
+    # Keep the recurring/subscription pattern index in sync with every ORM flush
+    from app.patterns import register_pattern_listeners
+    register_pattern_listeners()
+    
+    # Classify expense descriptions (want/need, small purchase, service) as they are written
+    from app.expense_classifier import register_classifier_listeners
+    register_classifier_listeners()
+    
+    # Invalidate cached analytics responses when a user's data changes
+    from app.cache import register_cache_listeners
+    register_cache_listeners()
+
+
+def create_worker_app():
+    """
+    Lightweight app for background workers (scheduler jobs)
+    Skips blueprints, request hooks, schema creation and migrations, which the
+    web app owns; only configuration, extensions and ORM listeners are set up
+    """
+    app = Flask(__name__)
+    _configure_app(app)
+    return app
+
+
+def create_app():
+    app = Flask(__name__)
+    _configure_app(app)
+    
     # Create upload directories
     os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
     os.makedirs(os.path.join(app.config['UPLOAD_FOLDER'], 'documents'), exist_ok=True)
@@ -266,10 +314,32 @@ def create_app():
         
         # Run migrations for existing databases
         run_migrations()
+        
+        # Populate rollup tables for databases created before they existed
+        from app.rollups import ensure_populated
+        ensure_populated()
+        
+        # Index recent expenses for pattern detection on databases that predate the index
+        from app import patterns
+        patterns.ensure_populated()
+        
+        # (Re)classify expenses stored before the columns existed or under older rules
+        from app import expense_classifier
+        expense_classifier.ensure_current()
+        
+        # Full-text search index (FTS5 tables and triggers, or PostgreSQL GIN indexes)
+        from app import search_index
+        search_index.ensure_index()
     
-    # Initialize scheduler for recurring expenses
-    from app.scheduler import init_scheduler
-    init_scheduler(app)
+    # Background jobs run in the dedicated scheduler process (python -m app.scheduler);
+    # RUN_SCHEDULER=true runs them in-process instead (single-process deployments)
+    if app.config['RUN_SCHEDULER']:
+        from app.scheduler import init_scheduler
+        init_scheduler(app)
+    
+    # Start background OCR workers
+    from app.ocr_queue import start_workers
+    start_workers(app)
     
     return app
 
@@ -354,6 +424,55 @@ def run_migrations():
             conn.commit()
             print("Migration: Security notifications preference added successfully")
 
+    # Idempotency keys for entries auto-created from recurring expenses/income
+    for table in ('expenses', 'income'):
+        if table not in inspector.get_table_names():
+            continue
+        table_columns = [col['name'] for col in inspector.get_columns(table)]
+        if 'recurring_key' not in table_columns:
+            print(f"Migration: Adding 'recurring_key' column to {table} table...")
+            with engine.connect() as conn:
+                conn.execute(db.text(f"ALTER TABLE {table} ADD COLUMN recurring_key VARCHAR(64)"))
+                conn.commit()
+
+    # Description-derived classification columns (filled in by expense_classifier.ensure_current)
+    if 'expenses' in inspector.get_table_names():
+        expense_columns = [col['name'] for col in inspector.get_columns('expenses')]
+        for column, column_type in (
+            ('description_key', 'VARCHAR(200)'),
+            ('spend_class', 'VARCHAR(10)'),
+            ('small_purchase_type', 'VARCHAR(30)'),
+            ('service_name', 'VARCHAR(50)'),
+            ('impulse_keyword', 'BOOLEAN'),
+            ('classification_version', 'VARCHAR(16)'),
+        ):
+            if column not in expense_columns:
+                print(f"Migration: Adding '{column}' column to expenses table...")
+                with engine.connect() as conn:
+                    conn.execute(db.text(f"ALTER TABLE expenses ADD COLUMN {column} {column_type}"))
+                    conn.commit()
+
+    # Last day evaluated by the nightly no-spend check (lets it backfill missed days)
+    if 'user_gamification_stats' in inspector.get_table_names():
+        stats_columns = [col['name'] for col in inspector.get_columns('user_gamification_stats')]
+        if 'last_no_spend_check' not in stats_columns:
+            print("Migration: Adding 'last_no_spend_check' column to user_gamification_stats table...")
+            with engine.connect() as conn:
+                conn.execute(db.text("ALTER TABLE user_gamification_stats ADD COLUMN last_no_spend_check DATE"))
+                conn.commit()
+
+    # Create indexes declared on the models that are missing from existing tables
+    # (db.create_all() only creates indexes together with new tables)
+    table_names = inspector.get_table_names()
+    for table in db.metadata.sorted_tables:
+        if table.name not in table_names:
+            continue
+        existing_indexes = {idx['name'] for idx in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing_indexes:
+                print(f"Migration: Creating index '{index.name}' on {table.name}...")
+                index.create(bind=engine, checkfirst=True)
+
 
 from app.models import User
 
@@ -0,0 +1,295 @@
+"""
+SQL aggregation helpers for per-user expense and income totals
+Computes sums/counts in the database instead of loading ORM rows into Python.
+Whole days inside a window are read from the daily rollup tables (app/rollups.py);
+only the partial days at the window edges touch raw expense/income rows.
+Security: Every helper takes an explicit user_id (or list of ids) and filters on it
+"""
+from app import db
+from app.models import Expense, Income, Category, DailySpendRollup, DailyIncomeRollup
+from sqlalchemy import func, extract, true
+from datetime import datetime, date, time, timedelta
+from collections import namedtuple, defaultdict
+
+# Lightweight result rows (no ORM instances are materialized)
+CategoryTotal = namedtuple('CategoryTotal', ['category_id', 'name', 'color', 'icon', 'total', 'count'])
+SourceTotal = namedtuple('SourceTotal', ['source', 'total', 'count'])
+
+# Pass as user_id to aggregate over every user (scheduled jobs only)
+ALL_USERS = object()
+
+ROLLUP_TABLES = {
+    Expense: DailySpendRollup,
+    Income: DailyIncomeRollup,
+}
+
+
+def _user_filter(column, user_id):
+    """A single user id, a list of ids or ALL_USERS for the per-user batch helpers"""
+    if user_id is ALL_USERS:
+        return true()
+    if isinstance(user_id, (list, tuple, set)):
+        return column.in_(list(user_id))
+    return column == user_id
+
+
+def _window_filters(model, user_id, start=None, end=None, inclusive_end=False, category_id=None):
+    """Build the user/date window filters shared by all aggregates"""
+    filters = [_user_filter(model.user_id, user_id)]
+    if start is not None:
+        filters.append(model.date >= start)
+    if end is not None:
+        filters.append(model.date <= end if inclusive_end else model.date < end)
+    if category_id is not None:
+        filters.append(model.category_id == category_id)
+    return filters
+
+
+def _as_date(value):
+    """SQLite returns DATE() as a string, other backends as a date"""
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return datetime.strptime(value, '%Y-%m-%d').date()
+
+
+def _as_datetime(value):
+    if value is None or isinstance(value, datetime):
+        return value
+    return datetime.combine(value, time.min)
+
+
+def _split_window(start, end, inclusive_end=False):
+    """
+    Split a window into whole days (served by the rollups) and partial-day edges
+    Returns: (days, raw_windows) where days is (first_day, end_day) meaning
+    first_day <= day < end_day (either bound may be None), or None when the
+    window contains no whole day; raw_windows is a list of (start, end, inclusive_end)
+    """
+    start, end = _as_datetime(start), _as_datetime(end)
+
+    first_day = None
+    if start is not None:
+        first_day = start.date() if start.time() == time.min else start.date() + timedelta(days=1)
+    end_day = end.date() if end is not None else None
+
+    if first_day is not None and end_day is not None and first_day >= end_day:
+        return None, [(start, end, inclusive_end)]
+
+    raw_windows = []
+    if start is not None and start.time() != time.min:
+        raw_windows.append((start, datetime.combine(first_day, time.min), False))
+    if end is not None:
+        tail_start = datetime.combine(end_day, time.min)
+        if end > tail_start or inclusive_end:
+            raw_windows.append((tail_start, end, inclusive_end))
+    return (first_day, end_day), raw_windows
+
+
+def _group_expression(name, source, date_col, is_rollup):
+    if name == 'day':
+        return date_col if is_rollup else func.date(date_col)
+    if name in ('year', 'month'):
+        return extract(name, date_col)
+    return getattr(source, name)
+
+
+def _normalize_key(name, value):
+    if value is None:
+        return None
+    if name == 'day':
+        return _as_date(value)
+    if name in ('year', 'month'):
+        return int(value)
+    return value
+
+
+def _collect(model, user_id, start=None, end=None, inclusive_end=False, category_id=None, group_by=()):
+    """
+    Sum and count rows per group, combining rollup days with raw partial-day edges
+    group_by: names from 'day', 'year', 'month', 'category_id', 'source', 'user_id'
+    Returns: {group key tuple: [total, count]}
+    """
+    results = defaultdict(lambda: [0.0, 0])
+    days, raw_windows = _split_window(start, end, inclusive_end)
+
+    def accumulate(query):
+        for row in query.all():
+            key = tuple(_normalize_key(name, value) for name, value in zip(group_by, row[2:]))
+            results[key][0] += float(row[0] or 0)
+            results[key][1] += int(row[1] or 0)
+
+    if days is not None:
+        rollup = ROLLUP_TABLES[model]
+        groups = [_group_expression(name, rollup, rollup.day, True) for name in group_by]
+        query = db.session.query(
+            func.sum(rollup.total), func.sum(rollup.count), *groups
+        ).filter(_user_filter(rollup.user_id, user_id))
+        first_day, end_day = days
+        if first_day is not None:
+            query = query.filter(rollup.day >= first_day)
+        if end_day is not None:
+            query = query.filter(rollup.day < end_day)
+        if category_id is not None:
+            query = query.filter(rollup.category_id == category_id)
+        if groups:
+            query = query.group_by(*groups)
+        accumulate(query)
+
+    for raw_start, raw_end, raw_inclusive in raw_windows:
+        groups = [_group_expression(name, model, model.date, False) for name in group_by]
+        query = db.session.query(
+            func.sum(model.amount), func.count(model.id), *groups
+        ).filter(*_window_filters(model, user_id, raw_start, raw_end, raw_inclusive, category_id))
+        if groups:
+            query = query.group_by(*groups)
+        accumulate(query)
+
+    # Ungrouped aggregates over an empty window still return one (NULL, 0) row
+    return {key: value for key, value in results.items() if value[1]}
+
+
+def window_total(model, user_id, start=None, end=None, inclusive_end=False, category_id=None):
+    """Sum of amounts for a user over [start, end)"""
+    totals = _collect(model, user_id, start, end, inclusive_end, category_id)
+    return totals[()][0] if () in totals else 0.0
+
+
+def window_count(model, user_id, start=None, end=None, inclusive_end=False, category_id=None):
+    """Number of rows for a user over [start, end)"""
+    totals = _collect(model, user_id, start, end, inclusive_end, category_id)
+    return totals[()][1] if () in totals else 0
+
+
+def monthly_totals(model, user_id, year):
+    """
+    Totals per month for a calendar year
+    Returns: {month_num: total} with all 12 months present
+    """
+    totals = {month_num: 0.0 for month_num in range(1, 13)}
+    rows = _collect(model, user_id, datetime(year, 1, 1), datetime(year + 1, 1, 1), group_by=('month',))
+    for (month,), (total, _) in rows.items():
+        if month is not None:
+            totals[month] = total
+    return totals
+
+
+def category_spending(user_id, start=None, end=None, category_ids=None):
+    """
+    Expense totals per category
+    Returns: {category_id: total}
+    """
+    if category_ids is not None and not category_ids:
+        return {}
+
+    rows = _collect(Expense, user_id, start, end, group_by=('category_id',))
+    totals = {category_id: total for (category_id,), (total, _) in rows.items()}
+
+    if category_ids is not None:
+        wanted = set(category_ids)
+        totals = {category_id: total for category_id, total in totals.items() if category_id in wanted}
+    return totals
+
+
+def category_breakdown(user_id, start=None, end=None, inclusive_end=False, category_id=None):
+    """
+    Expense totals per category with display info, largest first
+    Returns: [CategoryTotal]; name/color/icon are None for orphaned category ids
+    """
+    rows = _collect(Expense, user_id, start, end, inclusive_end, category_id, group_by=('category_id',))
+    if not rows:
+        return []
+
+    info = _category_info(key[0] for key in rows)
+    totals = [_category_total(cat_id, info, total, count) for (cat_id,), (total, count) in rows.items()]
+    totals.sort(key=lambda x: x.total, reverse=True)
+    return totals
+
+
+def _category_info(category_ids):
+    return {
+        cat.id: cat for cat in db.session.query(
+            Category.id, Category.name, Category.color, Category.icon
+        ).filter(Category.id.in_(list(set(category_ids)))).all()
+    }
+
+
+def _category_total(cat_id, info, total, count):
+    cat = info.get(cat_id)
+    return CategoryTotal(
+        cat_id,
+        cat.name if cat else None,
+        cat.color if cat else None,
+        cat.icon if cat else None,
+        total,
+        count
+    )
+
+
+def totals_by_user(model, user_ids, start=None, end=None, inclusive_end=False):
+    """
+    Sum and count for many users in one grouped query
+    Returns: {user_id: (total, count)} for users that have rows
+    """
+    rows = _collect(model, list(user_ids), start, end, inclusive_end, group_by=('user_id',))
+    return {user_id: (total, count) for (user_id,), (total, count) in rows.items()}
+
+
+def daily_totals_by_user(model, user_ids, start, end, inclusive_end=False):
+    """
+    Totals per user and calendar day, for a list of user ids or ALL_USERS
+    Returns: {(user_id, date): total} for days that have rows
+    """
+    if user_ids is not ALL_USERS:
+        user_ids = list(user_ids)
+    rows = _collect(model, user_ids, start, end, inclusive_end, group_by=('user_id', 'day'))
+    return {(user_id, day): total for (user_id, day), (total, _) in rows.items() if day is not None}
+
+
+def category_breakdown_by_user(user_ids, start=None, end=None, inclusive_end=False):
+    """
+    category_breakdown() for many users in one grouped query
+    Returns: {user_id: [CategoryTotal]} largest first, for users that have rows
+    """
+    rows = _collect(Expense, list(user_ids), start, end, inclusive_end, group_by=('user_id', 'category_id'))
+    if not rows:
+        return {}
+
+    info = _category_info(key[1] for key in rows)
+    breakdown = defaultdict(list)
+    for (user_id, cat_id), (total, count) in rows.items():
+        breakdown[user_id].append(_category_total(cat_id, info, total, count))
+    for totals in breakdown.values():
+        totals.sort(key=lambda x: x.total, reverse=True)
+    return dict(breakdown)
+
+
+def daily_series(model, user_id, start, end, inclusive_end=False):
+    """
+    Totals per calendar day
+    Returns: {date: total} for days that have rows
+    """
+    rows = _collect(model, user_id, start, end, inclusive_end, group_by=('day',))
+    return {day: total for (day,), (total, _) in rows.items() if day is not None}
+
+
+def monthly_series(model, user_id, start=None, end=None, inclusive_end=False):
+    """
+    Totals per calendar month across years
+    Returns: {'YYYY-MM': total} in chronological order, for months that have rows
+    """
+    rows = _collect(model, user_id, start, end, inclusive_end, group_by=('year', 'month'))
+    months = sorted((key, total) for key, (total, _) in rows.items() if key[0] is not None)
+    return {f"{year:04d}-{month:02d}": total for (year, month), total in months}
+
+
+def income_source_breakdown(user_id, start=None, end=None, inclusive_end=False):
+    """
+    Income totals per source, largest first
+    Returns: [SourceTotal]
+    """
+    rows = _collect(Income, user_id, start, end, inclusive_end, group_by=('source',))
+    totals = [SourceTotal(source, total, count) for (source,), (total, count) in rows.items()]
+    totals.sort(key=lambda x: x.total, reverse=True)
+    return totals
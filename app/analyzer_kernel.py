@@ -0,0 +1,272 @@
+"""
+Columnar analytics kernel for the spending analyzer
+A user's expenses for the analyzed window are loaded once per request as
+NumPy column arrays, so the analyzer endpoints reduce to vectorized masks
+and sums instead of substring loops over every expense. Description keyword
+facts (want/need, small purchase type, impulse keywords) are read from the
+columns expense_classifier stores at write time; only category names are
+classified here (memoized across requests).
+Security: All queries filtered by user_id
+"""
+from app import db
+from app.models import Expense, Category
+from flask import g
+from collections import namedtuple
+from datetime import datetime, timedelta
+from functools import lru_cache
+import numpy as np
+
+# Categories that are typically "wants" vs "needs"
+WANTS_CATEGORIES = [
+    'entertainment', 'gaming', 'streaming', 'subscriptions', 'hobbies',
+    'shopping', 'fashion', 'clothing', 'accessories', 'jewelry',
+    'dining out', 'restaurants', 'fast food', 'coffee', 'takeaway',
+    'alcohol', 'tobacco', 'vaping', 'leisure', 'sports', 'gym',
+    'beauty', 'cosmetics', 'spa', 'wellness', 'luxury',
+    'gadgets', 'electronics', 'tech', 'gifts', 'donations',
+    'travel', 'vacation', 'holidays'
+]
+
+NEEDS_CATEGORIES = [
+    'groceries', 'food', 'supermarket', 'rent', 'mortgage', 'housing',
+    'utilities', 'electricity', 'gas', 'water', 'internet', 'phone',
+    'insurance', 'health', 'medical', 'healthcare', 'pharmacy',
+    'transportation', 'fuel', 'petrol', 'gas station', 'public transit',
+    'education', 'childcare', 'school', 'tuition', 'savings',
+    'debt', 'loan', 'bills'
+]
+
+# Small purchase patterns that add up
+SMALL_PURCHASE_PATTERNS = {
+    'coffee': {
+        'patterns': ['coffee', 'starbucks', 'costa', 'nero', 'pret', 'cafe', 'espresso', 'latte', 'cappuccino', 'tim hortons', 'dunkin'],
+        'icon': 'coffee',
+        'typical_yearly_key': 'analyzer.pattern.coffee.typicalYearly',
+        'name_key': 'analyzer.pattern.coffee.name'
+    },
+    'snacks': {
+        'patterns': ['snack', 'candy', 'chocolate', 'crisps', 'chips', 'sweets', 'vending', 'convenience'],
+        'icon': 'cookie',
+        'typical_yearly_key': 'analyzer.pattern.snacks.typicalYearly',
+        'name_key': 'analyzer.pattern.snacks.name'
+    },
+    'takeaway': {
+        'patterns': ['deliveroo', 'uber eats', 'just eat', 'doordash', 'grubhub', 'takeaway', 'takeout', 'delivery'],
+        'icon': 'delivery_dining',
+        'typical_yearly_key': 'analyzer.pattern.takeaway.typicalYearly',
+        'name_key': 'analyzer.pattern.takeaway.name'
+    },
+    'fast_food': {
+        'patterns': ['mcdonald', 'burger king', 'kfc', 'wendy', 'taco bell', 'subway', 'chipotle', 'five guys', 'nando', 'greggs'],
+        'icon': 'fastfood',
+        'typical_yearly_key': 'analyzer.pattern.fastFood.typicalYearly',
+        'name_key': 'analyzer.pattern.fastFood.name'
+    },
+    'drinks': {
+        'patterns': ['pub', 'bar', 'beer', 'wine', 'spirits', 'alcohol', 'cocktail', 'nightclub'],
+        'icon': 'local_bar',
+        'typical_yearly_key': 'analyzer.pattern.drinks.typicalYearly',
+        'name_key': 'analyzer.pattern.drinks.name'
+    },
+    'lottery': {
+        'patterns': ['lottery', 'lotto', 'scratch', 'betting', 'gambling', 'casino', 'bet365', 'ladbrokes', 'william hill'],
+        'icon': 'casino',
+        'typical_yearly_key': 'analyzer.pattern.lottery.typicalYearly',
+        'name_key': 'analyzer.pattern.lottery.name'
+    },
+    'streaming': {
+        'patterns': ['netflix', 'spotify', 'disney', 'hulu', 'prime video', 'youtube premium', 'apple music'],
+        'icon': 'subscriptions',
+        'typical_yearly_key': 'analyzer.pattern.streaming.typicalYearly',
+        'name_key': 'analyzer.pattern.streaming.name'
+    },
+    'impulse_online': {
+        'patterns': ['amazon', 'ebay', 'aliexpress', 'wish', 'shein', 'asos', 'zalando'],
+        'icon': 'shopping_cart',
+        'typical_yearly_key': 'analyzer.pattern.impulseOnline.typicalYearly',
+        'name_key': 'analyzer.pattern.impulseOnline.name'
+    },
+    'bottled_drinks': {
+        'patterns': ['water bottle', 'soft drink', 'soda', 'energy drink', 'red bull', 'monster', 'lucozade', 'coca cola'],
+        'icon': 'local_drink',
+        'typical_yearly_key': 'analyzer.pattern.bottledDrinks.typicalYearly',
+        'name_key': 'analyzer.pattern.bottledDrinks.name'
+    },
+    'apps_games': {
+        'patterns': ['app store', 'google play', 'in-app', 'game purchase', 'steam', 'playstation store', 'xbox'],
+        'icon': 'sports_esports',
+        'typical_yearly_key': 'analyzer.pattern.appsGames.typicalYearly',
+        'name_key': 'analyzer.pattern.appsGames.name'
+    }
+}
+
+IMPULSE_KEYWORDS = ['amazon', 'ebay', 'online', 'shopping', 'fashion', 'sale', 'clearance', 'deal']
+
+SMALL_PURCHASE_TYPES = list(SMALL_PURCHASE_PATTERNS)
+SMALL_PURCHASE_CODES = {purchase_type: code for code, purchase_type in enumerate(SMALL_PURCHASE_TYPES)}
+NO_SMALL_PURCHASE = -1
+
+# Expense type codes, in the order of ExpenseFrame.type_totals()
+WANT, NEED, NEUTRAL = 0, 1, 2
+
+DAY_NAMES = ('Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday')
+
+# Impulse scoring: more than BUSY_DAY_PURCHASES on a day, weekends, small amounts, keywords
+BUSY_DAY_PURCHASES = 3
+SMALL_AMOUNT = 30
+IMPULSE_THRESHOLD = 1.5
+IMPULSE_REASONS = ('multiple_same_day', 'weekend', 'small_amount', 'impulse_keywords')
+
+TextClass = namedtuple('TextClass', 'want need small_type impulse_keyword')
+SmallPurchaseGroup = namedtuple('SmallPurchaseGroup', 'type count total rows')
+
+
+@lru_cache(maxsize=8192)
+def classify_text(text):
+    """Keyword classification of one description or category name"""
+    lower = text.lower() if text else ''
+    small_type = NO_SMALL_PURCHASE
+    for code, purchase_type in enumerate(SMALL_PURCHASE_TYPES):
+        if any(pattern in lower for pattern in SMALL_PURCHASE_PATTERNS[purchase_type]['patterns']):
+            small_type = code
+            break
+    return TextClass(
+        want=any(want in lower for want in WANTS_CATEGORIES),
+        need=any(need in lower for need in NEEDS_CATEGORIES),
+        small_type=small_type,
+        impulse_keyword=any(keyword in lower for keyword in IMPULSE_KEYWORDS)
+    )
+
+
+def _codes(values):
+    """Index of each value in its list of distinct values (first-seen order)"""
+    distinct = {}
+    codes = np.fromiter((distinct.setdefault(v, len(distinct)) for v in values), dtype=np.int64, count=len(values))
+    return codes, list(distinct)
+
+
+def _column(distinct, field, dtype):
+    return np.array([getattr(classify_text(v), field) for v in distinct], dtype=dtype)
+
+
+def total(amounts):
+    """
+    Sum of an amount column, added in row order like sum() so rounded totals
+    never differ by a cent from a per-row loop (0 for an empty selection)
+    """
+    return sum(amounts.tolist())
+
+
+class ExpenseFrame:
+    """
+    One user's expenses in a window as column arrays, ordered by (date, id)
+    Row-level details (descriptions, dates, category names) stay in plain
+    lists and are only touched for the rows an endpoint returns
+    """
+
+    def __init__(self, rows, days):
+        self.days = days
+        self.size = len(rows)
+        self.ids = [row.id for row in rows]
+        self.dates = [row.date for row in rows]
+        self.descriptions = [row.description for row in rows]
+        spend_classes = [row.spend_class for row in rows]
+        self.category_names = [row.category_name for row in rows]
+        self.category_colors = [row.category_color for row in rows]
+        self.amounts = np.fromiter((row.amount for row in rows), dtype=np.float64, count=self.size)
+
+        day_numbers = np.fromiter((d.toordinal() for d in self.dates), dtype=np.int64, count=self.size)
+        self.weekdays = (day_numbers - 1) % 7  # date.toordinal() 1 was a Monday
+        _, day_index, per_day = np.unique(day_numbers, return_inverse=True, return_counts=True)
+        self.purchases_that_day = per_day[day_index]
+
+        # Description facts come from the stored columns ('want' wins over 'need' as in
+        # classify_text); category names are classified once each and broadcast to the rows
+        self.category_codes, self.category_values = _codes([name or '' for name in self.category_names])
+        want = (np.array([spend_class == 'want' for spend_class in spend_classes], dtype=bool)
+                | _column(self.category_values, 'want', bool)[self.category_codes])
+        need = (np.array([spend_class == 'need' for spend_class in spend_classes], dtype=bool)
+                | _column(self.category_values, 'need', bool)[self.category_codes])
+        self.types = np.where(want, WANT, np.where(need, NEED, NEUTRAL))
+        self.small_types = np.fromiter(
+            (SMALL_PURCHASE_CODES.get(row.small_purchase_type, NO_SMALL_PURCHASE) for row in rows),
+            dtype=np.int64, count=self.size
+        )
+        impulse_keyword = np.array([bool(row.impulse_keyword) for row in rows], dtype=bool)
+
+        self.impulse_flags = np.stack([
+            self.purchases_that_day > BUSY_DAY_PURCHASES,
+            self.weekdays >= 5,
+            self.amounts < SMALL_AMOUNT,
+            impulse_keyword,
+        ]) if self.size else np.zeros((len(IMPULSE_REASONS), 0), dtype=bool)
+        self.impulse_scores = np.array([1.0, 0.5, 0.5, 1.0]) @ self.impulse_flags
+        self.impulse = self.impulse_scores >= IMPULSE_THRESHOLD
+
+    def type_totals(self):
+        """(wants, needs, neutral) spending totals"""
+        return tuple(total(self.amounts[self.types == code]) for code in (WANT, NEED, NEUTRAL))
+
+    def small_purchase_groups(self, newest_first=False):
+        """
+        Small purchase types present in the window, in order of first (or
+        latest) occurrence
+        Returns: list of SmallPurchaseGroup; rows are frame row indices in
+        the same (oldest or newest first) order
+        """
+        matched = np.flatnonzero(self.small_types != NO_SMALL_PURCHASE)
+        if newest_first:
+            matched = matched[::-1]
+        codes, first_seen = np.unique(self.small_types[matched], return_index=True)
+
+        groups = []
+        for code in codes[np.argsort(first_seen)]:
+            rows = matched[self.small_types[matched] == code]
+            groups.append(SmallPurchaseGroup(
+                SMALL_PURCHASE_TYPES[code], len(rows), total(self.amounts[rows]), rows
+            ))
+        return groups
+
+    def largest_rows(self, mask, limit):
+        """Indices of the `limit` largest expenses in mask (ties keep date order)"""
+        rows = np.flatnonzero(mask)
+        return rows[np.argsort(-self.amounts[rows], kind='stable')][:limit]
+
+    def category_totals(self, mask):
+        """
+        Spending per category name for the rows in mask
+        Returns: list of (category name, total), in order of first occurrence
+        """
+        codes = self.category_codes[mask]
+        sums = np.bincount(codes, weights=self.amounts[mask], minlength=len(self.category_values))
+        present, first_seen = np.unique(codes, return_index=True)
+        return [(self.category_values[code], float(sums[code])) for code in present[np.argsort(first_seen)]]
+
+    def impulse_reasons(self, row):
+        return [reason for reason, flag in zip(IMPULSE_REASONS, self.impulse_flags[:, row]) if flag]
+
+    def category_name(self, row):
+        return self.category_names[row] or ''
+
+    def category_color(self, row):
+        return self.category_colors[row] if self.category_names[row] is not None else '#666'
+
+
+def load_frame(user_id, days):
+    """
+    The user's expenses of the last `days` days, loaded with one query
+    Memoized for the rest of the request, so endpoints and helpers share it
+    """
+    frames = g.setdefault('analyzer_frames', {})
+    if (user_id, days) not in frames:
+        start_date = datetime.utcnow() - timedelta(days=days)
+        rows = db.session.query(
+            Expense.id, Expense.amount, Expense.date, Expense.description,
+            Expense.spend_class, Expense.small_purchase_type, Expense.impulse_keyword,
+            Category.name.label('category_name'), Category.color.label('category_color')
+        ).outerjoin(Category, Expense.category_id == Category.id).filter(
+            Expense.user_id == user_id,
+            Expense.date >= start_date
+        ).order_by(Expense.date, Expense.id).all()
+        frames[(user_id, days)] = ExpenseFrame(rows, days)
+    return frames[(user_id, days)]
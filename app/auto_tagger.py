@@ -136,6 +136,49 @@ TAG_PATTERNS = {
 }
 
 
+class KeywordMatcher:
+    """
+    Multi-keyword matcher built once from TAG_PATTERNS
+    Keywords are stored in a trie of words; one pass over the text's words
+    finds every keyword that \\b<keyword>\\b would match, instead of running
+    a separate regex per keyword.
+    """
+    _WORD = re.compile(r'\w+')
+
+    def __init__(self, patterns):
+        self.tag_order = list(patterns)
+        self._trie = {}
+        for tag_name, pattern_info in patterns.items():
+            for keyword in pattern_info['keywords']:
+                words = keyword.lower().split(' ')
+                # Keywords with characters removed by normalization (e.g. "h&m") can never match
+                if not all(self._WORD.fullmatch(word) for word in words):
+                    continue
+                node = self._trie
+                for word in words:
+                    node = node.setdefault(word, {})
+                node.setdefault(None, set()).add(tag_name)
+
+    def match(self, normalized_text):
+        """Names of all tags with a keyword in the text (text must be normalized)"""
+        tokens = list(self._WORD.finditer(normalized_text))
+        found = set()
+        for start in range(len(tokens)):
+            node = self._trie
+            for i in range(start, len(tokens)):
+                # Multi-word keywords only match words separated by exactly one space
+                if i > start and normalized_text[tokens[i - 1].end():tokens[i].start()] != ' ':
+                    break
+                node = node.get(tokens[i].group())
+                if node is None:
+                    break
+                found.update(node.get(None, ()))
+        return found
+
+
+_matcher = KeywordMatcher(TAG_PATTERNS)
+
+
 def extract_tags_from_text(text: str, max_tags: int = 5) -> List[Dict[str, str]]:
     """
     Extract relevant tags from OCR text or description
@@ -154,27 +197,18 @@ def extract_tags_from_text(text: str, max_tags: int = 5) -> List[Dict[str, str]]
     normalized_text = text.lower()
     normalized_text = re.sub(r'[^\w\s]', ' ', normalized_text)
     
-    detected_tags = []
-    
-    # Check each pattern
-    for tag_name, pattern_info in TAG_PATTERNS.items():
-        for keyword in pattern_info['keywords']:
-            # Use word boundary matching for better accuracy
-            if re.search(r'\b' + re.escape(keyword.lower()) + r'\b', normalized_text):
-                detected_tags.append({
-                    'name': tag_name,
-                    'color': pattern_info['color'],
-                    'icon': pattern_info['icon']
-                })
-                break  # Don't add the same tag multiple times
+    matched = _matcher.match(normalized_text)
     
-    # Remove duplicates and limit to max_tags
+    # Keep TAG_PATTERNS order and limit to max_tags
     unique_tags = []
-    seen = set()
-    for tag in detected_tags:
-        if tag['name'] not in seen:
-            seen.add(tag['name'])
-            unique_tags.append(tag)
+    for tag_name in _matcher.tag_order:
+        if tag_name in matched:
+            pattern_info = TAG_PATTERNS[tag_name]
+            unique_tags.append({
+                'name': tag_name,
+                'color': pattern_info['color'],
+                'icon': pattern_info['icon']
+            })
             if len(unique_tags) >= max_tags:
                 break
     
@@ -0,0 +1,310 @@
+"""
+Per-user response cache for read-heavy JSON endpoints
+Entries live in Redis (shared by all workers) and fall back to an in-process
+LRU when Redis is unreachable. Every key embeds the user's data version, a
+counter bumped after each commit that touches the user's expenses, income,
+categories, recurring items, documents, tags or profile - so stale entries
+are never read and simply expire.
+Security: Keys are scoped by the authenticated user's id
+"""
+from flask import request, current_app, make_response
+from flask_login import current_user
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from redis.exceptions import RedisError
+from collections import OrderedDict
+from functools import wraps
+import hashlib
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'fina:cache'
+VERSION_PREFIX = 'fina:data_version'
+SEQUENCE_PREFIX = 'fina:sequence'
+DEFAULT_TTL = 300
+# Versions kept by the local fallback are not shared between workers, so its entries expire sooner
+LOCAL_TTL = 30
+LOCAL_MAX_ENTRIES = 512
+REDIS_RETRY_SECONDS = 30
+
+_PENDING_KEY = 'cache_changed_users'
+
+
+class _LocalStore:
+    """Thread-safe in-process LRU with per-entry expiry"""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                return None
+            value, expires_at = item
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def version(self, user_id):
+        with self._lock:
+            return self._versions.get(user_id, 0)
+
+    def bump(self, user_id):
+        with self._lock:
+            self._versions[user_id] = self._versions.get(user_id, 0) + 1
+
+    def claim(self, key, sequence, ttl):
+        """Keep the larger of the stored and given sequence; return the stored maximum"""
+        with self._lock:
+            item = self._entries.get(key)
+            current = item[0] if item is not None and item[1] >= time.monotonic() else -1
+            if sequence > current:
+                self._entries[key] = (sequence, time.monotonic() + ttl)
+                self._entries.move_to_end(key)
+                current = sequence
+            return current
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._versions.clear()
+
+
+_local = _LocalStore(LOCAL_MAX_ENTRIES)
+_redis_down_until = 0.0
+# Users whose version bump could not reach Redis; replayed once it is back
+_missed_bumps = set()
+_missed_lock = threading.Lock()
+
+
+def _redis():
+    """Return the shared Redis client, or None while it is unreachable"""
+    from app import redis_client
+    if redis_client is None or time.monotonic() < _redis_down_until:
+        return None
+    return redis_client
+
+
+def _redis_failed(error):
+    global _redis_down_until
+    _redis_down_until = time.monotonic() + REDIS_RETRY_SECONDS
+    logger.warning(f"Response cache: Redis unavailable, using local cache ({error})")
+
+
+def _version_key(user_id):
+    return f"{VERSION_PREFIX}:{user_id}"
+
+
+def _bump_redis(client, user_ids):
+    pipe = client.pipeline()
+    for user_id in user_ids:
+        # Seed with a timestamp so a lost counter never restarts below an old version
+        pipe.set(_version_key(user_id), int(time.time() * 1000), nx=True)
+        pipe.incr(_version_key(user_id))
+    pipe.execute()
+
+
+def _replay_missed_bumps(client):
+    with _missed_lock:
+        if not _missed_bumps:
+            return
+        user_ids = list(_missed_bumps)
+        _missed_bumps.clear()
+    _bump_redis(client, user_ids)
+
+
+def bump_data_version(*user_ids):
+    """Invalidate every cached response of the given users"""
+    for user_id in user_ids:
+        _local.bump(user_id)
+
+    client = _redis()
+    if client is None:
+        with _missed_lock:
+            _missed_bumps.update(user_ids)
+        return
+    try:
+        _replay_missed_bumps(client)
+        _bump_redis(client, user_ids)
+    except RedisError as e:
+        with _missed_lock:
+            _missed_bumps.update(user_ids)
+        _redis_failed(e)
+
+
+def _lookup(user_id, endpoint_key, read=True):
+    """Return (cache key, cached body or None, store) for the current request"""
+    client = _redis()
+    if client is not None:
+        try:
+            _replay_missed_bumps(client)
+            version = client.get(_version_key(user_id)) or 0
+            key = f"{KEY_PREFIX}:{user_id}:{version}:{endpoint_key}"
+            return key, client.get(key) if read else None, client
+        except RedisError as e:
+            _redis_failed(e)
+
+    key = f"{KEY_PREFIX}:{user_id}:local{_local.version(user_id)}:{endpoint_key}"
+    return key, _local.get(key) if read else None, None
+
+
+def _store(client, key, body, ttl):
+    if client is not None:
+        try:
+            client.set(key, body, ex=ttl)
+            return
+        except RedisError as e:
+            _redis_failed(e)
+    _local.set(key, body, min(ttl, LOCAL_TTL))
+
+
+def _endpoint_key():
+    """Request path plus a digest of the (order-independent) query arguments"""
+    args = sorted((k, v) for k in request.args for v in request.args.getlist(k))
+    digest = hashlib.sha1(repr(args).encode('utf-8')).hexdigest()[:16]
+    return f"{request.path}:{digest}"
+
+
+def cached_response(ttl=None):
+    """
+    Cache successful JSON responses of a GET view per user and query string
+    Apply below @login_required so only authenticated requests reach the cache
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if not current_app.config.get('RESPONSE_CACHE_ENABLED', True) or request.method != 'GET':
+                return view(*args, **kwargs)
+
+            user_id = current_user.id
+            key, body, client = _lookup(user_id, _endpoint_key())
+            if body is not None:
+                response = current_app.response_class(body, status=200, mimetype='application/json')
+                response.headers['X-Cache'] = 'HIT'
+                return response
+
+            response = make_response(view(*args, **kwargs))
+            if response.status_code == 200 and response.mimetype == 'application/json':
+                timeout = ttl or current_app.config.get('RESPONSE_CACHE_TTL', DEFAULT_TTL)
+                _store(client, key, response.get_data(as_text=True), timeout)
+                response.headers['X-Cache'] = 'MISS'
+            return response
+        return wrapper
+    return decorator
+
+
+def get_user_value(user_id, name):
+    """String cached with set_user_value(), or None once the user's data changed"""
+    return _lookup(user_id, name)[1]
+
+
+def set_user_value(user_id, name, value, ttl=DEFAULT_TTL):
+    """Cache a string for the user until their data changes or ttl passes"""
+    key, _, client = _lookup(user_id, name, read=False)
+    _store(client, key, value, ttl)
+
+
+# Keeps the highest sequence number: SET only when larger, return the stored maximum
+_CLAIM_SEQUENCE = """
+local current = tonumber(redis.call('GET', KEYS[1]) or '-1')
+if tonumber(ARGV[1]) > current then
+    redis.call('SET', KEYS[1], ARGV[1], 'EX', ARGV[2])
+    return tonumber(ARGV[1])
+end
+return current
+"""
+
+
+def claim_sequence(user_id, channel, sequence, ttl=DEFAULT_TTL):
+    """
+    Record a request's sequence number on a per-user channel
+    Returns: the newest sequence number seen on the channel (this one if
+    no newer request arrived), so superseded requests can stop early
+    """
+    key = f"{SEQUENCE_PREFIX}:{user_id}:{channel}"
+    client = _redis()
+    if client is not None:
+        try:
+            return int(client.eval(_CLAIM_SEQUENCE, 1, key, sequence, ttl))
+        except RedisError as e:
+            _redis_failed(e)
+    return _local.claim(key, sequence, min(ttl, LOCAL_TTL))
+
+
+def mark_user_changed(session, user_id):
+    """
+    Invalidate a user's cache when the session commits
+    Needed for bulk query.update()/delete() calls, which bypass flush tracking
+    """
+    session.info.setdefault(_PENDING_KEY, set()).add(user_id)
+
+
+def _owner_id(session, obj):
+    """Id of the user whose cached data depends on obj (None if it has none)"""
+    from app.models import User, Expense, Income, Category, RecurringExpense, Document, Tag, ExpenseTag
+    owned = (Expense, Income, Category, RecurringExpense, Document, Tag)
+
+    if isinstance(obj, owned):
+        return obj.user_id
+    if isinstance(obj, User):
+        return obj.id
+    if isinstance(obj, ExpenseTag) and obj.tag_id is not None:
+        # Association rows carry no user id: it is the tag owner's
+        with session.no_autoflush:
+            tag = session.get(Tag, obj.tag_id)
+        return tag.user_id if tag else None
+    return None
+
+
+def _owner_ids(session):
+    """User ids whose cached data (analytics, typeahead candidates) depend on the objects in this flush"""
+    user_ids = set()
+    for obj in list(session.new) + list(session.deleted):
+        user_ids.add(_owner_id(session, obj))
+    for obj in session.dirty:
+        user_id = _owner_id(session, obj)
+        if user_id is not None and session.is_modified(obj):
+            user_ids.add(user_id)
+    user_ids.discard(None)
+    return user_ids
+
+
+def _before_flush(session, flush_context, instances):
+    user_ids = _owner_ids(session)
+    if user_ids:
+        session.info.setdefault(_PENDING_KEY, set()).update(user_ids)
+
+
+def _after_commit(session):
+    user_ids = session.info.pop(_PENDING_KEY, None)
+    if user_ids:
+        bump_data_version(*user_ids)
+
+
+def _after_rollback(session):
+    session.info.pop(_PENDING_KEY, None)
+
+
+def register_cache_listeners():
+    """Bump data versions after commits that change cached data (idempotent)"""
+    for name, listener in (('before_flush', _before_flush),
+                           ('after_commit', _after_commit),
+                           ('after_rollback', _after_rollback)):
+        if not event.contains(Session, name, listener):
+            event.listen(Session, name, listener)
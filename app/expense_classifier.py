@@ -0,0 +1,144 @@
+"""
+Description-derived facts persisted on every expense
+The analyzer, the subscription detector and the money-leak detectors all
+need the same facts about an expense description: want/need keywords, small
+purchase type, impulse keywords, known subscription service and the
+normalized money-leak key. They are computed once when an expense is written
+and stored on the row, so read paths filter and group on them in SQL.
+Each row records the rules version it was classified with; when the keyword
+dictionaries change, ensure_current()/backfill() re-evaluate stale rows.
+"""
+from app import db
+from app.models import Expense
+from app.analyzer_kernel import (
+    WANTS_CATEGORIES, NEEDS_CATEGORIES, SMALL_PURCHASE_PATTERNS, SMALL_PURCHASE_TYPES,
+    IMPULSE_KEYWORDS, NO_SMALL_PURCHASE, classify_text
+)
+from sqlalchemy import event, or_
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import get_history, PASSIVE_NO_INITIALIZE
+from functools import lru_cache
+import hashlib
+import json
+import re
+
+# Bump when the classification code changes (dictionary edits are picked up automatically)
+CLASSIFIER_REVISION = 1
+BACKFILL_BATCH = 1000
+
+_DIGITS = re.compile(r'[0-9#]+')
+_SPACES = re.compile(r'\s+')
+
+
+def _subscription_rules():
+    # Imported lazily: the service dictionary lives with the subscription routes
+    from app.routes.subscriptions import SUBSCRIPTION_SERVICES, detect_subscription_service
+    return SUBSCRIPTION_SERVICES, detect_subscription_service
+
+
+@lru_cache(maxsize=1)
+def rules_version():
+    """Short digest of the keyword dictionaries and CLASSIFIER_REVISION"""
+    services, _ = _subscription_rules()
+    rules = [
+        CLASSIFIER_REVISION, WANTS_CATEGORIES, NEEDS_CATEGORIES, IMPULSE_KEYWORDS,
+        {name: config['patterns'] for name, config in SMALL_PURCHASE_PATTERNS.items()},
+        {name: config['patterns'] for name, config in services.items()},
+    ]
+    return hashlib.sha1(json.dumps(rules, sort_keys=True).encode()).hexdigest()[:16]
+
+
+def description_key(description):
+    """Money-leak grouping key: lowercase, digits and '#' removed, whitespace collapsed"""
+    key = _DIGITS.sub('', description.lower().strip()).strip()
+    return _SPACES.sub(' ', key)
+
+
+@lru_cache(maxsize=8192)
+def _classify(description):
+    text_class = classify_text(description)
+    _, detect_service = _subscription_rules()
+    service = detect_service(description)
+    return (
+        description_key(description),
+        'want' if text_class.want else 'need' if text_class.need else None,
+        SMALL_PURCHASE_TYPES[text_class.small_type] if text_class.small_type != NO_SMALL_PURCHASE else None,
+        service['service_name'] if service else None,
+        text_class.impulse_keyword,
+    )
+
+
+def classify(description):
+    """Column values for an expense description"""
+    key, spend_class, small_type, service_name, impulse_keyword = _classify(description)
+    return {
+        'description_key': key,
+        'spend_class': spend_class,
+        'small_purchase_type': small_type,
+        'service_name': service_name,
+        'impulse_keyword': impulse_keyword,
+        'classification_version': rules_version(),
+    }
+
+
+def _needs_classification(obj):
+    if obj.description is None:
+        return False
+    if obj.classification_version != rules_version():
+        return True
+    # Unloaded attributes cannot have pending changes, so never trigger a load here
+    return get_history(obj, 'description', passive=PASSIVE_NO_INITIALIZE).has_changes()
+
+
+def _before_flush(session, flush_context, instances):
+    for obj in list(session.new) + list(session.dirty):
+        if type(obj) is Expense and _needs_classification(obj):
+            for column, value in classify(obj.description).items():
+                setattr(obj, column, value)
+
+
+def register_classifier_listeners():
+    """Classify expense descriptions in every ORM flush (idempotent)"""
+    if not event.contains(Session, 'before_flush', _before_flush):
+        event.listen(Session, 'before_flush', _before_flush)
+
+
+def _stale_filter():
+    return or_(Expense.classification_version.is_(None), Expense.classification_version != rules_version())
+
+
+def backfill(user_id=None, batch_size=BACKFILL_BATCH):
+    """
+    Classify expenses that were never classified or used older rules
+    Returns: number of expenses updated
+    """
+    updated = 0
+    last_id = 0
+    while True:
+        query = db.session.query(Expense.id, Expense.description, Expense.updated_at).filter(
+            Expense.id > last_id, _stale_filter()
+        )
+        if user_id is not None:
+            query = query.filter(Expense.user_id == user_id)
+        batch = query.order_by(Expense.id).limit(batch_size).all()
+        if not batch:
+            break
+        last_id = batch[-1].id
+
+        # Bulk updates skip flush events (nothing else derives from these columns);
+        # updated_at is passed through so reclassifying is not mistaken for an edit
+        db.session.bulk_update_mappings(Expense, [
+            dict(classify(description), id=expense_id, updated_at=updated_at)
+            for expense_id, description, updated_at in batch
+        ])
+        db.session.commit()
+        updated += len(batch)
+    return updated
+
+
+def ensure_current():
+    """Classify expenses stored before the columns existed or under older rules"""
+    if db.session.query(Expense.id).filter(_stale_filter()).first() is not None:
+        print("Migration: Classifying expense descriptions...")
+        updated = backfill()
+        print(f"Migration: Classified {updated} expenses (rules {rules_version()})")
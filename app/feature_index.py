@@ -0,0 +1,127 @@
+"""
+Precompiled index for the command-palette feature search
+Built once at import time from the feature definitions: every searchable
+term (keywords, English/Romanian names and description words; lowercased,
+diacritics removed) is expanded into a substring table and a trigram
+posting list, and each feature's response payload is prepared up front.
+A keystroke then costs one normalization of the query and a few dict
+lookups, whatever the number of features.
+"""
+from collections import defaultdict
+import unicodedata
+import re
+
+MIN_SUBSTRING = 2
+# Trigram (Dice) similarity needed for a typo-tolerant match
+FUZZY_THRESHOLD = 0.5
+
+# Term weights by source field, and match-kind factors
+FIELD_WEIGHTS = {'name': 1.0, 'keyword': 0.9, 'description': 0.6}
+EXACT, PREFIX, INFIX, FUZZY = 1.0, 0.8, 0.6, 0.4
+
+_WORD = re.compile(r'[^\W_]+')
+_RESPONSE_FIELDS = ('name', 'name_ro', 'description', 'description_ro', 'icon', 'url')
+
+
+def normalize(text):
+    """Lowercase and strip diacritics ('Setări' -> 'setari')"""
+    decomposed = unicodedata.normalize('NFKD', text.lower())
+    return ''.join(char for char in decomposed if not unicodedata.combining(char))
+
+
+def _trigrams(term):
+    padded = f'  {term} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class FeatureIndex:
+    """Ranked substring/prefix/fuzzy search over a fixed list of app features"""
+
+    def __init__(self, features, admin_features=()):
+        self.results = []
+        self.admin_only = []
+        terms = defaultdict(dict)  # term -> {feature position: field weight}
+
+        for position, (feature, admin_only) in enumerate(
+            [(feature, False) for feature in features] + [(feature, True) for feature in admin_features]
+        ):
+            result = {'id': feature['id'], 'type': 'feature'}
+            result.update((field, feature[field]) for field in _RESPONSE_FIELDS)
+            self.results.append(result)
+            self.admin_only.append(admin_only)
+
+            sources = [('keyword', keyword) for keyword in feature['keywords']]
+            for field in ('name', 'name_ro'):
+                sources.append(('name', feature[field]))
+                sources.extend(('name', word) for word in _WORD.findall(feature[field]))
+            for field in ('description', 'description_ro'):
+                sources.extend(('description', word) for word in _WORD.findall(feature[field]))
+            for field, text in sources:
+                term = normalize(text)
+                weights = terms[term]
+                weights[position] = max(weights.get(position, 0), FIELD_WEIGHTS[field])
+
+        # substring -> {feature position: best score}
+        self._substrings = defaultdict(dict)
+        # trigram -> terms containing it; term -> its trigrams
+        self._postings = defaultdict(set)
+        self._term_trigrams = {}
+        self._term_weights = dict(terms)
+
+        for term, weights in terms.items():
+            for start in range(len(term)):
+                for end in range(start + MIN_SUBSTRING, len(term) + 1):
+                    kind = EXACT if (start, end) == (0, len(term)) else PREFIX if start == 0 else INFIX
+                    matches = self._substrings[term[start:end]]
+                    for position, weight in weights.items():
+                        matches[position] = max(matches.get(position, 0), weight * kind)
+            trigrams = _trigrams(term)
+            self._term_trigrams[term] = trigrams
+            for trigram in trigrams:
+                self._postings[trigram].add(term)
+
+    def _fuzzy(self, word):
+        """Feature scores for terms that look like a misspelling of word"""
+        trigrams = _trigrams(word)
+        shared = defaultdict(int)
+        for trigram in trigrams:
+            for term in self._postings.get(trigram, ()):
+                shared[term] += 1
+
+        scores = {}
+        for term, count in shared.items():
+            similarity = 2 * count / (len(trigrams) + len(self._term_trigrams[term]))
+            if similarity >= FUZZY_THRESHOLD:
+                for position, weight in self._term_weights[term].items():
+                    score = weight * FUZZY * similarity
+                    scores[position] = max(scores.get(position, 0), score)
+        return scores
+
+    def _word_scores(self, word):
+        exact = self._substrings.get(word)
+        if exact is not None:
+            return exact
+        return self._fuzzy(word) if len(word) >= 3 else {}
+
+    def search(self, query, include_admin=False):
+        """
+        Features matching the query, best match first (ties keep definition order)
+        The whole query is tried as one term first (names like 'recurring
+        expenses'); otherwise every word has to match some term.
+        Returns: list of response dicts (shared, do not modify)
+        """
+        normalized = normalize(query).strip()
+        scores = self._substrings.get(normalized)
+        if scores is None:
+            words = _WORD.findall(normalized)
+            scores = {}
+            if words:
+                per_word = [self._word_scores(word) for word in words]
+                common = set(per_word[0]).intersection(*per_word[1:])
+                scores = {position: sum(word[position] for word in per_word) / len(words) for position in common}
+
+        ranked = sorted(
+            (position for position in scores if include_admin or not self.admin_only[position]),
+            key=lambda position: (-scores[position], position)
+        )
+        return [self.results[position] for position in ranked]
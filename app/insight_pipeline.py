@@ -0,0 +1,367 @@
+"""
+Sharded insight generation for the daily and weekly insight jobs
+Users are split into shards; each shard loads its window aggregates with a
+few grouped queries (app/aggregates.py), evaluates the insight rules in
+memory and returns insight rows. Shards run in a thread pool - the work is
+mostly database I/O - and the resulting insights are bulk-inserted one
+shard at a time from the calling thread, so writes never contend.
+Security: Every query is limited to the user ids of the shard being processed
+"""
+from app import db, aggregates
+from app.models import User, Expense, SpendingInsight, UserInsightPreferences
+from concurrent.futures import ThreadPoolExecutor
+from collections import defaultdict
+from datetime import datetime, timedelta
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SHARD_SIZE = 500
+DEFAULT_WORKERS = 4
+
+# Money leak rules
+LEAK_WINDOW_DAYS = 90
+LEAK_MIN_YEARLY = 200
+LEAK_MAX_ACTIVE = 3
+
+# How far back an existing insight suppresses a new one of the same kind
+DEDUP_WINDOWS = {
+    'unusual_spending': timedelta(days=3),
+    'category_spike': timedelta(days=7),
+    'money_leak': timedelta(days=30),
+}
+
+
+def _insight_row(user_id, insight_type, priority, title_key, message_key, icon,
+                 message_params, comparison_data=None, **fields):
+    """Column mapping for one SpendingInsight, ready for bulk_insert_mappings()"""
+    row = {
+        'user_id': user_id,
+        'insight_type': insight_type,
+        'priority': priority,
+        'title_key': title_key,
+        'message_key': message_key,
+        'icon': icon,
+        'message_params': json.dumps(message_params),
+        'comparison_data': json.dumps(comparison_data or {}),
+        'category_id': None,
+        'amount': None,
+        'action_key': None,
+        'period_start': None,
+        'period_end': None,
+        'expires_at': None,
+    }
+    row.update(fields)
+    return row
+
+
+def _currencies(user_ids):
+    return dict(db.session.query(User.id, User.currency).filter(User.id.in_(user_ids)).all())
+
+
+def _preferences(user_ids):
+    """{user_id: UserInsightPreferences row} for users that have saved preferences"""
+    rows = db.session.query(
+        UserInsightPreferences.user_id,
+        UserInsightPreferences.weekly_digest_enabled,
+        UserInsightPreferences.unusual_spending_enabled,
+        UserInsightPreferences.unusual_spending_threshold,
+        UserInsightPreferences.category_alerts_enabled,
+        UserInsightPreferences.category_alert_threshold,
+        UserInsightPreferences.money_leak_detection_enabled,
+        UserInsightPreferences.money_leak_min_occurrences
+    ).filter(UserInsightPreferences.user_id.in_(user_ids)).all()
+    return {row.user_id: row for row in rows}
+
+
+def _recent_insights(user_ids, insight_types, now):
+    """(user_id, insight_type, category_id, created_at) of insights inside the dedup windows"""
+    since = now - max(DEDUP_WINDOWS[t] for t in insight_types)
+    return db.session.query(
+        SpendingInsight.user_id,
+        SpendingInsight.insight_type,
+        SpendingInsight.category_id,
+        SpendingInsight.created_at
+    ).filter(
+        SpendingInsight.user_id.in_(user_ids),
+        SpendingInsight.insight_type.in_(insight_types),
+        SpendingInsight.created_at > since
+    ).all()
+
+
+def ensure_preferences(user_ids):
+    """Create default insight preferences for users that have none (one query to find them)"""
+    have = {user_id for (user_id,) in db.session.query(UserInsightPreferences.user_id)}
+    missing = [user_id for user_id in user_ids if user_id not in have]
+    if missing:
+        db.session.add_all([UserInsightPreferences(user_id=user_id) for user_id in missing])
+        db.session.commit()
+    return len(missing)
+
+
+def daily_shard(user_ids, now):
+    """Unusual spending and category spike insights for one shard of users"""
+    prefs = _preferences(user_ids)
+    currencies = _currencies(user_ids)
+    rows = []
+
+    # Unusual spending: last 7 days against the 30 days before them
+    start_date = now - timedelta(days=7)
+    baseline_start = start_date - timedelta(days=30)
+    unusual_users = [uid for uid in user_ids if uid in prefs and prefs[uid].unusual_spending_enabled]
+
+    # Category spikes: this month against last month
+    start_of_month = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    prev_month_end = start_of_month - timedelta(days=1)
+    prev_month_start = prev_month_end.replace(day=1)
+    spike_users = [uid for uid in user_ids if uid in prefs and prefs[uid].category_alerts_enabled]
+
+    recent = defaultdict(set)
+    for user_id, insight_type, category_id, created_at in _recent_insights(
+            user_ids, ('unusual_spending', 'category_spike'), now):
+        if created_at > now - DEDUP_WINDOWS[insight_type]:
+            recent[user_id].add((insight_type, category_id))
+
+    if unusual_users:
+        baseline = aggregates.totals_by_user(Expense, unusual_users, baseline_start, start_date)
+        current = aggregates.totals_by_user(Expense, unusual_users, start_date)
+        for user_id in unusual_users:
+            if user_id not in baseline:
+                continue
+            threshold = prefs[user_id].unusual_spending_threshold
+            baseline_daily = baseline[user_id][0] / 30
+            recent_daily = current.get(user_id, (0.0, 0))[0] / 7
+            if not (baseline_daily > 0 and recent_daily > baseline_daily * threshold):
+                continue
+            if any(kind == 'unusual_spending' for kind, _ in recent[user_id]):
+                continue
+            rows.append(_insight_row(
+                user_id, 'unusual_spending', 'high',
+                'insights.unusual.overallSpike.title',
+                'insights.unusual.overallSpike.message',
+                'trending_up',
+                {
+                    'percentage': round(((recent_daily / baseline_daily) - 1) * 100),
+                    'currency': currencies.get(user_id)
+                },
+                amount=round(recent_daily * 7, 2),
+                action_key='insights.unusual.action.reviewSpending',
+                expires_at=now + timedelta(days=7)
+            ))
+
+    if spike_users:
+        current = aggregates.category_breakdown_by_user(spike_users, start_of_month)
+        previous = aggregates.category_breakdown_by_user(
+            spike_users, prev_month_start, prev_month_end, inclusive_end=True
+        )
+        for user_id in spike_users:
+            rows.extend(_category_spikes(
+                user_id, current.get(user_id, []), previous.get(user_id, []),
+                prefs[user_id].category_alert_threshold, currencies.get(user_id), recent[user_id], now
+            ))
+
+    return rows
+
+
+def _category_spikes(user_id, current, previous, threshold, currency, recent, now):
+    current_by_cat = defaultdict(float)
+    prev_by_cat = defaultdict(float)
+    cat_ids = {}
+
+    for cat in current:
+        cat_name = cat.name or 'Uncategorized'
+        current_by_cat[cat_name] += cat.total
+        cat_ids[cat_name] = cat.category_id
+    for cat in previous:
+        prev_by_cat[cat.name or 'Uncategorized'] += cat.total
+
+    rows = []
+    for cat_name, current_amount in current_by_cat.items():
+        prev_amount = prev_by_cat.get(cat_name, 0)
+        if not (prev_amount > 0 and current_amount > prev_amount * threshold and (current_amount - prev_amount) > 20):
+            continue
+        if ('category_spike', cat_ids.get(cat_name)) in recent:
+            continue
+        change = ((current_amount / prev_amount) - 1) * 100
+        rows.append(_insight_row(
+            user_id, 'category_spike', 'high' if change > 100 else 'medium',
+            'insights.category.spike.title',
+            'insights.category.spike.message',
+            'trending_up',
+            {
+                'category': cat_name,
+                'percentage': round(change),
+                'currency': currency,
+                'amount': round(current_amount - prev_amount, 2)
+            },
+            {
+                'current': round(current_amount, 2),
+                'previous': round(prev_amount, 2)
+            },
+            category_id=cat_ids.get(cat_name),
+            amount=round(current_amount, 2),
+            action_key='insights.category.action.reviewCategory',
+            expires_at=now + timedelta(days=14)
+        ))
+    return rows
+
+
+def weekly_shard(user_ids, now):
+    """Weekly digest and money leak insights for one shard of users"""
+    prefs = _preferences(user_ids)
+    currencies = _currencies(user_ids)
+    rows = []
+
+    # Users without saved preferences get the defaults (digest and leak detection on)
+    digest_users = [uid for uid in user_ids if uid not in prefs or prefs[uid].weekly_digest_enabled]
+    leak_users = [uid for uid in user_ids if uid not in prefs or prefs[uid].money_leak_detection_enabled]
+
+    if digest_users:
+        start_date = now - timedelta(days=7)
+        prev_start = start_date - timedelta(days=7)
+        current = aggregates.totals_by_user(Expense, digest_users, start_date)
+        previous = aggregates.totals_by_user(Expense, digest_users, prev_start, start_date)
+        categories = aggregates.category_breakdown_by_user(digest_users, start_date)
+        for user_id in digest_users:
+            rows.append(_weekly_digest(
+                user_id, current.get(user_id, (0, 0)), previous.get(user_id, (0, 0))[0],
+                categories.get(user_id, []), currencies.get(user_id), start_date, now
+            ))
+
+    if leak_users:
+        rows.extend(_money_leaks(leak_users, prefs, currencies, now))
+
+    return rows
+
+
+def _weekly_digest(user_id, current, prev_total, categories, currency, start_date, now):
+    current_total, transaction_count = current
+    change = ((current_total - prev_total) / prev_total) * 100 if prev_total > 0 else 0
+
+    category_totals = defaultdict(float)
+    for cat in categories:
+        category_totals[cat.name or 'Uncategorized'] += cat.total
+    top_category = max(category_totals.items(), key=lambda x: x[1])[0] if category_totals else 'None'
+
+    return _insight_row(
+        user_id, 'weekly_digest', 'low',
+        'insights.weeklyDigest.title',
+        'insights.weeklyDigest.message',
+        'summarize',
+        {
+            'total': round(current_total, 2),
+            'change': round(change, 1),
+            'top_category': top_category,
+            'transaction_count': transaction_count,
+            'currency': currency
+        },
+        {
+            'current': round(current_total, 2),
+            'previous': round(prev_total, 2),
+            'change_percentage': round(change, 1)
+        },
+        amount=round(current_total, 2),
+        period_start=start_date,
+        period_end=now,
+        expires_at=now + timedelta(days=14)
+    )
+
+
+def _money_leaks(user_ids, prefs, currencies, now):
+    """Recurring small expenses, from expenses pre-grouped by (user, description, amount)"""
+    start_date = now - timedelta(days=LEAK_WINDOW_DAYS)
+    # Groups come in order of their first expense; each pattern is labelled with
+    # the description of its most recent expense
+    # description_key is the normalized description stored by expense_classifier
+    grouped = db.session.query(
+        Expense.user_id, Expense.description_key, Expense.description, Expense.amount,
+        db.func.count(Expense.id), db.func.max(Expense.date)
+    ).filter(
+        Expense.user_id.in_(user_ids),
+        Expense.date >= start_date
+    ).group_by(
+        Expense.user_id, Expense.description_key, Expense.description, Expense.amount
+    ).order_by(db.func.min(Expense.date)).all()
+
+    patterns = defaultdict(lambda: defaultdict(lambda: {'total': 0, 'count': 0, 'last_date': None}))
+    for user_id, description_key, description, amount, count, last_date in grouped:
+        amount_bucket = round(amount / 5) * 5
+        pattern = patterns[user_id][f"{description_key}_{amount_bucket}"]
+        pattern['total'] += amount * count
+        pattern['count'] += count
+        if pattern['last_date'] is None or last_date > pattern['last_date']:
+            pattern['last_date'] = last_date
+            pattern['desc'] = description
+
+    active = defaultdict(int)
+    for user_id, _, _, _ in _recent_insights(user_ids, ('money_leak',), now):
+        active[user_id] += 1
+
+    rows = []
+    for user_id, user_patterns in patterns.items():
+        min_occurrences = prefs[user_id].money_leak_min_occurrences if user_id in prefs else 3
+        for data in user_patterns.values():
+            if data['count'] < min_occurrences:
+                continue
+            yearly_projection = (data['total'] / LEAK_WINDOW_DAYS) * 365
+            # Only flag significant leaks, and at most LEAK_MAX_ACTIVE at a time
+            if yearly_projection <= LEAK_MIN_YEARLY or active[user_id] >= LEAK_MAX_ACTIVE:
+                continue
+            active[user_id] += 1
+            rows.append(_insight_row(
+                user_id, 'money_leak', 'medium',
+                'insights.moneyLeak.title',
+                'insights.moneyLeak.message',
+                'water_drop',
+                {
+                    'description': data['desc'],
+                    'count': data['count'],
+                    'yearly': round(yearly_projection, 2),
+                    'currency': currencies.get(user_id)
+                },
+                {
+                    'occurrences': data['count'],
+                    'yearly_projection': round(yearly_projection, 2)
+                },
+                amount=round(data['total'], 2),
+                action_key='insights.moneyLeak.action.reviewHabit',
+                expires_at=now + timedelta(days=30)
+            ))
+    return rows
+
+
+def _run_shard(app, evaluate, user_ids, now):
+    # Each thread gets its own app context and therefore its own session
+    with app.app_context():
+        return evaluate(user_ids, now)
+
+
+def run(app, evaluate, label):
+    """
+    Evaluate a shard function for every user and insert the resulting insights
+    Call inside an app context; returns (users processed, insights created)
+    """
+    shard_size = max(1, app.config.get('INSIGHT_SHARD_SIZE', DEFAULT_SHARD_SIZE))
+    workers = max(1, app.config.get('INSIGHT_WORKERS', DEFAULT_WORKERS))
+    now = datetime.utcnow()
+
+    user_ids = [user_id for (user_id,) in db.session.query(User.id).order_by(User.id)]
+    shards = [user_ids[i:i + shard_size] for i in range(0, len(user_ids), shard_size)]
+
+    created = 0
+    with ThreadPoolExecutor(max_workers=min(workers, len(shards) or 1),
+                            thread_name_prefix=f'insights-{label}') as pool:
+        futures = [(shard, pool.submit(_run_shard, app, evaluate, shard, now)) for shard in shards]
+        for shard, future in futures:
+            try:
+                rows = future.result()
+                if rows:
+                    db.session.bulk_insert_mappings(SpendingInsight, rows)
+                    db.session.commit()
+                    created += len(rows)
+            except Exception as e:
+                db.session.rollback()
+                logger.error(f"Error processing {label} insights for users {shard[0]}-{shard[-1]}: {str(e)}")
+
+    return len(user_ids), created
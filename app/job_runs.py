@@ -0,0 +1,188 @@
+"""
+Telemetry for scheduled background jobs
+Every job run on the scheduler leader is recorded in job_runs (start/end,
+duration, rows processed, error, node). The same table drives missed-run
+detection - a cron fire time with no run after it was missed while no
+scheduler was up - and the Prometheus text exposition served to admins.
+"""
+from app import db
+from app.models import JobRun
+from sqlalchemy import func
+from datetime import datetime, timedelta, timezone
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+RETENTION = timedelta(days=30)
+# How far back startup looks for missed fire times (covers the weekly jobs)
+CATCH_UP_LOOKBACK = timedelta(days=8)
+# A run this close before a fire time still counts for it (clock skew between nodes)
+FIRE_TOLERANCE = timedelta(minutes=1)
+
+
+def run_recorded(app, job_name, func, node, catch_up=False):
+    """
+    Run a job function and record it in job_runs
+    The job's return value (an int) is stored as rows processed; exceptions are
+    recorded, logged and not re-raised so the scheduler keeps running
+    """
+    with app.app_context():
+        run = JobRun(job_name=job_name, node=node, status='running', catch_up=catch_up,
+                     started_at=datetime.utcnow())
+        db.session.add(run)
+        db.session.commit()
+        run_id = run.id
+
+    started = time.perf_counter()
+    status, error, rows = 'success', None, None
+    try:
+        result = func()
+        if isinstance(result, int) and not isinstance(result, bool):
+            rows = result
+    except Exception as e:
+        status, error = 'error', str(e)[:500]
+        logger.error(f"Job {job_name} failed: {error}")
+    duration_ms = (time.perf_counter() - started) * 1000
+
+    with app.app_context():
+        run = db.session.get(JobRun, run_id)
+        run.status = status
+        run.error = error
+        run.rows_processed = rows
+        run.finished_at = datetime.utcnow()
+        run.duration_ms = round(duration_ms, 1)
+        JobRun.query.filter(
+            JobRun.job_name == job_name,
+            JobRun.started_at < datetime.utcnow() - RETENTION
+        ).delete(synchronize_session=False)
+        db.session.commit()
+
+    logger.info(f"Job {job_name} {status} in {duration_ms:.0f}ms"
+                + (f", {rows} rows" if rows is not None else "")
+                + (" (catch-up)" if catch_up else ""))
+    return status
+
+
+def _to_utc_naive(moment):
+    return moment.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def previous_fire_time(trigger, now):
+    """Latest fire time of an APScheduler trigger at or before now (aware), or None"""
+    last = None
+    fire = trigger.get_next_fire_time(None, now - CATCH_UP_LOOKBACK)
+    while fire is not None and fire <= now:
+        last = fire
+        fire = trigger.get_next_fire_time(fire, fire + timedelta(seconds=1))
+    return last
+
+
+def missed_jobs(jobs, now=None):
+    """
+    Names of jobs whose latest fire time has no run after it
+    jobs: {job_name: trigger}; jobs that never ran are not considered missed
+    """
+    if now is None:
+        now = datetime.now(timezone.utc)
+    last_started = dict(
+        db.session.query(JobRun.job_name, func.max(JobRun.started_at))
+        .filter(JobRun.job_name.in_(list(jobs)))
+        .group_by(JobRun.job_name).all()
+    )
+
+    missed = []
+    for job_name, trigger in jobs.items():
+        fire = previous_fire_time(trigger, now.astimezone(trigger.timezone))
+        started = last_started.get(job_name)
+        if fire is None or started is None:
+            continue
+        if started < _to_utc_naive(fire) - FIRE_TOLERANCE:
+            missed.append(job_name)
+    return missed
+
+
+def job_summary():
+    """Per-job counters and the latest run, for the admin endpoint and metrics"""
+    counts = db.session.query(
+        JobRun.job_name, JobRun.status, JobRun.catch_up,
+        func.count(JobRun.id), func.sum(JobRun.duration_ms), func.sum(JobRun.rows_processed)
+    ).group_by(JobRun.job_name, JobRun.status, JobRun.catch_up).all()
+
+    summary = {}
+    for job_name, status, catch_up, count, duration_ms, rows in counts:
+        job = summary.setdefault(job_name, {
+            'runs': {}, 'catch_up_runs': 0, 'duration_ms_total': 0.0, 'rows_total': 0,
+            'last_run': None, 'last_success_at': None
+        })
+        job['runs'][status] = job['runs'].get(status, 0) + count
+        job['catch_up_runs'] += count if catch_up else 0
+        job['duration_ms_total'] += duration_ms or 0.0
+        job['rows_total'] += rows or 0
+
+    last_ids = db.session.query(func.max(JobRun.id)).group_by(JobRun.job_name)
+    for run in JobRun.query.filter(JobRun.id.in_(last_ids)).all():
+        summary[run.job_name]['last_run'] = run.to_dict()
+
+    last_success = db.session.query(JobRun.job_name, func.max(JobRun.finished_at)).filter(
+        JobRun.status == 'success'
+    ).group_by(JobRun.job_name).all()
+    for job_name, finished_at in last_success:
+        summary[job_name]['last_success_at'] = finished_at.isoformat() if finished_at else None
+
+    return summary
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _timestamp(iso_value):
+    return datetime.fromisoformat(iso_value).replace(tzinfo=timezone.utc).timestamp()
+
+
+def render_metrics():
+    """Job (and this process's OCR stage) metrics in the Prometheus text format"""
+    from app.ocr import get_stage_timings
+
+    summary = job_summary()
+    lines = []
+
+    def metric(name, kind, help_text, samples):
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for labels, value in samples:
+            label_text = ','.join(f'{key}="{_escape(val)}"' for key, val in labels.items())
+            lines.append(f"{name}{{{label_text}}} {value}")
+
+    jobs = sorted(summary.items())
+    metric('fina_job_runs_total', 'counter', 'Recorded runs per job and status',
+           [({'job': name, 'status': status}, count)
+            for name, job in jobs for status, count in sorted(job['runs'].items())])
+    metric('fina_job_catch_up_runs_total', 'counter', 'Runs replayed after being missed',
+           [({'job': name}, job['catch_up_runs']) for name, job in jobs])
+    metric('fina_job_duration_seconds_total', 'counter', 'Total run time per job',
+           [({'job': name}, round(job['duration_ms_total'] / 1000, 3)) for name, job in jobs])
+    metric('fina_job_rows_processed_total', 'counter', 'Rows processed per job',
+           [({'job': name}, job['rows_total']) for name, job in jobs])
+
+    last_runs = [(name, job['last_run']) for name, job in jobs if job['last_run']]
+    metric('fina_job_last_run_timestamp_seconds', 'gauge', 'Start time of the latest run',
+           [({'job': name}, _timestamp(run['started_at'])) for name, run in last_runs])
+    metric('fina_job_last_duration_seconds', 'gauge', 'Duration of the latest finished run',
+           [({'job': name}, round(run['duration_ms'] / 1000, 3)) for name, run in last_runs
+            if run['duration_ms'] is not None])
+    metric('fina_job_last_rows_processed', 'gauge', 'Rows processed by the latest run',
+           [({'job': name}, run['rows_processed']) for name, run in last_runs
+            if run['rows_processed'] is not None])
+    metric('fina_job_last_success_timestamp_seconds', 'gauge', 'End time of the latest successful run',
+           [({'job': name}, _timestamp(job['last_success_at'])) for name, job in jobs
+            if job['last_success_at']])
+
+    stages = sorted(get_stage_timings().items())
+    metric('fina_ocr_stage_seconds_total', 'counter', 'OCR time per stage in this process',
+           [({'stage': stage}, round(timing['total_ms'] / 1000, 3)) for stage, timing in stages])
+    metric('fina_ocr_stage_runs_total', 'counter', 'OCR stage executions in this process',
+           [({'stage': stage}, timing['count']) for stage, timing in stages])
+
+    return '\n'.join(lines) + '\n'
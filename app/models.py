@@ -3,6 +3,9 @@ from flask_login import UserMixin
 from datetime import datetime, timedelta
 import json
 
+# Ids per IN (...) lookup in batch loaders (stays far below SQLite's bound parameter limit)
+BATCH_LOOKUP = 500
+
 class User(db.Model, UserMixin):
     __tablename__ = 'users'
     
@@ -104,9 +107,13 @@ class Category(db.Model):
         
         return float(total) if total else 0.0
     
-    def get_budget_status(self):
-        """Get budget status with spent amount, percentage, and alert status"""
-        spent = self.get_current_month_spending()
+    def get_budget_status(self, spent=None):
+        """
+        Get budget status with spent amount, percentage, and alert status
+        Pass a precomputed current-month `spent` to avoid a query per category
+        """
+        if spent is None:
+            spent = self.get_current_month_spending()
         
         if not self.monthly_budget or self.monthly_budget <= 0:
             return {
@@ -167,10 +174,28 @@ class Expense(db.Model):
     tags = db.Column(db.Text, default='[]')  # JSON array of tags
     receipt_path = db.Column(db.String(255), nullable=True)
     receipt_ocr_text = db.Column(db.Text, nullable=True)  # Extracted text from receipt OCR for searchability
+    recurring_key = db.Column(db.String(64), nullable=True)  # Set on auto-created expenses: recurring id + due date
     date = db.Column(db.DateTime, default=datetime.utcnow)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    # Facts derived from the description on every write (see app/expense_classifier.py)
+    description_key = db.Column(db.String(200), nullable=True)  # Lowercased, digits/# stripped: groups money leaks
+    spend_class = db.Column(db.String(10), nullable=True)  # 'want'/'need' keyword in the description, else NULL
+    small_purchase_type = db.Column(db.String(30), nullable=True)  # Analyzer small purchase pattern (coffee, snacks, ...)
+    service_name = db.Column(db.String(50), nullable=True)  # Known subscription service (netflix, spotify, ...)
+    impulse_keyword = db.Column(db.Boolean, nullable=True)  # Description has an impulse-buy keyword
+    classification_version = db.Column(db.String(16), nullable=True)  # Rules version the facts were computed with
+    
+    # Composite indexes for the per-user date-range queries used by dashboards and reports
+    __table_args__ = (
+        db.Index('ix_expenses_user_date', 'user_id', 'date'),
+        db.Index('ix_expenses_user_category_date', 'user_id', 'category_id', 'date'),
+        db.Index('ix_expenses_category_date', 'category_id', 'date'),
+        # Idempotency key: a recurring occurrence can only ever be created once
+        db.Index('ix_expenses_recurring_key', 'recurring_key', unique=True),
+    )
+    
     def __repr__(self):
         return f'<Expense {self.description} - {self.amount} {self.currency}>'
     
@@ -203,23 +228,60 @@ class Expense(db.Model):
                 tag.use_count -= 1
     
     def to_dict(self):
-        # Get tag objects with details
-        tag_list = [tag.to_dict() for tag in self.get_tag_objects()]
-        
+        return self._serialize(self.category, self.get_tag_objects())
+    
+    def _serialize(self, category, tag_objects):
         return {
             'id': self.id,
             'amount': self.amount,
             'currency': self.currency,
             'description': self.description,
             'category_id': self.category_id,
-            'category_name': self.category.name if self.category else None,
-            'category_color': self.category.color if self.category else None,
+            'category_name': category.name if category else None,
+            'category_color': category.color if category else None,
             'tags': self.get_tags(),  # Legacy JSON tags
-            'tag_objects': tag_list,  # New Tag objects
+            'tag_objects': [tag.to_dict() for tag in tag_objects],  # New Tag objects
             'receipt_path': f'/uploads/{self.receipt_path}' if self.receipt_path else None,
             'date': self.date.isoformat(),
             'created_at': self.created_at.isoformat()
         }
+    
+    @staticmethod
+    def tag_objects_for(expenses):
+        """
+        Tag objects of many expenses, one query per BATCH_LOOKUP ids
+        Returns: {expense id: [Tag, ...] by tag id} (expenses without tags are missing)
+        """
+        expense_ids = [expense.id for expense in expenses]
+        tags_by_expense = {}
+        for start in range(0, len(expense_ids), BATCH_LOOKUP):
+            rows = db.session.query(ExpenseTag.expense_id, Tag).join(
+                Tag, Tag.id == ExpenseTag.tag_id
+            ).filter(
+                ExpenseTag.expense_id.in_(expense_ids[start:start + BATCH_LOOKUP])
+            ).order_by(Tag.id).all()
+            for expense_id, tag in rows:
+                tags_by_expense.setdefault(expense_id, []).append(tag)
+        return tags_by_expense
+    
+    @classmethod
+    def to_dict_many(cls, expenses):
+        """
+        Serialize a list of expenses like to_dict(), loading their categories and
+        tags with one query each instead of two lazy loads per expense
+        """
+        if not expenses:
+            return []
+        category_ids = list({expense.category_id for expense in expenses if expense.category_id is not None})
+        categories = {}
+        for start in range(0, len(category_ids), BATCH_LOOKUP):
+            for category in Category.query.filter(Category.id.in_(category_ids[start:start + BATCH_LOOKUP])).all():
+                categories[category.id] = category
+        tags_by_expense = cls.tag_objects_for(expenses)
+        return [
+            expense._serialize(categories.get(expense.category_id), tags_by_expense.get(expense.id, []))
+            for expense in expenses
+        ]
 
 
 class Document(db.Model):
@@ -261,6 +323,74 @@ class Document(db.Model):
         }
 
 
+class OcrResult(db.Model):
+    """
+    OCR text cached by file content digest and OCR settings
+    Identical files (e.g. a receipt uploaded as a document and as an expense
+    attachment) are only OCRed once
+    """
+    __tablename__ = 'ocr_results'
+
+    id = db.Column(db.Integer, primary_key=True)
+    file_digest = db.Column(db.String(64), nullable=False)  # SHA-256 of the file bytes
+    settings_key = db.Column(db.String(200), nullable=False)  # lang/psm/dpi/preprocessing version
+    text = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.UniqueConstraint('file_digest', 'settings_key', name='unique_ocr_result'),
+    )
+
+    def __repr__(self):
+        return f'<OcrResult {self.file_digest[:12]}>'
+
+
+class OcrJob(db.Model):
+    """
+    Queued OCR work for an uploaded document or expense receipt
+    Processed out of band by the workers in app/ocr_queue.py
+    Security: user_id is copied from the owning document/expense
+    """
+    __tablename__ = 'ocr_jobs'
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    target_type = db.Column(db.String(20), nullable=False)  # document, expense
+    target_id = db.Column(db.Integer, nullable=False)
+    file_path = db.Column(db.String(500), nullable=False)
+    file_type = db.Column(db.String(10), nullable=False)
+    auto_tag = db.Column(db.Boolean, default=False)  # Suggest expense tags from the OCR text
+    status = db.Column(db.String(20), default='queued')  # queued, processing, done, error
+    attempts = db.Column(db.Integer, default=0)
+    error = db.Column(db.String(500), nullable=True)
+    text_length = db.Column(db.Integer, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+    __table_args__ = (
+        db.Index('ix_ocr_jobs_status_created', 'status', 'created_at'),
+        db.Index('ix_ocr_jobs_target', 'target_type', 'target_id'),
+    )
+
+    def __repr__(self):
+        return f'<OcrJob {self.id} {self.target_type}:{self.target_id} {self.status}>'
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'target_type': self.target_type,
+            'target_id': self.target_id,
+            'status': self.status,
+            'attempts': self.attempts,
+            'error': self.error,
+            'text_length': self.text_length,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
+
+
 class RecurringExpense(db.Model):
     """
     Model for storing recurring expenses (subscriptions, monthly bills, etc.)
@@ -295,6 +425,11 @@ class RecurringExpense(db.Model):
     
     category = db.relationship('Category', backref='recurring_expenses')
     
+    __table_args__ = (
+        db.Index('ix_recurring_expenses_user_active', 'user_id', 'is_active'),
+        db.Index('ix_recurring_expenses_due', 'is_active', 'auto_create', 'next_due_date'),
+    )
+    
     def __repr__(self):
         return f'<RecurringExpense {self.name} - {self.amount} {self.currency}>'
     
@@ -401,10 +536,18 @@ class Income(db.Model):
     last_created_date = db.Column(db.DateTime, nullable=True)  # Last date when income was auto-created
     is_active = db.Column(db.Boolean, default=True)  # Whether recurring income is active
     auto_create = db.Column(db.Boolean, default=False)  # Automatically create income entries
+    recurring_key = db.Column(db.String(64), nullable=True)  # Set on auto-created entries: recurring id + due date
     date = db.Column(db.DateTime, default=datetime.utcnow)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    # Composite indexes for per-user date-range queries and the recurring income scheduler
+    __table_args__ = (
+        db.Index('ix_income_user_date', 'user_id', 'date'),
+        db.Index('ix_income_due', 'is_active', 'auto_create', 'next_due_date'),
+        db.Index('ix_income_recurring_key', 'recurring_key', unique=True),
+    )
+    
     def __repr__(self):
         return f'<Income {self.description} - {self.amount} {self.currency}>'
     
@@ -456,6 +599,85 @@ class Income(db.Model):
         }
 
 
+class DailySpendRollup(db.Model):
+    """
+    Materialized per-day expense totals per user and category
+    Maintained incrementally on every expense write (see app/rollups.py)
+    Security: All queries filtered by user_id
+    """
+    __tablename__ = 'daily_spend_rollup'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    category_id = db.Column(db.Integer, nullable=False)
+    day = db.Column(db.Date, nullable=False)
+    total = db.Column(db.Float, default=0.0, nullable=False)
+    count = db.Column(db.Integer, default=0, nullable=False)
+    
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'category_id', 'day', name='unique_spend_rollup_day'),
+        db.Index('ix_daily_spend_rollup_user_day', 'user_id', 'day'),
+    )
+    
+    def __repr__(self):
+        return f'<DailySpendRollup user={self.user_id} category={self.category_id} {self.day}: {self.total}>'
+
+
+class DailyIncomeRollup(db.Model):
+    """
+    Materialized per-day income totals per user and source
+    Maintained incrementally on every income write (see app/rollups.py)
+    Security: All queries filtered by user_id
+    """
+    __tablename__ = 'daily_income_rollup'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    source = db.Column(db.String(100), nullable=False)
+    day = db.Column(db.Date, nullable=False)
+    total = db.Column(db.Float, default=0.0, nullable=False)
+    count = db.Column(db.Integer, default=0, nullable=False)
+    
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'source', 'day', name='unique_income_rollup_day'),
+        db.Index('ix_daily_income_rollup_user_day', 'user_id', 'day'),
+    )
+    
+    def __repr__(self):
+        return f'<DailyIncomeRollup user={self.user_id} source={self.source} {self.day}: {self.total}>'
+
+
+class ExpensePattern(db.Model):
+    """
+    Index of repeated expenses used by recurring/subscription detection
+    One row per (normalized description, amount bucket, category) and bucket
+    width; occurrences holds the matching expenses of the detection window as
+    JSON [id, date, amount, description, currency] lists, oldest first.
+    Maintained incrementally on every expense write (see app/patterns.py)
+    Security: All queries filtered by user_id
+    """
+    __tablename__ = 'expense_patterns'
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    bucket_size = db.Column(db.Integer, nullable=False)
+    normalized_description = db.Column(db.String(200), nullable=False)
+    amount_bucket = db.Column(db.Integer, nullable=False)
+    category_id = db.Column(db.Integer, nullable=False)
+    occurrence_count = db.Column(db.Integer, default=0, nullable=False)
+    last_date = db.Column(db.DateTime, nullable=False)
+    occurrences = db.Column(db.Text, nullable=False, default='[]')
+
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'bucket_size', 'normalized_description', 'amount_bucket', 'category_id',
+                            name='unique_expense_pattern'),
+        db.Index('ix_expense_patterns_user_count', 'user_id', 'bucket_size', 'occurrence_count'),
+    )
+
+    def __repr__(self):
+        return f'<ExpensePattern user={self.user_id} {self.normalized_description!r} ~{self.amount_bucket}: {self.occurrence_count}>'
+
+
 class Tag(db.Model):
     """
     Model for storing smart tags that can be applied to expenses
@@ -693,6 +915,11 @@ class SpendingInsight(db.Model):
     category = db.relationship('Category', backref='insights')
     user = db.relationship('User', backref='spending_insights')
     
+    __table_args__ = (
+        db.Index('ix_spending_insights_user_type_created', 'user_id', 'insight_type', 'created_at'),
+        db.Index('ix_spending_insights_user_dismissed_created', 'user_id', 'is_dismissed', 'created_at'),
+    )
+    
     def __repr__(self):
         return f'<SpendingInsight {self.insight_type} for user {self.user_id}>'
     
@@ -987,6 +1214,7 @@ class NoSpendDay(db.Model):
     
     __table_args__ = (
         db.UniqueConstraint('user_id', 'date', name='unique_user_date'),
+        db.Index('ix_no_spend_days_date_status', 'date', 'status'),
     )
     
     def __repr__(self):
@@ -1041,6 +1269,7 @@ class UserGamificationStats(db.Model):
     # Last activity
     last_achievement_at = db.Column(db.DateTime, nullable=True)
     last_challenge_at = db.Column(db.DateTime, nullable=True)
+    last_no_spend_check = db.Column(db.Date, nullable=True)  # Last day evaluated by the nightly no-spend check
     
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -1217,6 +1446,11 @@ class UserSession(db.Model):
     
     user = db.relationship('User', backref=db.backref('sessions', lazy='dynamic'))
     
+    __table_args__ = (
+        db.Index('ix_user_sessions_user_active_activity', 'user_id', 'is_active', 'last_activity'),
+        db.Index('ix_user_sessions_last_activity', 'last_activity'),
+    )
+    
     @classmethod
     def create_session(cls, user_id, request, session_token):
         """Create a new session record"""
@@ -1340,4 +1574,58 @@ class UserSession(db.Model):
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'last_activity': self.last_activity.isoformat() if self.last_activity else None,
             'is_active': self.is_active
-        }
\ No newline at end of file
+        }
+
+class SchedulerLock(db.Model):
+    """
+    Lease-based leader lock for background jobs
+    Only the node holding an unexpired lease runs the scheduled jobs
+    """
+    __tablename__ = 'scheduler_locks'
+    
+    name = db.Column(db.String(50), primary_key=True)
+    owner = db.Column(db.String(100), nullable=False)  # hostname:pid:nonce of the leader
+    expires_at = db.Column(db.DateTime, nullable=False)
+    
+    def __repr__(self):
+        return f'<SchedulerLock {self.name} held by {self.owner}>'
+
+
+class JobRun(db.Model):
+    """
+    One execution of a scheduled background job (telemetry)
+    Written by the scheduler leader around every job; see app/job_runs.py
+    """
+    __tablename__ = 'job_runs'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    job_name = db.Column(db.String(100), nullable=False)
+    node = db.Column(db.String(100), nullable=False)  # hostname:pid:nonce of the scheduler that ran it
+    status = db.Column(db.String(20), default='running')  # running, success, error
+    catch_up = db.Column(db.Boolean, default=False)  # Replay of a run missed while no scheduler was up
+    rows_processed = db.Column(db.Integer, nullable=True)
+    error = db.Column(db.String(500), nullable=True)
+    started_at = db.Column(db.DateTime, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime, nullable=True)
+    duration_ms = db.Column(db.Float, nullable=True)
+    
+    __table_args__ = (
+        db.Index('ix_job_runs_job_started', 'job_name', 'started_at'),
+    )
+    
+    def __repr__(self):
+        return f'<JobRun {self.job_name} {self.status}>'
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'job_name': self.job_name,
+            'node': self.node,
+            'status': self.status,
+            'catch_up': self.catch_up,
+            'rows_processed': self.rows_processed,
+            'error': self.error,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+            'duration_ms': self.duration_ms
+        }
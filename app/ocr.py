@@ -4,17 +4,42 @@ Extracts text from images and PDFs for searchability
 Security: All file paths validated before processing
 """
 import os
-import tempfile
+import time
+import hashlib
+import logging
+import subprocess
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from flask import has_app_context
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
 from PIL import Image
 import pytesseract
-from pdf2image import convert_from_path
+from pdf2image import convert_from_path, pdfinfo_from_path
 import cv2
 import numpy as np
 
+logger = logging.getLogger(__name__)
+
+OCR_LANG = 'eng+ron'  # Support both English and Romanian
+OCR_CONFIG = '--psm 6'  # Assume uniform block of text
+# Bump whenever the preprocessing pipeline changes so cached OCR results are recomputed
+PREPROCESS_VERSION = 2
+
+# Adaptive preprocessing: cheap binarization first, denoising only when needed
+TARGET_DPI = 300
+MAX_IMAGE_SIDE = 3508  # Long side of an A4 page at 300 DPI
+MIN_CONFIDENCE = 70  # Mean Tesseract word confidence (0-100) accepted without escalation
+
+_stage_timings = defaultdict(lambda: [0, 0.0])
+_stage_timings_lock = threading.Lock()
+
 
 def preprocess_image(image):
     """
-    Preprocess image to improve OCR accuracy
+    Full (expensive) preprocessing, used when cheap binarization gives low confidence
     - Convert to grayscale
     - Apply adaptive thresholding
     - Denoise
@@ -45,6 +70,124 @@ def preprocess_image(image):
         return image
 
 
+def _record_stage(stage, started):
+    """Add a stage duration (ms) to the in-process timing totals; returns it"""
+    elapsed = (time.perf_counter() - started) * 1000
+    with _stage_timings_lock:
+        totals = _stage_timings[stage]
+        totals[0] += 1
+        totals[1] += elapsed
+    return elapsed
+
+
+def get_stage_timings():
+    """Per-stage OCR timing totals since process start"""
+    with _stage_timings_lock:
+        return {
+            stage: {
+                'count': count,
+                'total_ms': round(total, 1),
+                'avg_ms': round(total / count, 1) if count else 0
+            }
+            for stage, (count, total) in _stage_timings.items()
+        }
+
+
+def downscale_image(image):
+    """
+    Convert to grayscale and shrink images scanned/photographed above the
+    target DPI (OCR gains nothing past it)
+    """
+    dpi = image.info.get('dpi')
+    scale = 1.0
+    if dpi and dpi[0] and dpi[0] > TARGET_DPI:
+        scale = TARGET_DPI / float(dpi[0])
+    longest = max(image.size)
+    if longest * scale > MAX_IMAGE_SIDE:
+        scale = MAX_IMAGE_SIDE / float(longest)
+    gray = image if image.mode == 'L' else image.convert('L')
+    if scale >= 1.0:
+        return gray
+    size = (max(1, int(image.width * scale)), max(1, int(image.height * scale)))
+    # INTER_AREA is both fast and the best filter for shrinking text
+    return Image.fromarray(cv2.resize(np.array(gray), size, interpolation=cv2.INTER_AREA))
+
+
+def binarize_image(image):
+    """Cheap preprocessing: grayscale + global Otsu threshold"""
+    img_array = np.array(image.convert('L'))
+    _, thresh = cv2.threshold(img_array, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    return Image.fromarray(thresh)
+
+
+def ocr_with_confidence(image):
+    """
+    Run Tesseract once, returning (text, mean word confidence 0-100)
+    Text is rebuilt line by line from image_to_data, like image_to_string
+    """
+    data = pytesseract.image_to_data(
+        image,
+        lang=OCR_LANG,
+        config=OCR_CONFIG,
+        output_type=pytesseract.Output.DICT
+    )
+    lines = {}
+    confidences = []
+    for i, word in enumerate(data['text']):
+        word = (word or '').strip()
+        conf = float(data['conf'][i])
+        if not word or conf < 0:
+            continue
+        key = (data['block_num'][i], data['par_num'][i], data['line_num'][i])
+        lines.setdefault(key, []).append(word)
+        confidences.append(conf)
+    text = "\n".join(" ".join(words) for _, words in sorted(lines.items()))
+    confidence = sum(confidences) / len(confidences) if confidences else 0.0
+    return text, confidence
+
+
+def ocr_image(image):
+    """
+    Tiered OCR for one image: downscale -> cheap binarization -> OCR, escalating to
+    adaptive threshold + denoising only when the cheap pass has low confidence
+    Returns: (text, info) where info holds the confidence and per-stage timings (ms)
+    """
+    timings = {}
+
+    started = time.perf_counter()
+    image = downscale_image(image)
+    timings['downscale'] = _record_stage('downscale', started)
+
+    started = time.perf_counter()
+    cheap = binarize_image(image)
+    timings['binarize'] = _record_stage('binarize', started)
+
+    started = time.perf_counter()
+    text, confidence = ocr_with_confidence(cheap)
+    timings['ocr_fast'] = _record_stage('ocr_fast', started)
+
+    escalated = confidence < MIN_CONFIDENCE
+    if escalated:
+        started = time.perf_counter()
+        denoised = preprocess_image(image)
+        timings['denoise'] = _record_stage('denoise', started)
+
+        started = time.perf_counter()
+        slow_text, slow_confidence = ocr_with_confidence(denoised)
+        timings['ocr_full'] = _record_stage('ocr_full', started)
+
+        if slow_confidence >= confidence:
+            text, confidence = slow_text, slow_confidence
+
+    info = {
+        'confidence': round(confidence, 1),
+        'escalated': escalated,
+        'timings_ms': {stage: round(ms, 1) for stage, ms in timings.items()}
+    }
+    logger.debug(f"OCR image: {info}")
+    return text.strip(), info
+
+
 def extract_text_from_image(image_path):
     """
     Extract text from an image file using OCR
@@ -58,27 +201,87 @@ def extract_text_from_image(image_path):
             print(f"Image file not found: {image_path}")
             return ""
         
-        # Open and preprocess image
+        # Open and OCR image (preprocessing escalates only when needed)
         image = Image.open(image_path)
-        preprocessed = preprocess_image(image)
-        
-        # Extract text using Tesseract with English + Romanian
-        text = pytesseract.image_to_string(
-            preprocessed,
-            lang='eng+ron',  # Support both English and Romanian
-            config='--psm 6'  # Assume uniform block of text
-        )
+        text, _ = ocr_image(image)
         
-        return text.strip()
+        return text
     except Exception as e:
         print(f"Error extracting text from image {image_path}: {str(e)}")
         return ""
 
 
+# Only the first pages are OCRed to bound the work per upload
+MAX_PDF_PAGES = 10
+PDF_DPI = 300
+# A page with at least this much embedded text is not OCRed
+MIN_TEXT_LAYER_CHARS = 20
+
+_page_pool = None
+_page_pool_lock = threading.Lock()
+
+
+def _get_page_pool():
+    """
+    Shared pool for page OCR, sized to the CPU count (OCR_PAGE_WORKERS overrides)
+    Threads are enough: rasterizing (pdftoppm) and Tesseract run as separate
+    processes and OpenCV releases the GIL, so pages still use all cores
+    """
+    global _page_pool
+    with _page_pool_lock:
+        if _page_pool is None:
+            workers = int(os.environ.get('OCR_PAGE_WORKERS', 0)) or os.cpu_count() or 1
+            # Pages already run in parallel; keep each Tesseract process single-threaded
+            os.environ.setdefault('OMP_THREAD_LIMIT', '1')
+            _page_pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='ocr-page')
+        return _page_pool
+
+
+def extract_pdf_text_layer(pdf_path, last_page):
+    """
+    Read the embedded text of each page with poppler's pdftotext
+    Returns: list of page texts (empty strings for image-only pages), or [] on failure
+    """
+    try:
+        result = subprocess.run(
+            ['pdftotext', '-layout', '-f', '1', '-l', str(last_page), pdf_path, '-'],
+            capture_output=True, timeout=60, check=True
+        )
+    except (OSError, subprocess.SubprocessError) as e:
+        print(f"Could not read PDF text layer of {pdf_path}: {str(e)}")
+        return []
+    # pdftotext ends every page with a form feed
+    pages = result.stdout.decode('utf-8', errors='replace').split('\f')
+    return [page.strip() for page in pages[:last_page]]
+
+
+def ocr_pdf_page(pdf_path, page_number, dpi=PDF_DPI):
+    """
+    Rasterize and OCR a single PDF page
+    Only this page's bitmap is held in memory
+    """
+    pages = convert_from_path(pdf_path, first_page=page_number, last_page=page_number, dpi=dpi)
+    if not pages:
+        return ""
+    text, _ = ocr_image(pages[0])
+    return text
+
+
+def _ocr_pages(pdf_path, page_numbers):
+    """OCR pages in parallel; returns {page_number: text}"""
+    if len(page_numbers) <= 1:
+        return {page: ocr_pdf_page(pdf_path, page) for page in page_numbers}
+    
+    pool = _get_page_pool()
+    futures = {page: pool.submit(ocr_pdf_page, pdf_path, page) for page in page_numbers}
+    return {page: future.result() for page, future in futures.items()}
+
+
 def extract_text_from_pdf(pdf_path):
     """
-    Extract text from a PDF file using OCR
-    Converts PDF pages to images, then applies OCR
+    Extract text from a PDF file
+    Pages with an embedded text layer are read directly; the rest are
+    rasterized one page at a time and OCRed in parallel
     Security: Validates file exists and is readable
     Returns: Extracted text or empty string on failure
     """
@@ -88,30 +291,80 @@ def extract_text_from_pdf(pdf_path):
             print(f"PDF file not found: {pdf_path}")
             return ""
         
-        # Convert PDF to images (first 10 pages max to avoid memory issues)
-        pages = convert_from_path(pdf_path, first_page=1, last_page=10, dpi=300)
-        
-        extracted_text = []
-        for i, page in enumerate(pages):
-            # Preprocess page
-            preprocessed = preprocess_image(page)
-            
-            # Extract text
-            text = pytesseract.image_to_string(
-                preprocessed,
-                lang='eng+ron',
-                config='--psm 6'
-            )
-            
-            if text.strip():
-                extracted_text.append(f"--- Page {i+1} ---\n{text.strip()}")
-        
-        return "\n\n".join(extracted_text)
+        page_count = min(pdfinfo_from_path(pdf_path).get('Pages', 0), MAX_PDF_PAGES)
+        
+        # Fast path: digitally generated PDFs (most bank statements) need no OCR
+        texts = extract_pdf_text_layer(pdf_path, page_count)
+        texts += [""] * (page_count - len(texts))
+        
+        scanned = [i + 1 for i, text in enumerate(texts) if len(text) < MIN_TEXT_LAYER_CHARS]
+        for page, text in _ocr_pages(pdf_path, scanned).items():
+            texts[page - 1] = text or texts[page - 1]
+        
+        return "\n\n".join(
+            f"--- Page {i+1} ---\n{text}" for i, text in enumerate(texts) if text
+        )
     except Exception as e:
         print(f"Error extracting text from PDF {pdf_path}: {str(e)}")
         return ""
 
 
+def file_digest(file_path):
+    """SHA-256 of a file's bytes, read in chunks"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def ocr_settings_key(file_type):
+    """Everything besides the file bytes that changes the OCR output"""
+    key = f"lang={OCR_LANG};config={OCR_CONFIG};pre={PREPROCESS_VERSION}"
+    if file_type == 'pdf':
+        key += f";dpi={PDF_DPI};pages={MAX_PDF_PAGES}"
+    return key
+
+
+def get_cached_text(digest, settings_key):
+    """
+    Cached OCR text for a file digest, or None (needs an app context)
+    Database errors (e.g. a locked SQLite file) count as a cache miss
+    """
+    from app import db
+    from app.models import OcrResult
+    try:
+        # Own connection: never flush or commit the caller's session
+        with db.engine.connect() as conn:
+            return conn.execute(
+                select(OcrResult.text).where(
+                    OcrResult.file_digest == digest,
+                    OcrResult.settings_key == settings_key
+                )
+            ).scalar()
+    except SQLAlchemyError as e:
+        logger.warning(f"OCR cache lookup failed, running OCR: {e}")
+        return None
+
+
+def store_cached_text(digest, settings_key, text):
+    """Cache OCR text for a file digest; skipped on database errors (the text is still returned)"""
+    from app import db
+    from app.models import OcrResult
+    try:
+        with db.engine.begin() as conn:
+            conn.execute(OcrResult.__table__.insert().values(
+                file_digest=digest,
+                settings_key=settings_key,
+                text=text,
+                created_at=datetime.utcnow()
+            ))
+    except IntegrityError:
+        pass  # Another worker cached the same file first
+    except SQLAlchemyError as e:
+        logger.warning(f"OCR cache store failed, result not cached: {e}")
+
+
 def extract_text_from_file(file_path, file_type):
     """
     Extract text from any supported file type
@@ -137,14 +390,29 @@ def extract_text_from_file(file_path, file_type):
         # Normalize file type
         file_type = file_type.lower().strip('.')
         
-        # Route to appropriate extractor
         if file_type == 'pdf':
-            return extract_text_from_pdf(file_path)
+            extractor = extract_text_from_pdf
         elif file_type in ['png', 'jpg', 'jpeg']:
-            return extract_text_from_image(file_path)
+            extractor = extract_text_from_image
         else:
             print(f"Unsupported file type for OCR: {file_type}")
             return ""
+        
+        # Identical files are only OCRed once (cache needs an app context)
+        use_cache = has_app_context()
+        if use_cache:
+            digest = file_digest(file_path)
+            settings_key = ocr_settings_key(file_type)
+            cached = get_cached_text(digest, settings_key)
+            if cached is not None:
+                return cached
+        
+        text = extractor(file_path)
+        
+        # Empty output is not cached: it is also what a failed extraction returns
+        if use_cache and text:
+            store_cached_text(digest, settings_key, text)
+        return text
     except Exception as e:
         print(f"Error in extract_text_from_file: {str(e)}")
         return ""
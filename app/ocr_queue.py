@@ -0,0 +1,253 @@
+"""
+Persistent OCR job queue
+Uploads only record an OcrJob row; worker threads claim queued jobs from the
+database, run Tesseract out of band and write the text back to the document
+or expense. Because jobs live in the database they survive restarts, and the
+atomic claim lets several gunicorn workers share one queue.
+Security: Jobs only ever update the document/expense they were queued for
+"""
+from app import db
+from app.models import OcrJob, Document, Expense, Category
+from app.ocr import extract_text_from_file, file_digest, get_cached_text, ocr_settings_key
+from sqlalchemy import event, or_
+from datetime import datetime, timedelta
+import logging
+import os
+import threading
+
+logger = logging.getLogger(__name__)
+
+OCR_FILE_TYPES = ('pdf', 'png', 'jpg', 'jpeg')
+MAX_ATTEMPTS = 3
+POLL_SECONDS = 5
+# A job still "processing" after this long belongs to a worker that died
+STALE_AFTER = timedelta(minutes=15)
+
+_wakeup = threading.Event()
+_workers = []
+_workers_lock = threading.Lock()
+
+
+def supports_ocr(file_type):
+    return (file_type or '').lower().strip('.') in OCR_FILE_TYPES
+
+
+def _notify_workers(session):
+    _wakeup.set()
+
+
+def enqueue(target, file_path, file_type, auto_tag=False):
+    """
+    Queue OCR for a Document or Expense (added to the current session, caller commits)
+    Returns: the pending OcrJob
+    """
+    target_type = 'document' if isinstance(target, Document) else 'expense'
+    job = OcrJob(
+        user_id=target.user_id,
+        target_type=target_type,
+        target_id=target.id,
+        file_path=os.path.abspath(file_path),
+        file_type=file_type.lower().strip('.'),
+        auto_tag=auto_tag,
+        status='queued',
+        attempts=0
+    )
+    db.session.add(job)
+    
+    # A file that was OCRed before (same bytes) is resolved right away
+    cached = _cached_text(job)
+    if cached is not None:
+        _apply_text(job, target, cached)
+        return job
+    
+    # Wake a worker once the job is committed and therefore visible to it
+    event.listen(db.session(), 'after_commit', _notify_workers, once=True)
+    return job
+
+
+def _cached_text(job):
+    try:
+        return get_cached_text(file_digest(job.file_path), ocr_settings_key(job.file_type))
+    except OSError:
+        return None
+
+
+def latest_job(target_type, target_id):
+    """Most recent OCR job for a document/expense, or None"""
+    return OcrJob.query.filter_by(
+        target_type=target_type,
+        target_id=target_id
+    ).order_by(OcrJob.id.desc()).first()
+
+
+def _fail_abandoned(now):
+    """
+    Finalize stale processing jobs whose worker died during the last allowed
+    attempt (e.g. killed while OCRing a huge PDF): they are never claimed again
+    """
+    abandoned = OcrJob.query.filter(
+        OcrJob.status == 'processing',
+        OcrJob.started_at < now - STALE_AFTER,
+        OcrJob.attempts >= MAX_ATTEMPTS
+    ).all()
+
+    for job in abandoned:
+        # Conditional update: only one worker finalizes the row
+        failed = OcrJob.query.filter(
+            OcrJob.id == job.id,
+            OcrJob.status == 'processing',
+            OcrJob.started_at < now - STALE_AFTER
+        ).update({
+            'status': 'error',
+            'error': 'OCR worker stopped during the last attempt',
+            'finished_at': now
+        }, synchronize_session=False)
+        if failed:
+            target = _load_target(job)
+            if isinstance(target, Document):
+                target.status = 'error'
+            logger.error(f"OCR job {job.id} abandoned after {job.attempts} attempts")
+        db.session.commit()
+
+
+def _claim_next():
+    """Atomically move the oldest runnable job to processing; returns its id or None"""
+    now = datetime.utcnow()
+    _fail_abandoned(now)
+    candidates = db.session.query(OcrJob.id).filter(
+        or_(
+            OcrJob.status == 'queued',
+            (OcrJob.status == 'processing') & (OcrJob.started_at < now - STALE_AFTER)
+        ),
+        OcrJob.attempts < MAX_ATTEMPTS
+    ).order_by(OcrJob.created_at, OcrJob.id).limit(5).all()
+
+    for (job_id,) in candidates:
+        # Conditional update: only one worker can win the row
+        claimed = OcrJob.query.filter(
+            OcrJob.id == job_id,
+            or_(
+                OcrJob.status == 'queued',
+                (OcrJob.status == 'processing') & (OcrJob.started_at < now - STALE_AFTER)
+            )
+        ).update({
+            'status': 'processing',
+            'started_at': now,
+            'attempts': OcrJob.attempts + 1
+        }, synchronize_session=False)
+        db.session.commit()
+        if claimed:
+            return job_id
+    return None
+
+
+def _load_target(job):
+    model = Document if job.target_type == 'document' else Expense
+    return model.query.filter_by(id=job.target_id, user_id=job.user_id).first()
+
+
+def _auto_tag(expense, text):
+    from app.auto_tagger import suggest_tags_for_expense
+    from app.routes.expenses import apply_suggested_tags
+
+    category = db.session.get(Category, expense.category_id)
+    suggested = suggest_tags_for_expense(
+        description=expense.description,
+        ocr_text=text,
+        category_name=category.name if category else None
+    )
+    apply_suggested_tags(expense, suggested)
+
+
+def _finish(job, status, error=None):
+    job.status = status
+    job.error = error[:500] if error else None
+    job.finished_at = datetime.utcnow()
+
+
+def _apply_text(job, target, text):
+    """Store OCR output on the job's target and mark the job done"""
+    if isinstance(target, Document):
+        target.ocr_text = text
+        target.status = 'analyzed'
+    else:
+        target.receipt_ocr_text = text
+        if job.auto_tag and text:
+            _auto_tag(target, text)
+
+    job.text_length = len(text)
+    _finish(job, 'done')
+
+
+def process_job(job_id):
+    """Run OCR for one claimed job and store the result on its target"""
+    job = db.session.get(OcrJob, job_id)
+    target = _load_target(job)
+    if target is None:
+        _finish(job, 'error', 'Target no longer exists')
+        db.session.commit()
+        return
+
+    if isinstance(target, Document):
+        target.status = 'processing'
+        db.session.commit()
+
+    try:
+        if not os.path.exists(job.file_path):
+            raise FileNotFoundError(f'File not found: {os.path.basename(job.file_path)}')
+
+        text = extract_text_from_file(job.file_path, job.file_type)
+        _apply_text(job, target, text)
+        db.session.commit()
+        logger.info(f"OCR job {job.id}: extracted {len(text)} characters from {job.target_type} {job.target_id}")
+    except Exception as e:
+        db.session.rollback()
+        job = db.session.get(OcrJob, job_id)
+        retry = job.attempts < MAX_ATTEMPTS and not isinstance(e, FileNotFoundError)
+        if retry:
+            job.status = 'queued'
+            job.error = str(e)[:500]
+        else:
+            _finish(job, 'error', str(e))
+            target = _load_target(job)
+            if isinstance(target, Document):
+                target.status = 'error'
+        db.session.commit()
+        logger.error(f"OCR job {job_id} failed: {e}")
+
+
+def run_pending(limit=None):
+    """Process queued jobs until the queue is empty (or limit jobs ran); returns count"""
+    processed = 0
+    while limit is None or processed < limit:
+        job_id = _claim_next()
+        if job_id is None:
+            break
+        process_job(job_id)
+        processed += 1
+    return processed
+
+
+def _worker_loop(app):
+    while True:
+        _wakeup.wait(POLL_SECONDS)
+        _wakeup.clear()
+        try:
+            with app.app_context():
+                run_pending()
+        except Exception as e:
+            logger.error(f"OCR worker error: {e}")
+
+
+def start_workers(app, count=None):
+    """Start the OCR worker threads for this process (once per process)"""
+    if count is None:
+        count = app.config.get('OCR_WORKERS', 1)
+    with _workers_lock:
+        if _workers or count <= 0:
+            return
+        for i in range(count):
+            worker = threading.Thread(target=_worker_loop, args=(app,), name=f'ocr-worker-{i}', daemon=True)
+            worker.start()
+            _workers.append(worker)
+    logger.info(f"OCR queue started with {count} worker thread(s)")
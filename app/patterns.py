@@ -0,0 +1,357 @@
+"""
+Incremental index of repeated expenses for recurring/subscription detection
+Every expense write moves the expense into the expense_patterns row of its
+(normalized description, amount bucket, category) key inside the same flush,
+so detection reads a handful of small candidate rows instead of reloading and
+re-normalizing six months of expenses on every request.
+Bulk SQL deletes bypass the ORM and must call clear_user()/rebuild() instead;
+bulk_insert_mappings() callers use record_bulk_insert().
+Security: All queries filtered by user_id
+"""
+from app import db
+from app.models import Expense, ExpensePattern
+from sqlalchemy import event, select, bindparam
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import get_history, PASSIVE_NO_INITIALIZE
+from dateutil.relativedelta import relativedelta
+from collections import defaultdict, namedtuple
+from datetime import datetime
+import json
+import re
+
+# Amount bucket widths: recurring detection groups by 10 currency units, subscriptions by 5
+BUCKET_SIZES = (5, 10)
+# Detection only looks at recent history; older occurrences are dropped from the index
+WINDOW = relativedelta(months=6)
+LOOKUP_CHUNK = 500
+
+_TRACKED_FIELDS = ('user_id', 'description', 'amount', 'category_id', 'date', 'currency')
+_PENDING = 'expense_patterns_pending'
+_NON_LETTERS = re.compile(r'[^a-z\s]')
+
+Occurrence = namedtuple('Occurrence', 'id date amount description currency category_id')
+Pattern = namedtuple('Pattern', 'normalized_description amount_bucket category_id occurrences')
+
+
+def normalize_description(description):
+    """Lowercase and drop digits/punctuation so 'Netflix #0423' and 'NETFLIX' group together"""
+    return _NON_LETTERS.sub('', description.lower()).strip()
+
+
+def _pattern_keys(user_id, description, amount, category_id):
+    normalized = normalize_description(description)
+    return [
+        (user_id, size, normalized, round(amount / size) * size, category_id)
+        for size in BUCKET_SIZES
+    ]
+
+
+def _as_datetime(value):
+    if isinstance(value, datetime):
+        return value
+    return datetime(value.year, value.month, value.day)
+
+
+def _entry(expense_id, when, amount, description, currency):
+    return [expense_id, _as_datetime(when).isoformat(), float(amount), description, currency]
+
+
+def _entry_date(entry):
+    return datetime.fromisoformat(entry[1])
+
+
+def _add_expense(changes, expense_id, user_id, description, amount, category_id, when, currency):
+    if None in (expense_id, user_id, description, amount, category_id, when):
+        return
+    entry = _entry(expense_id, when, amount, description, currency)
+    for key in _pattern_keys(user_id, description, amount, category_id):
+        changes[key][1][expense_id] = entry
+
+
+def _remove_expense(changes, expense_id, user_id, description, amount, category_id):
+    if None in (user_id, description, amount, category_id):
+        return
+    for key in _pattern_keys(user_id, description, amount, category_id):
+        changes[key][0].add(expense_id)
+
+
+def _new_changes():
+    # key -> (expense ids to remove, {expense id: entry} to add)
+    return defaultdict(lambda: (set(), {}))
+
+
+def _has_tracked_changes(obj):
+    # Unloaded attributes cannot have pending changes, so never trigger a load here
+    return any(
+        get_history(obj, field, passive=PASSIVE_NO_INITIALIZE).has_changes()
+        for field in _TRACKED_FIELDS
+    )
+
+
+def _stored_rows(connection, ids):
+    """Current (pre-flush) values of expenses about to be updated or deleted"""
+    if not ids:
+        return []
+    return connection.execute(
+        select(Expense.id, Expense.user_id, Expense.description, Expense.amount, Expense.category_id)
+        .where(Expense.id.in_(ids))
+    ).all()
+
+
+def _before_flush(session, flush_context, instances):
+    # Always overwrite, so a failed flush never leaves changes behind for the next one
+    session.info[_PENDING] = None
+    if not (session.new or session.dirty or session.deleted):
+        return
+
+    written = [obj for obj in session.new if type(obj) is Expense]
+    stale_ids = []
+    for obj in session.dirty:
+        if type(obj) is Expense and obj.id is not None and _has_tracked_changes(obj):
+            stale_ids.append(obj.id)
+            written.append(obj)
+    for obj in session.deleted:
+        if type(obj) is Expense and obj.id is not None:
+            stale_ids.append(obj.id)
+
+    if written or stale_ids:
+        # New rows only get their ids during the flush, so they are indexed in after_flush
+        session.info[_PENDING] = (_stored_rows(session.connection(), stale_ids), written)
+
+
+def _after_flush(session, flush_context):
+    pending = session.info.pop(_PENDING, None)
+    if not pending:
+        return
+    stored, written = pending
+
+    changes = _new_changes()
+    for row in stored:
+        _remove_expense(changes, row.id, row.user_id, row.description, row.amount, row.category_id)
+    for obj in written:
+        if obj in session.deleted:
+            continue
+        _add_expense(changes, obj.id, obj.user_id, obj.description, obj.amount, obj.category_id,
+                     obj.date, obj.currency)
+    if changes:
+        _apply_changes(session.connection(), changes)
+
+
+def _load_patterns(connection, keys):
+    """Existing pattern rows for the given keys, locked for the rest of the transaction"""
+    names_by_user = defaultdict(set)
+    for user_id, _, normalized, _, _ in keys:
+        names_by_user[user_id].add(normalized)
+
+    loaded = {}
+    for user_id, names in names_by_user.items():
+        names = sorted(names)
+        for start in range(0, len(names), LOOKUP_CHUNK):
+            rows = connection.execute(
+                select(
+                    ExpensePattern.id, ExpensePattern.bucket_size, ExpensePattern.normalized_description,
+                    ExpensePattern.amount_bucket, ExpensePattern.category_id, ExpensePattern.occurrences
+                ).where(
+                    ExpensePattern.user_id == user_id,
+                    ExpensePattern.normalized_description.in_(names[start:start + LOOKUP_CHUNK])
+                ).with_for_update()
+            ).all()
+            for row in rows:
+                key = (user_id, row.bucket_size, row.normalized_description, row.amount_bucket, row.category_id)
+                loaded[key] = (row.id, row.occurrences)
+    return loaded
+
+
+def _insert_statement():
+    """
+    INSERT ... ON CONFLICT DO NOTHING RETURNING id (SQLite 3.35+ and PostgreSQL)
+    No row comes back when the key already exists
+    """
+    table = ExpensePattern.__tablename__
+    return db.text(
+        f"INSERT INTO {table} (user_id, bucket_size, normalized_description, amount_bucket, category_id, "
+        f"occurrence_count, last_date, occurrences) "
+        f"VALUES (:user_id, :bucket_size, :normalized_description, :amount_bucket, :category_id, "
+        f":occurrence_count, :last_date, :occurrences) "
+        f"ON CONFLICT (user_id, bucket_size, normalized_description, amount_bucket, category_id) DO NOTHING "
+        f"RETURNING id"
+    ).bindparams(bindparam('last_date', type_=db.DateTime))
+
+
+def _merge_entries(stored, removed, added, cutoff):
+    """A row's stored occurrences with removed/added expenses applied, oldest first"""
+    entries = [
+        entry for entry in json.loads(stored)
+        if entry[0] not in removed and entry[0] not in added and entry[1] >= cutoff
+    ]
+    entries.extend(entry for entry in added.values() if entry[1] >= cutoff)
+    entries.sort(key=lambda entry: (entry[1], entry[0]))
+    return entries
+
+
+def _row_values(entries):
+    return {
+        'occurrence_count': len(entries),
+        'last_date': _entry_date(entries[-1]),
+        'occurrences': json.dumps(entries),
+    }
+
+
+def _update_rows(connection, updates, deletes):
+    table = ExpensePattern.__table__
+    if updates:
+        connection.execute(
+            table.update().where(table.c.id == bindparam('pattern_id')).values(
+                occurrence_count=bindparam('occurrence_count'),
+                last_date=bindparam('last_date'),
+                occurrences=bindparam('occurrences'),
+            ),
+            updates
+        )
+    if deletes:
+        connection.execute(table.delete().where(table.c.id == bindparam('pattern_id')), deletes)
+
+
+def _insert_pattern(connection, key, entries, removed, added, cutoff):
+    """
+    Create the row for a key that did not exist when it was loaded
+    _load_patterns() cannot lock a missing row, so a concurrent transaction
+    may create the same key first; its row is then locked, merged and updated
+    """
+    user_id, bucket_size, normalized, amount_bucket, category_id = key
+    while True:
+        inserted = connection.execute(_insert_statement(), dict(
+            _row_values(entries), user_id=user_id, bucket_size=bucket_size,
+            normalized_description=normalized, amount_bucket=amount_bucket, category_id=category_id
+        )).first()
+        if inserted is not None:
+            return
+
+        existing = _load_patterns(connection, [key]).get(key)
+        if existing is None:
+            continue  # Deleted again in the meantime: insert once more
+        pattern_id, stored = existing
+        merged = _merge_entries(stored, removed, added, cutoff)
+        if merged:
+            _update_rows(connection, [dict(_row_values(merged), pattern_id=pattern_id)], [])
+        else:
+            _update_rows(connection, [], [{'pattern_id': pattern_id}])
+        return
+
+
+def _apply_changes(connection, changes):
+    """Merge removed/added expenses into their pattern rows"""
+    cutoff = (datetime.utcnow() - WINDOW).isoformat()
+    loaded = _load_patterns(connection, list(changes))
+    inserts, updates, deletes = [], [], []
+
+    for key, (removed, added) in changes.items():
+        pattern_id, stored = loaded.get(key, (None, '[]'))
+        entries = _merge_entries(stored, removed, added, cutoff)
+
+        if not entries:
+            if pattern_id is not None:
+                deletes.append({'pattern_id': pattern_id})
+        elif pattern_id is None:
+            inserts.append((key, entries, removed, added))
+        else:
+            updates.append(dict(_row_values(entries), pattern_id=pattern_id))
+
+    _update_rows(connection, updates, deletes)
+    for key, entries, removed, added in inserts:
+        _insert_pattern(connection, key, entries, removed, added, cutoff)
+
+
+def record_bulk_insert(session, rows):
+    """
+    Index expenses inserted with bulk_insert_mappings(return_defaults=True)
+    Bulk inserts skip flush events, so callers account for them explicitly
+    """
+    changes = _new_changes()
+    for row in rows:
+        _add_expense(changes, row.get('id'), row['user_id'], row['description'], row['amount'],
+                     row['category_id'], row['date'], row.get('currency'))
+    if changes:
+        _apply_changes(session.connection(), changes)
+
+
+def register_pattern_listeners():
+    """Hook pattern index maintenance into every ORM flush (idempotent)"""
+    if not event.contains(Session, 'before_flush', _before_flush):
+        event.listen(Session, 'before_flush', _before_flush)
+    if not event.contains(Session, 'after_flush', _after_flush):
+        event.listen(Session, 'after_flush', _after_flush)
+
+
+def candidate_patterns(user_id, bucket_size, min_occurrences, now=None):
+    """
+    Patterns with at least min_occurrences expenses in the detection window
+    Returns: list of Pattern, ordered by first occurrence, each holding its
+    Occurrence tuples oldest first
+    """
+    cutoff = (now or datetime.utcnow()) - WINDOW
+    rows = db.session.query(
+        ExpensePattern.normalized_description, ExpensePattern.amount_bucket,
+        ExpensePattern.category_id, ExpensePattern.occurrences
+    ).filter(
+        ExpensePattern.user_id == user_id,
+        ExpensePattern.bucket_size == bucket_size,
+        ExpensePattern.occurrence_count >= min_occurrences,
+        ExpensePattern.last_date >= cutoff
+    ).all()
+
+    patterns = []
+    for normalized, amount_bucket, category_id, stored in rows:
+        occurrences = []
+        for entry in json.loads(stored):
+            when = _entry_date(entry)
+            # Rows are only pruned when written, so re-apply the window here
+            if when >= cutoff:
+                occurrences.append(Occurrence(entry[0], when, entry[2], entry[3], entry[4], category_id))
+        if len(occurrences) >= min_occurrences:
+            patterns.append(Pattern(normalized, amount_bucket, category_id, occurrences))
+
+    patterns.sort(key=lambda pattern: (pattern.occurrences[0].date, pattern.occurrences[0].id))
+    return patterns
+
+
+def clear_user(user_id):
+    """Remove a user's pattern rows (call after bulk-deleting their expenses)"""
+    db.session.execute(ExpensePattern.__table__.delete().where(ExpensePattern.user_id == user_id))
+
+
+def rebuild(user_id=None):
+    """
+    Recompute the pattern index from the raw expense rows
+    Used for existing databases and after bulk SQL writes
+    """
+    delete = ExpensePattern.__table__.delete()
+    if user_id is not None:
+        delete = delete.where(ExpensePattern.user_id == user_id)
+    db.session.execute(delete)
+
+    source = select(
+        Expense.id, Expense.user_id, Expense.description, Expense.amount,
+        Expense.category_id, Expense.date, Expense.currency
+    ).where(Expense.date >= datetime.utcnow() - WINDOW)
+    if user_id is not None:
+        source = source.where(Expense.user_id == user_id)
+
+    changes = _new_changes()
+    for row in db.session.execute(source):
+        _add_expense(changes, row.id, row.user_id, row.description, row.amount,
+                     row.category_id, row.date, row.currency)
+    if changes:
+        _apply_changes(db.session.connection(), changes)
+    db.session.commit()
+
+
+def ensure_populated():
+    """Build the pattern index once for databases that predate it"""
+    has_patterns = db.session.query(ExpensePattern.id).first() is not None
+    has_rows = db.session.query(Expense.id).filter(
+        Expense.date >= datetime.utcnow() - WINDOW
+    ).first() is not None
+    if has_rows and not has_patterns:
+        print("Migration: Building expense pattern index...")
+        rebuild()
@@ -0,0 +1,187 @@
+"""
+Materialized daily rollups of expense and income totals
+Rollup rows are adjusted inside the same flush (and therefore the same
+transaction) as the expense/income rows they summarize, so every ORM write
+path - routes, CSV import, backup restore, scheduler - keeps them in sync.
+Bulk SQL deletes bypass the ORM and must call clear_user()/rebuild() instead;
+bulk_insert_mappings() callers use record_bulk_insert().
+"""
+from app import db
+from app.models import Expense, Income, DailySpendRollup, DailyIncomeRollup
+from sqlalchemy import event, func, select, bindparam
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import get_history, PASSIVE_NO_INITIALIZE
+from collections import defaultdict
+from datetime import datetime
+
+# model -> (rollup model, grouping column shared by both)
+ROLLUPS = {
+    Expense: (DailySpendRollup, 'category_id'),
+    Income: (DailyIncomeRollup, 'source'),
+}
+
+_TRACKED_FIELDS = ('user_id', 'date', 'amount')
+
+
+def _upsert_statement(rollup, key):
+    """INSERT ... ON CONFLICT DO UPDATE (supported by SQLite 3.24+ and PostgreSQL)"""
+    table = rollup.__tablename__
+    return db.text(
+        f"INSERT INTO {table} (user_id, {key}, day, total, count) "
+        f"VALUES (:user_id, :key, :day, :total, :count) "
+        f"ON CONFLICT (user_id, {key}, day) DO UPDATE SET "
+        f"total = {table}.total + excluded.total, "
+        f"count = {table}.count + excluded.count"
+    ).bindparams(bindparam('day', type_=db.Date))
+
+
+def _has_tracked_changes(obj, key):
+    # Unloaded attributes cannot have pending changes, so never trigger a load here
+    return any(
+        get_history(obj, field, passive=PASSIVE_NO_INITIALIZE).has_changes()
+        for field in _TRACKED_FIELDS + (key,)
+    )
+
+
+def _stored_rows(connection, model, key, ids):
+    """Current (pre-flush) values of rows about to be updated or deleted"""
+    if not ids:
+        return []
+    group_col = getattr(model, key)
+    return connection.execute(
+        select(model.user_id, group_col, model.date, model.amount).where(model.id.in_(ids))
+    ).all()
+
+
+def _add_delta(deltas, user_id, group, when, amount, sign):
+    if user_id is None or group is None or when is None or amount is None:
+        return
+    # CSV import assigns plain dates to the DateTime column
+    day = when.date() if isinstance(when, datetime) else when
+    entry = deltas[(user_id, group, day)]
+    entry[0] += sign * float(amount)
+    entry[1] += sign
+
+
+def _collect_deltas(session, model, key):
+    """Net (total, count) change per (user, group, day) for pending writes of one model"""
+    deltas = defaultdict(lambda: [0.0, 0])
+    stale_ids = []
+
+    for obj in session.new:
+        if type(obj) is not model:
+            continue
+        if obj.date is None:
+            # Pin the column default now so the rollup day matches the stored row
+            obj.date = datetime.utcnow()
+        _add_delta(deltas, obj.user_id, getattr(obj, key), obj.date, obj.amount, 1)
+
+    for obj in session.dirty:
+        if type(obj) is not model or obj.id is None or not _has_tracked_changes(obj, key):
+            continue
+        stale_ids.append(obj.id)
+        _add_delta(deltas, obj.user_id, getattr(obj, key), obj.date, obj.amount, 1)
+
+    for obj in session.deleted:
+        if type(obj) is model and obj.id is not None:
+            stale_ids.append(obj.id)
+
+    for user_id, group, when, amount in _stored_rows(session.connection(), model, key, stale_ids):
+        _add_delta(deltas, user_id, group, when, amount, -1)
+
+    return deltas
+
+
+def _apply_deltas(connection, rollup, key, deltas):
+    params = [
+        {'user_id': user_id, 'key': group, 'day': day, 'total': total, 'count': count}
+        for (user_id, group, day), (total, count) in deltas.items()
+        if count != 0 or abs(total) > 1e-9
+    ]
+    if not params:
+        return
+    connection.execute(_upsert_statement(rollup, key), params)
+    # Drop days that no longer have any rows
+    user_ids = {p['user_id'] for p in params}
+    connection.execute(
+        rollup.__table__.delete().where(rollup.user_id.in_(user_ids), rollup.count <= 0)
+    )
+
+
+def _before_flush(session, flush_context, instances):
+    if not (session.new or session.dirty or session.deleted):
+        return
+    for model, (rollup, key) in ROLLUPS.items():
+        deltas = _collect_deltas(session, model, key)
+        if deltas:
+            _apply_deltas(session.connection(), rollup, key, deltas)
+
+
+def record_bulk_insert(session, model, rows):
+    """
+    Add rollups for rows inserted with bulk_insert_mappings()
+    Bulk inserts skip flush events, so callers account for them explicitly
+    """
+    rollup, key = ROLLUPS[model]
+    deltas = defaultdict(lambda: [0.0, 0])
+    for row in rows:
+        _add_delta(deltas, row['user_id'], row.get(key), row['date'], row['amount'], 1)
+    if deltas:
+        _apply_deltas(session.connection(), rollup, key, deltas)
+
+
+def register_rollup_listeners():
+    """Hook rollup maintenance into every ORM flush (idempotent)"""
+    if not event.contains(Session, 'before_flush', _before_flush):
+        event.listen(Session, 'before_flush', _before_flush)
+
+
+def clear_user(user_id):
+    """Remove a user's rollup rows (call after bulk-deleting their expenses/income)"""
+    for rollup, _ in ROLLUPS.values():
+        db.session.execute(rollup.__table__.delete().where(rollup.user_id == user_id))
+
+
+def rebuild(user_id=None):
+    """
+    Recompute rollups from the raw expense/income rows
+    Used for existing databases and after bulk SQL writes
+    """
+    for model, (rollup, key) in ROLLUPS.items():
+        delete = rollup.__table__.delete()
+        if user_id is not None:
+            delete = delete.where(rollup.user_id == user_id)
+        db.session.execute(delete)
+
+        group_col = getattr(model, key)
+        day = func.date(model.date)
+        source = select(
+            model.user_id,
+            group_col,
+            day,
+            func.sum(model.amount),
+            func.count(model.id)
+        ).where(model.date.isnot(None), group_col.isnot(None))
+        if user_id is not None:
+            source = source.where(model.user_id == user_id)
+        source = source.group_by(model.user_id, group_col, day)
+
+        db.session.execute(
+            rollup.__table__.insert().from_select(
+                ['user_id', key, 'day', 'total', 'count'], source
+            )
+        )
+    db.session.commit()
+
+
+def ensure_populated():
+    """Build the rollups once for databases that predate them"""
+    for model, (rollup, key) in ROLLUPS.items():
+        has_rollups = db.session.query(rollup.id).first() is not None
+        has_rows = db.session.query(model.id).filter(
+            model.date.isnot(None), getattr(model, key).isnot(None)
+        ).first() is not None
+        if has_rows and not has_rollups:
+            print("Migration: Building daily spend/income rollups...")
+            rebuild()
+            return
@@ -1,8 +1,9 @@
-from flask import Blueprint, request, jsonify, url_for
+from flask import Blueprint, request, jsonify, url_for, current_app, Response
 from flask_login import login_required, current_user
-from app import db, bcrypt
-from app.models import User, Expense, Category
+from app import db, bcrypt, limiter
+from app.models import User, Expense, Category, JobRun
 from functools import wraps
+import hmac
 
 bp = Blueprint('admin', __name__, url_prefix='/api/admin')
 
@@ -274,3 +275,57 @@ def get_security_logs():
             'ADMIN_VIEW_LOGS', 'ADMIN_ACTION'
         ]
     })
+
+
+@bp.route('/jobs', methods=['GET'])
+@login_required
+@admin_required
+def get_job_runs():
+    """
+    Background job telemetry: per-job summary and the most recent runs
+    Optional filter: ?job=<job name>
+    """
+    from app import job_runs
+    
+    limit = min(request.args.get('limit', 50, type=int), 500)
+    job_name = request.args.get('job')
+    
+    query = JobRun.query
+    if job_name:
+        query = query.filter(JobRun.job_name == job_name)
+    runs = query.order_by(JobRun.started_at.desc()).limit(limit).all()
+    
+    return jsonify({
+        'jobs': job_runs.job_summary(),
+        'runs': [run.to_dict() for run in runs]
+    })
+
+
+def _metrics_token_valid():
+    token = current_app.config.get('METRICS_TOKEN')
+    if not token:
+        return False
+    supplied = request.headers.get('Authorization', '')
+    return hmac.compare_digest(supplied.encode(), f'Bearer {token}'.encode())
+
+
+def metrics_auth(f):
+    """Admin session, or 'Authorization: Bearer <METRICS_TOKEN>' for Prometheus scrapers"""
+    protected = login_required(admin_required(f))
+    
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if _metrics_token_valid():
+            return f(*args, **kwargs)
+        return protected(*args, **kwargs)
+    return decorated_function
+
+
+@bp.route('/metrics', methods=['GET'])
+@limiter.limit("120 per minute")  # Replaces the app-wide 50/hour: scrapers poll every 15-60s
+@metrics_auth
+def get_metrics():
+    """Job metrics in the Prometheus text exposition format"""
+    from app import job_runs
+    
+    return Response(job_runs.render_metrics(), mimetype='text/plain; version=0.0.4')
@@ -10,97 +10,18 @@ from flask import Blueprint, request, jsonify
 from flask_login import login_required, current_user
 from app import db
 from app.models import Expense, Category
+from app.cache import cached_response
+from app.analyzer_kernel import (
+    SMALL_PURCHASE_PATTERNS, DAY_NAMES, NEED, WANT, NEUTRAL, NO_SMALL_PURCHASE,
+    classify_text, load_frame, total
+)
 from datetime import datetime, timedelta
 from sqlalchemy import func, and_, extract
-from collections import defaultdict
+import numpy as np
 import re
 
 bp = Blueprint('analyzer', __name__, url_prefix='/api/analyzer')
 
-# Categories that are typically "wants" vs "needs"
-WANTS_CATEGORIES = [
-    'entertainment', 'gaming', 'streaming', 'subscriptions', 'hobbies',
-    'shopping', 'fashion', 'clothing', 'accessories', 'jewelry',
-    'dining out', 'restaurants', 'fast food', 'coffee', 'takeaway',
-    'alcohol', 'tobacco', 'vaping', 'leisure', 'sports', 'gym',
-    'beauty', 'cosmetics', 'spa', 'wellness', 'luxury',
-    'gadgets', 'electronics', 'tech', 'gifts', 'donations',
-    'travel', 'vacation', 'holidays'
-]
-
-NEEDS_CATEGORIES = [
-    'groceries', 'food', 'supermarket', 'rent', 'mortgage', 'housing',
-    'utilities', 'electricity', 'gas', 'water', 'internet', 'phone',
-    'insurance', 'health', 'medical', 'healthcare', 'pharmacy',
-    'transportation', 'fuel', 'petrol', 'gas station', 'public transit',
-    'education', 'childcare', 'school', 'tuition', 'savings',
-    'debt', 'loan', 'bills'
-]
-
-# Small purchase patterns that add up
-SMALL_PURCHASE_PATTERNS = {
-    'coffee': {
-        'patterns': ['coffee', 'starbucks', 'costa', 'nero', 'pret', 'cafe', 'espresso', 'latte', 'cappuccino', 'tim hortons', 'dunkin'],
-        'icon': 'coffee',
-        'typical_yearly_key': 'analyzer.pattern.coffee.typicalYearly',
-        'name_key': 'analyzer.pattern.coffee.name'
-    },
-    'snacks': {
-        'patterns': ['snack', 'candy', 'chocolate', 'crisps', 'chips', 'sweets', 'vending', 'convenience'],
-        'icon': 'cookie',
-        'typical_yearly_key': 'analyzer.pattern.snacks.typicalYearly',
-        'name_key': 'analyzer.pattern.snacks.name'
-    },
-    'takeaway': {
-        'patterns': ['deliveroo', 'uber eats', 'just eat', 'doordash', 'grubhub', 'takeaway', 'takeout', 'delivery'],
-        'icon': 'delivery_dining',
-        'typical_yearly_key': 'analyzer.pattern.takeaway.typicalYearly',
-        'name_key': 'analyzer.pattern.takeaway.name'
-    },
-    'fast_food': {
-        'patterns': ['mcdonald', 'burger king', 'kfc', 'wendy', 'taco bell', 'subway', 'chipotle', 'five guys', 'nando', 'greggs'],
-        'icon': 'fastfood',
-        'typical_yearly_key': 'analyzer.pattern.fastFood.typicalYearly',
-        'name_key': 'analyzer.pattern.fastFood.name'
-    },
-    'drinks': {
-        'patterns': ['pub', 'bar', 'beer', 'wine', 'spirits', 'alcohol', 'cocktail', 'nightclub'],
-        'icon': 'local_bar',
-        'typical_yearly_key': 'analyzer.pattern.drinks.typicalYearly',
-        'name_key': 'analyzer.pattern.drinks.name'
-    },
-    'lottery': {
-        'patterns': ['lottery', 'lotto', 'scratch', 'betting', 'gambling', 'casino', 'bet365', 'ladbrokes', 'william hill'],
-        'icon': 'casino',
-        'typical_yearly_key': 'analyzer.pattern.lottery.typicalYearly',
-        'name_key': 'analyzer.pattern.lottery.name'
-    },
-    'streaming': {
-        'patterns': ['netflix', 'spotify', 'disney', 'hulu', 'prime video', 'youtube premium', 'apple music'],
-        'icon': 'subscriptions',
-        'typical_yearly_key': 'analyzer.pattern.streaming.typicalYearly',
-        'name_key': 'analyzer.pattern.streaming.name'
-    },
-    'impulse_online': {
-        'patterns': ['amazon', 'ebay', 'aliexpress', 'wish', 'shein', 'asos', 'zalando'],
-        'icon': 'shopping_cart',
-        'typical_yearly_key': 'analyzer.pattern.impulseOnline.typicalYearly',
-        'name_key': 'analyzer.pattern.impulseOnline.name'
-    },
-    'bottled_drinks': {
-        'patterns': ['water bottle', 'soft drink', 'soda', 'energy drink', 'red bull', 'monster', 'lucozade', 'coca cola'],
-        'icon': 'local_drink',
-        'typical_yearly_key': 'analyzer.pattern.bottledDrinks.typicalYearly',
-        'name_key': 'analyzer.pattern.bottledDrinks.name'
-    },
-    'apps_games': {
-        'patterns': ['app store', 'google play', 'in-app', 'game purchase', 'steam', 'playstation store', 'xbox'],
-        'icon': 'sports_esports',
-        'typical_yearly_key': 'analyzer.pattern.appsGames.typicalYearly',
-        'name_key': 'analyzer.pattern.appsGames.name'
-    }
-}
-
 # Investment return projections
 INVESTMENT_PROJECTIONS = {
     '1_year': {'rate': 0.07, 'label': '1 Year (7% return)'},
@@ -113,80 +34,18 @@ INVESTMENT_PROJECTIONS = {
 
 def categorize_expense_type(description, category_name):
     """Determine if an expense is a 'want' or 'need'"""
-    description_lower = description.lower() if description else ''
-    category_lower = category_name.lower() if category_name else ''
-    
-    # Check against wants patterns
-    for want in WANTS_CATEGORIES:
-        if want in description_lower or want in category_lower:
-            return 'want'
+    description_class = classify_text(description)
+    category_class = classify_text(category_name)
     
-    # Check against needs patterns
-    for need in NEEDS_CATEGORIES:
-        if need in description_lower or need in category_lower:
-            return 'need'
+    if description_class.want or category_class.want:
+        return 'want'
+    if description_class.need or category_class.need:
+        return 'need'
     
     # Default to neutral/need for safety
     return 'neutral'
 
 
-def detect_small_purchase_type(description):
-    """Detect what type of small purchase this is"""
-    description_lower = description.lower() if description else ''
-    
-    for purchase_type, config in SMALL_PURCHASE_PATTERNS.items():
-        for pattern in config['patterns']:
-            if pattern in description_lower:
-                return {
-                    'type': purchase_type,
-                    'icon': config['icon'],
-                    'typical_yearly_key': config['typical_yearly_key'],
-                    'name_key': config['name_key']
-                }
-    
-    return None
-
-
-def is_impulse_purchase(expense, all_expenses_in_day):
-    """
-    Detect if a purchase might be an impulse buy based on:
-    - Multiple purchases on same day
-    - Weekend purchases
-    - Late night (if we had time data)
-    - Common impulse categories
-    """
-    impulse_indicators = 0
-    reasons = []
-    
-    # Multiple purchases on same day
-    if len(all_expenses_in_day) > 3:
-        impulse_indicators += 1
-        reasons.append('multiple_same_day')
-    
-    # Weekend purchase
-    if expense.date.weekday() >= 5:  # Saturday=5, Sunday=6
-        impulse_indicators += 0.5
-        reasons.append('weekend')
-    
-    # Small amount (under threshold)
-    if expense.amount < 30:
-        impulse_indicators += 0.5
-        reasons.append('small_amount')
-    
-    # Common impulse categories/keywords
-    impulse_keywords = ['amazon', 'ebay', 'online', 'shopping', 'fashion', 'sale', 'clearance', 'deal']
-    description_lower = expense.description.lower() if expense.description else ''
-    if any(keyword in description_lower for keyword in impulse_keywords):
-        impulse_indicators += 1
-        reasons.append('impulse_keywords')
-    
-    return {
-        'is_impulse': impulse_indicators >= 1.5,
-        'score': impulse_indicators,
-        'reasons': reasons
-    }
-
-
 def calculate_compound_growth(monthly_savings, years, annual_rate=0.07):
     """Calculate compound growth for monthly investments"""
     months = years * 12
@@ -202,19 +61,14 @@ def calculate_compound_growth(monthly_savings, years, annual_rate=0.07):
 
 @bp.route('/summary', methods=['GET'])
 @login_required
+@cached_response()
 def get_summary():
     """Get overall spending analysis summary"""
     # Get date range (default last 90 days for better analysis)
     days = request.args.get('days', 90, type=int)
-    start_date = datetime.utcnow() - timedelta(days=days)
+    frame = load_frame(current_user.id, days)
     
-    # Get all expenses in range
-    expenses = Expense.query.filter(
-        Expense.user_id == current_user.id,
-        Expense.date >= start_date
-    ).all()
-    
-    if not expenses:
+    if not frame.size:
         return jsonify({
             'success': True,
             'total_analyzed': 0,
@@ -227,70 +81,37 @@ def get_summary():
             'impulse_count': 0
         })
     
-    wants_total = 0
-    needs_total = 0
-    neutral_total = 0
-    small_purchases = defaultdict(lambda: {'count': 0, 'total': 0})
-    impulse_count = 0
-    
-    # Group expenses by date for impulse detection
-    expenses_by_date = defaultdict(list)
-    for exp in expenses:
-        date_key = exp.date.strftime('%Y-%m-%d')
-        expenses_by_date[date_key].append(exp)
-    
-    for expense in expenses:
-        category_name = expense.category.name if expense.category else ''
-        
-        # Categorize as want/need
-        expense_type = categorize_expense_type(expense.description, category_name)
-        if expense_type == 'want':
-            wants_total += expense.amount
-        elif expense_type == 'need':
-            needs_total += expense.amount
-        else:
-            neutral_total += expense.amount
-        
-        # Detect small purchase patterns
-        small_purchase = detect_small_purchase_type(expense.description)
-        if small_purchase:
-            small_purchases[small_purchase['type']]['count'] += 1
-            small_purchases[small_purchase['type']]['total'] += expense.amount
-            small_purchases[small_purchase['type']]['icon'] = small_purchase['icon']
-            small_purchases[small_purchase['type']]['typical_yearly_key'] = small_purchase['typical_yearly_key']
-            small_purchases[small_purchase['type']]['name_key'] = small_purchase['name_key']
-        
-        # Detect impulse purchases
-        date_key = expense.date.strftime('%Y-%m-%d')
-        impulse_result = is_impulse_purchase(expense, expenses_by_date[date_key])
-        if impulse_result['is_impulse']:
-            impulse_count += 1
+    wants_total, needs_total, neutral_total = frame.type_totals()
+    small_purchases = frame.small_purchase_groups()
+    impulse_count = int(frame.impulse.sum())
     
     # Calculate totals and projections
-    total_analyzed = len(expenses)
+    total_analyzed = frame.size
     total_spent = wants_total + needs_total + neutral_total
     wants_percentage = round((wants_total / total_spent * 100), 1) if total_spent > 0 else 0
     
     # Calculate small purchases total and potential yearly savings
-    small_purchases_total = sum(sp['total'] for sp in small_purchases.values())
+    small_purchases_total = sum(group.total for group in small_purchases)
     daily_small_average = small_purchases_total / days
     potential_yearly_savings = round(daily_small_average * 365, 2)
     
     # Get top silly expenses
     top_silly = []
-    for purchase_type, data in sorted(small_purchases.items(), key=lambda x: x[1]['total'], reverse=True)[:5]:
-        daily_average = data['total'] / days
+    for group in sorted(small_purchases, key=lambda x: x.total, reverse=True)[:5]:
+        purchase_type = group.type
+        config = SMALL_PURCHASE_PATTERNS[purchase_type]
+        daily_average = group.total / days
         yearly_projection = round(daily_average * 365, 2)
         top_silly.append({
             'type': purchase_type,
             'type_key': f'analyzer.pattern.{purchase_type.replace("_", "").title().lower()}.name',
-            'icon': data['icon'],
-            'count': data['count'],
-            'total': round(data['total'], 2),
+            'icon': config['icon'],
+            'count': group.count,
+            'total': round(group.total, 2),
             'daily_average': round(daily_average, 2),
             'yearly_projection': yearly_projection,
-            'typical_yearly_key': data.get('typical_yearly_key', ''),
-            'name_key': data.get('name_key', ''),
+            'typical_yearly_key': config['typical_yearly_key'],
+            'name_key': config['name_key'],
             # If saved instead projections
             'if_invested_5yr': calculate_compound_growth(daily_average * 30, 5),
             'if_invested_10yr': calculate_compound_growth(daily_average * 30, 10),
@@ -317,58 +138,44 @@ def get_summary():
 
 @bp.route('/small-purchases', methods=['GET'])
 @login_required
+@cached_response()
 def get_small_purchases():
     """Get detailed breakdown of small frequent purchases"""
     days = request.args.get('days', 90, type=int)
     min_occurrences = request.args.get('min_occurrences', 3, type=int)
-    start_date = datetime.utcnow() - timedelta(days=days)
-    
-    expenses = Expense.query.filter(
-        Expense.user_id == current_user.id,
-        Expense.date >= start_date
-    ).order_by(Expense.date.desc()).all()
-    
-    # Group by pattern
-    patterns = defaultdict(lambda: {'expenses': [], 'total': 0, 'count': 0})
-    
-    for expense in expenses:
-        small_purchase = detect_small_purchase_type(expense.description)
-        if small_purchase:
-            pattern_type = small_purchase['type']
-            patterns[pattern_type]['expenses'].append({
-                'id': expense.id,
-                'description': expense.description,
-                'amount': expense.amount,
-                'date': expense.date.isoformat(),
-                'category': expense.category.name if expense.category else None
-            })
-            patterns[pattern_type]['total'] += expense.amount
-            patterns[pattern_type]['count'] += 1
-            patterns[pattern_type]['icon'] = small_purchase['icon']
-            patterns[pattern_type]['typical_yearly_key'] = small_purchase['typical_yearly_key']
-            patterns[pattern_type]['name_key'] = small_purchase['name_key']
+    frame = load_frame(current_user.id, days)
     
     # Filter by minimum occurrences and calculate projections
     result = []
-    for pattern_type, data in patterns.items():
-        if data['count'] >= min_occurrences:
-            daily_average = data['total'] / days
+    for group in frame.small_purchase_groups(newest_first=True):
+        if group.count >= min_occurrences:
+            config = SMALL_PURCHASE_PATTERNS[group.type]
+            daily_average = group.total / days
             monthly_average = daily_average * 30
             yearly_projection = daily_average * 365
             
+            # Last 10 for display
+            recent_expenses = [{
+                'id': frame.ids[row],
+                'description': frame.descriptions[row],
+                'amount': float(frame.amounts[row]),
+                'date': frame.dates[row].isoformat(),
+                'category': frame.category_names[row]
+            } for row in group.rows[:10]]
+            
             result.append({
-                'type': pattern_type,
-                'type_display_key': data.get('name_key', ''),
-                'icon': data['icon'],
-                'count': data['count'],
-                'total': round(data['total'], 2),
-                'average_per_purchase': round(data['total'] / data['count'], 2),
-                'frequency_per_week': round(data['count'] / (days / 7), 1),
+                'type': group.type,
+                'type_display_key': config['name_key'],
+                'icon': config['icon'],
+                'count': group.count,
+                'total': round(group.total, 2),
+                'average_per_purchase': round(group.total / group.count, 2),
+                'frequency_per_week': round(group.count / (days / 7), 1),
                 'daily_average': round(daily_average, 2),
                 'monthly_average': round(monthly_average, 2),
                 'yearly_projection': round(yearly_projection, 2),
-                'typical_yearly_key': data.get('typical_yearly_key', ''),
-                'recent_expenses': data['expenses'][:10],  # Last 10 for display
+                'typical_yearly_key': config['typical_yearly_key'],
+                'recent_expenses': recent_expenses,
                 'projections': {
                     '5_years': calculate_compound_growth(monthly_average, 5),
                     '10_years': calculate_compound_growth(monthly_average, 10),
@@ -391,69 +198,49 @@ def get_small_purchases():
 
 @bp.route('/needs-wants', methods=['GET'])
 @login_required
+@cached_response()
 def get_needs_wants():
     """Get breakdown of needs vs wants spending"""
     days = request.args.get('days', 90, type=int)
-    start_date = datetime.utcnow() - timedelta(days=days)
-    
-    expenses = Expense.query.filter(
-        Expense.user_id == current_user.id,
-        Expense.date >= start_date
-    ).all()
-    
-    wants = []
-    needs = []
-    neutral = []
-    
-    for expense in expenses:
-        category_name = expense.category.name if expense.category else ''
-        expense_type = categorize_expense_type(expense.description, category_name)
-        
-        expense_data = {
-            'id': expense.id,
-            'description': expense.description,
-            'amount': expense.amount,
-            'date': expense.date.isoformat(),
-            'category': category_name,
-            'category_color': expense.category.color if expense.category else '#666'
+    frame = load_frame(current_user.id, days)
+    
+    def expense_data(row):
+        return {
+            'id': frame.ids[row],
+            'description': frame.descriptions[row],
+            'amount': float(frame.amounts[row]),
+            'date': frame.dates[row].isoformat(),
+            'category': frame.category_name(row),
+            'category_color': frame.category_color(row)
         }
-        
-        if expense_type == 'want':
-            wants.append(expense_data)
-        elif expense_type == 'need':
-            needs.append(expense_data)
-        else:
-            neutral.append(expense_data)
-    
-    wants_total = sum(e['amount'] for e in wants)
-    needs_total = sum(e['amount'] for e in needs)
-    neutral_total = sum(e['amount'] for e in neutral)
+    
+    wants = frame.types == WANT
+    needs = frame.types == NEED
+    wants_total, needs_total, neutral_total = frame.type_totals()
     total = wants_total + needs_total + neutral_total
     
     # Group wants by category for chart
-    wants_by_category = defaultdict(float)
-    for w in wants:
-        wants_by_category[w['category']] += w['amount']
+    wants_by_category = frame.category_totals(wants)
     
     return jsonify({
         'success': True,
         'days_analyzed': days,
         'wants': {
             'total': round(wants_total, 2),
-            'count': len(wants),
+            'count': int(wants.sum()),
             'percentage': round((wants_total / total * 100), 1) if total > 0 else 0,
-            'by_category': [{'category': k, 'total': round(v, 2)} for k, v in sorted(wants_by_category.items(), key=lambda x: x[1], reverse=True)],
-            'items': sorted(wants, key=lambda x: x['amount'], reverse=True)[:20]  # Top 20
+            'by_category': [{'category': k, 'total': round(v, 2)} for k, v in sorted(wants_by_category, key=lambda x: x[1], reverse=True)],
+            'items': [expense_data(row) for row in frame.largest_rows(wants, 20)]  # Top 20
         },
         'needs': {
             'total': round(needs_total, 2),
-            'count': len(needs),
+            'count': int(needs.sum()),
             'percentage': round((needs_total / total * 100), 1) if total > 0 else 0,
-            'items': sorted(needs, key=lambda x: x['amount'], reverse=True)[:20]
+            'items': [expense_data(row) for row in frame.largest_rows(needs, 20)]
         },
         'neutral': {
             'total': round(neutral_total, 2),
-            'count': len(neutral),
+            'count': int((frame.types == NEUTRAL).sum()),
             'percentage': round((neutral_total / total * 100), 1) if total > 0 else 0
         },
         'total': round(total, 2),
@@ -463,103 +250,84 @@ def get_needs_wants():
 
 @bp.route('/impulse', methods=['GET'])
 @login_required
+@cached_response()
 def get_impulse_purchases():
     """Get detected impulse purchases"""
     days = request.args.get('days', 90, type=int)
-    start_date = datetime.utcnow() - timedelta(days=days)
-    
-    expenses = Expense.query.filter(
-        Expense.user_id == current_user.id,
-        Expense.date >= start_date
-    ).all()
+    frame = load_frame(current_user.id, days)
+    
+    # Return translation keys instead of hardcoded strings
+    reason_key_map = {
+        'multiple_same_day': 'analyzer.impulse.reason.multipleSameDay',
+        'weekend': 'analyzer.impulse.reason.weekend',
+        'small_amount': 'analyzer.impulse.reason.smallAmount',
+        'impulse_keywords': 'analyzer.impulse.reason.impulseKeywords'
+    }
     
-    # Group by date
-    expenses_by_date = defaultdict(list)
-    for exp in expenses:
-        date_key = exp.date.strftime('%Y-%m-%d')
-        expenses_by_date[date_key].append(exp)
+    # Sort by impulse score and amount (highest first, ties keep date order)
+    rows = np.flatnonzero(frame.impulse)
+    rows = rows[np.lexsort((-frame.amounts[rows], -frame.impulse_scores[rows]))]
     
     impulse_purchases = []
+    for row in rows[:50]:  # Top 50
+        day_name = DAY_NAMES[frame.weekdays[row]]
+        impulse_purchases.append({
+            'id': frame.ids[row],
+            'description': frame.descriptions[row],
+            'amount': float(frame.amounts[row]),
+            'date': frame.dates[row].isoformat(),
+            'category': frame.category_names[row],
+            'impulse_score': float(frame.impulse_scores[row]),
+            'reason_keys': [reason_key_map.get(r, r) for r in frame.impulse_reasons(row)],
+            'day_of_week': day_name,
+            'day_of_week_key': f"days.{day_name.lower()}"
+        })
     
-    for expense in expenses:
-        date_key = expense.date.strftime('%Y-%m-%d')
-        impulse_result = is_impulse_purchase(expense, expenses_by_date[date_key])
-        
-        if impulse_result['is_impulse']:
-            # Return translation keys instead of hardcoded strings
-            reason_key_map = {
-                'multiple_same_day': 'analyzer.impulse.reason.multipleSameDay',
-                'weekend': 'analyzer.impulse.reason.weekend',
-                'small_amount': 'analyzer.impulse.reason.smallAmount',
-                'impulse_keywords': 'analyzer.impulse.reason.impulseKeywords'
-            }
-            
-            impulse_purchases.append({
-                'id': expense.id,
-                'description': expense.description,
-                'amount': expense.amount,
-                'date': expense.date.isoformat(),
-                'category': expense.category.name if expense.category else None,
-                'impulse_score': impulse_result['score'],
-                'reason_keys': [reason_key_map.get(r, r) for r in impulse_result['reasons']],
-                'day_of_week': expense.date.strftime('%A'),
-                'day_of_week_key': f"days.{expense.date.strftime('%A').lower()}"
-            })
-    
-    # Sort by impulse score and amount
-    impulse_purchases.sort(key=lambda x: (x['impulse_score'], x['amount']), reverse=True)
-    
-    total_impulse = sum(p['amount'] for p in impulse_purchases)
+    total_impulse = total(frame.amounts[rows])
     monthly_impulse = total_impulse / (days / 30)
     
     return jsonify({
         'success': True,
         'days_analyzed': days,
-        'impulse_count': len(impulse_purchases),
+        'impulse_count': len(rows),
         'impulse_total': round(total_impulse, 2),
         'monthly_average': round(monthly_impulse, 2),
         'yearly_projection': round(monthly_impulse * 12, 2),
-        'purchases': impulse_purchases[:50],  # Top 50
-        'by_day_of_week': get_impulse_by_day(impulse_purchases),
+        'purchases': impulse_purchases,
+        'by_day_of_week': get_impulse_by_day(frame, rows),
         'currency': current_user.currency
     })
 
 
-def get_impulse_by_day(impulse_purchases):
-    """Group impulse purchases by day of week"""
-    by_day = defaultdict(lambda: {'count': 0, 'total': 0})
-    
-    for p in impulse_purchases:
-        day = p['day_of_week']
-        by_day[day]['count'] += 1
-        by_day[day]['total'] += p['amount']
+def get_impulse_by_day(frame, rows):
+    """Group impulse purchases (frame rows, in display order) by day of week"""
+    weekdays = frame.weekdays[rows]
+    counts = np.bincount(weekdays, minlength=7)
+    totals = np.bincount(weekdays, weights=frame.amounts[rows], minlength=7)
+    present, first_seen = np.unique(weekdays, return_index=True)
     
     return [
-        {'day': day, 'count': data['count'], 'total': round(data['total'], 2)}
-        for day, data in by_day.items()
+        {'day': DAY_NAMES[day], 'count': int(counts[day]), 'total': round(float(totals[day]), 2)}
+        for day in present[np.argsort(first_seen)]
     ]
 
 
 @bp.route('/projections', methods=['GET'])
 @login_required
+@cached_response()
 def get_savings_projections():
     """Get 'if you saved this instead' projections"""
     days = request.args.get('days', 90, type=int)
     monthly_amount = request.args.get('monthly_amount', type=float)
     
     if not monthly_amount:
-        # Calculate from actual small purchases
+        # Calculate from actual small purchases (classified at write time, so summed in SQL)
         start_date = datetime.utcnow() - timedelta(days=days)
-        expenses = Expense.query.filter(
+        small_total = db.session.query(func.sum(Expense.amount)).filter(
             Expense.user_id == current_user.id,
-            Expense.date >= start_date
-        ).all()
-        
-        small_total = 0
-        for expense in expenses:
-            if detect_small_purchase_type(expense.description):
-                small_total += expense.amount
-        
+            Expense.date >= start_date,
+            Expense.small_purchase_type.isnot(None)
+        ).scalar() or 0
         monthly_amount = (small_total / days) * 30
     
     projections = []
@@ -588,6 +356,7 @@ def get_savings_projections():
 
 @bp.route('/category-analysis', methods=['GET'])
 @login_required
+@cached_response()
 def get_category_analysis():
     """Analyze spending by category with needs/wants classification"""
     days = request.args.get('days', 90, type=int)
@@ -634,17 +403,13 @@ def get_category_analysis():
 
 @bp.route('/insights', methods=['GET'])
 @login_required  
+@cached_response()
 def get_insights():
     """Get personalized spending insights and recommendations"""
     days = request.args.get('days', 90, type=int)
-    start_date = datetime.utcnow() - timedelta(days=days)
+    frame = load_frame(current_user.id, days)
     
-    expenses = Expense.query.filter(
-        Expense.user_id == current_user.id,
-        Expense.date >= start_date
-    ).all()
-    
-    if not expenses:
+    if not frame.size:
         return jsonify({
             'success': True,
             'insights': [],
@@ -656,15 +421,12 @@ def get_insights():
     score = 100  # Start with perfect score
     
     # Analyze spending patterns
-    total_spent = sum(e.amount for e in expenses)
+    total_spent = total(frame.amounts)
     
     # Check small purchases
-    small_total = 0
-    small_count = 0
-    for expense in expenses:
-        if detect_small_purchase_type(expense.description):
-            small_total += expense.amount
-            small_count += 1
+    small = frame.small_types != NO_SMALL_PURCHASE
+    small_total = total(frame.amounts[small])
+    small_count = int(small.sum())
     
     if small_count > 0:
         small_percentage = (small_total / total_spent) * 100
@@ -695,11 +457,7 @@ def get_insights():
             })
     
     # Check wants vs needs ratio
-    wants_total = 0
-    for expense in expenses:
-        category_name = expense.category.name if expense.category else ''
-        if categorize_expense_type(expense.description, category_name) == 'want':
-            wants_total += expense.amount
+    wants_total, _, _ = frame.type_totals()
     
     wants_percentage = (wants_total / total_spent) * 100 if total_spent > 0 else 0
     
@@ -726,20 +484,10 @@ def get_insights():
         })
     
     # Check impulse purchases
-    expenses_by_date = defaultdict(list)
-    for exp in expenses:
-        date_key = exp.date.strftime('%Y-%m-%d')
-        expenses_by_date[date_key].append(exp)
-    
-    impulse_count = 0
-    impulse_total = 0
-    for expense in expenses:
-        date_key = expense.date.strftime('%Y-%m-%d')
-        if is_impulse_purchase(expense, expenses_by_date[date_key])['is_impulse']:
-            impulse_count += 1
-            impulse_total += expense.amount
-    
-    if impulse_count > len(expenses) * 0.2:
+    impulse_count = int(frame.impulse.sum())
+    impulse_total = total(frame.amounts[frame.impulse])
+    
+    if impulse_count > frame.size * 0.2:
         score -= 15
         insights.append({
             'type': 'warning',
@@ -752,7 +500,7 @@ def get_insights():
         })
     
     # Weekend spending analysis
-    weekend_total = sum(e.amount for e in expenses if e.date.weekday() >= 5)
+    weekend_total = total(frame.amounts[frame.weekdays >= 5])
     weekday_total = total_spent - weekend_total
     
     weekend_days = (days / 7) * 2
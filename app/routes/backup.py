@@ -5,7 +5,8 @@ Allows users to export all their data (including files) and import from a backup
 from flask import Blueprint, request, jsonify, Response, current_app, send_file
 from flask_login import login_required, current_user
 from werkzeug.utils import secure_filename
-from app import db
+from app import db, rollups, patterns
+from app.cache import mark_user_changed
 from app.models import (
     User, Category, Expense, Income, Document, RecurringExpense,
     Tag, SavingsGoal, Challenge
@@ -84,6 +85,8 @@ def export_data():
         # Export expenses (with receipt paths)
         expenses = Expense.query.filter_by(user_id=current_user.id).all()
         receipt_files = []
+        # Tag objects of all expenses in one query instead of one per expense
+        tags_by_expense = Expense.tag_objects_for(expenses)
         for exp in expenses:
             expense_data = {
                 'amount': exp.amount,
@@ -101,12 +104,9 @@ def export_data():
                 backup_data['files']['receipts'].append(exp.receipt_path)
             
             # Get tag names from tag objects
-            try:
-                tag_names = [t.name for t in exp.get_tag_objects()]
-                if tag_names:
-                    expense_data['tag_names'] = tag_names
-            except:
-                pass
+            tag_names = [t.name for t in tags_by_expense.get(exp.id, [])]
+            if tag_names:
+                expense_data['tag_names'] = tag_names
             backup_data['expenses'].append(expense_data)
         
         # Export income
@@ -333,6 +333,8 @@ def import_data():
         if mode == 'replace':
             Expense.query.filter_by(user_id=current_user.id).delete()
             Income.query.filter_by(user_id=current_user.id).delete()
+            rollups.clear_user(current_user.id)
+            patterns.clear_user(current_user.id)
             RecurringExpense.query.filter_by(user_id=current_user.id).delete()
             try:
                 Document.query.filter_by(user_id=current_user.id).delete()
@@ -347,6 +349,7 @@ def import_data():
             except:
                 pass
             Category.query.filter_by(user_id=current_user.id).delete()
+            mark_user_changed(db.session, current_user.id)
             db.session.commit()
         
         # Restore files from ZIP if available
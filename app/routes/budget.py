@@ -6,7 +6,7 @@ Security: All queries filtered by user_id
 from flask import Blueprint, request, jsonify
 from flask_login import login_required, current_user
 from app.models import Category, Expense
-from app import db
+from app import db, aggregates
 from datetime import datetime, timedelta
 from sqlalchemy import func
 
@@ -57,9 +57,12 @@ def get_budget_status():
     category_statuses = []
     active_alerts = []
     
+    # Current month spend for all budgeted categories in one grouped query
+    month_spending = aggregates.category_spending(current_user.id, start_of_month)
+    
     for category in categories:
         if category.monthly_budget and category.monthly_budget > 0:
-            status = category.get_budget_status()
+            status = category.get_budget_status(spent=month_spending.get(category.id, 0.0))
             category_statuses.append({
                 'category_id': category.id,
                 'category_name': category.name,
@@ -114,33 +117,20 @@ def get_weekly_summary():
     prev_week_start = week_start - timedelta(days=7)
     
     # Current week spending - Security: filter by user_id
-    current_week_expenses = Expense.query.filter(
-        Expense.user_id == current_user.id,
-        Expense.date >= week_start
-    ).all()
-    
-    week_total = sum(e.amount for e in current_week_expenses)
+    week_total = aggregates.window_total(Expense, current_user.id, week_start)
+    expense_count = aggregates.window_count(Expense, current_user.id, week_start)
     daily_average = week_total / max(1, (now - week_start).days + 1)
     
     # Previous week for comparison
-    prev_week_expenses = Expense.query.filter(
-        Expense.user_id == current_user.id,
-        Expense.date >= prev_week_start,
-        Expense.date < week_start
-    ).all()
-    
-    prev_week_total = sum(e.amount for e in prev_week_expenses)
+    prev_week_total = aggregates.window_total(Expense, current_user.id, prev_week_start, week_start)
     change_percent = 0
     if prev_week_total > 0:
         change_percent = ((week_total - prev_week_total) / prev_week_total) * 100
     
-    # Find top category
-    category_totals = {}
-    for expense in current_week_expenses:
-        if expense.category:
-            category_totals[expense.category.name] = category_totals.get(expense.category.name, 0) + expense.amount
+    # Find top category (breakdown is sorted largest first)
+    category_totals = [cat for cat in aggregates.category_breakdown(current_user.id, week_start) if cat.name]
     
-    top_category = max(category_totals.items(), key=lambda x: x[1]) if category_totals else (None, 0)
+    top_category = (category_totals[0].name, category_totals[0].total) if category_totals else (None, 0)
     
     return jsonify({
         'success': True,
@@ -150,7 +140,7 @@ def get_weekly_summary():
         'change_percent': round(change_percent, 1),
         'top_category': top_category[0] if top_category[0] else 'None',
         'top_category_amount': float(top_category[1]),
-        'expense_count': len(current_week_expenses),
+        'expense_count': expense_count,
         'week_start': week_start.isoformat(),
         'currency': current_user.currency
     })
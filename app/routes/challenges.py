@@ -5,7 +5,7 @@ Security: All queries filtered by user_id to ensure users only see their own dat
 """
 from flask import Blueprint, request, jsonify, current_app
 from flask_login import login_required, current_user
-from app import db
+from app import db, aggregates
 from app.models import (
     Achievement, Challenge, NoSpendDay, UserGamificationStats,
     Expense, SavingsGoal, SavingsContribution
@@ -612,19 +612,11 @@ def get_no_spend_calendar():
         ).all()
         
         # Get all expenses for the month
-        month_start = datetime.combine(first_day, datetime.min.time())
-        month_end = datetime.combine(last_day, datetime.max.time())
-        
-        expenses_by_day = db.session.query(
-            func.date(Expense.date).label('day'),
-            func.sum(Expense.amount).label('total')
-        ).filter(
-            Expense.user_id == current_user.id,
-            Expense.date >= month_start,
-            Expense.date <= month_end
-        ).group_by(func.date(Expense.date)).all()
+        expenses_by_day = aggregates.daily_series(
+            Expense, current_user.id, first_day, last_day + timedelta(days=1)
+        )
         
-        expenses_dict = {str(e.day): e.total for e in expenses_by_day}
+        expenses_dict = {day.isoformat(): total for day, total in expenses_by_day.items()}
         no_spend_dict = {str(n.date): n for n in no_spend_days}
         
         # Build calendar data
@@ -978,64 +970,158 @@ def get_leaderboard():
 # DAILY CHECK (Called by scheduler)
 # ============================================================================
 
+# Nightly no-spend check: longest stretch of missed days it will backfill
+NO_SPEND_BACKFILL_DAYS = 31
+# Streak length at which streak recounting stops
+MAX_NO_SPEND_STREAK = 365
+
+NO_SPEND_STREAK_ACHIEVEMENTS = ((3, 'no_spend_streak_3'), (7, 'no_spend_streak_7'),
+                                (14, 'no_spend_streak_14'), (30, 'no_spend_streak_30'))
+NO_SPEND_TOTAL_ACHIEVEMENTS = ((10, 'no_spend_days_10'), (50, 'no_spend_days_50'),
+                               (100, 'no_spend_days_100'))
+
+
+def _upsert_no_spend_days(rows):
+    """INSERT ... ON CONFLICT DO UPDATE (SQLite 3.24+ and PostgreSQL); keeps intentional flags and notes"""
+    if not rows:
+        return
+    db.session.execute(
+        db.text(
+            "INSERT INTO no_spend_days (user_id, date, status, amount_spent, is_intentional, created_at) "
+            "VALUES (:user_id, :date, :status, :amount_spent, :is_intentional, :created_at) "
+            "ON CONFLICT (user_id, date) DO UPDATE SET "
+            "status = excluded.status, amount_spent = excluded.amount_spent"
+        ).bindparams(db.bindparam('date', type_=db.Date)),
+        rows
+    )
+
+
+def _no_spend_stats(user_ids):
+    """Gamification stats for every user, creating the missing rows in one flush"""
+    stats = {s.user_id: s for s in UserGamificationStats.query.all()}
+    missing = [UserGamificationStats(user_id=user_id) for user_id in user_ids if user_id not in stats]
+    if missing:
+        db.session.add_all(missing)
+        db.session.flush()
+        stats.update((s.user_id, s) for s in missing)
+    return stats
+
+
+def evaluate_no_spend_days(yesterday=None):
+    """
+    Evaluate every user's no-spend days up to yesterday in a fixed number of queries
+    Days missed while the scheduler was down (since each user's last_no_spend_check,
+    at most NO_SPEND_BACKFILL_DAYS) are evaluated in order. Days already evaluated
+    are skipped, so running it twice never double-counts.
+    Returns: number of (user, day) pairs evaluated
+    """
+    from app.models import User
+    
+    if yesterday is None:
+        yesterday = date.today() - timedelta(days=1)
+    earliest = yesterday - timedelta(days=NO_SPEND_BACKFILL_DAYS - 1)
+    
+    user_ids = [user_id for (user_id,) in db.session.query(User.id)]
+    stats = _no_spend_stats(user_ids)
+    
+    first_days = {}
+    for user_id in user_ids:
+        last_check = stats[user_id].last_no_spend_check
+        first_day = last_check + timedelta(days=1) if last_check else yesterday
+        if first_day <= yesterday:
+            first_days[user_id] = max(first_day, earliest)
+    if not first_days:
+        return 0
+    window_start = min(first_days.values())
+    
+    # Per-user spend for every day in the window (whole days come from the rollups)
+    spent_by_day = aggregates.daily_totals_by_user(
+        Expense, aggregates.ALL_USERS,
+        datetime.combine(window_start, datetime.min.time()),
+        datetime.combine(yesterday + timedelta(days=1), datetime.min.time())
+    )
+    
+    # A stored streak only continues if the day before a user's window was a success
+    continued = {
+        (user_id, day) for user_id, day in db.session.query(NoSpendDay.user_id, NoSpendDay.date).filter(
+            NoSpendDay.status == 'success',
+            NoSpendDay.date >= window_start - timedelta(days=1),
+            NoSpendDay.date < yesterday
+        )
+    }
+    
+    now = datetime.utcnow()
+    rows = []
+    awards = {}
+    for user_id, first_day in first_days.items():
+        user_stats = stats[user_id]
+        streak = user_stats.current_no_spend_streak or 0
+        if (user_id, first_day - timedelta(days=1)) not in continued:
+            streak = 0
+        
+        day = first_day
+        while day <= yesterday:
+            total_spent = spent_by_day.get((user_id, day), 0)
+            rows.append({
+                'user_id': user_id,
+                'date': day,
+                'status': 'success' if total_spent == 0 else 'failed',
+                'amount_spent': total_spent,
+                'is_intentional': False,
+                'created_at': now
+            })
+            
+            if total_spent == 0:
+                user_stats.total_no_spend_days = (user_stats.total_no_spend_days or 0) + 1
+                streak = min(streak + 1, MAX_NO_SPEND_STREAK)
+                user_stats.best_no_spend_streak = max(user_stats.best_no_spend_streak or 0, streak)
+                
+                total = user_stats.total_no_spend_days
+                if total == 1:
+                    awards.setdefault((user_id, 'first_no_spend'), 1)
+                for target, code in NO_SPEND_STREAK_ACHIEVEMENTS:
+                    if streak >= target:
+                        awards.setdefault((user_id, code), streak)
+                for target, code in NO_SPEND_TOTAL_ACHIEVEMENTS:
+                    if total >= target:
+                        awards.setdefault((user_id, code), total)
+            else:
+                # Reset streak if failed
+                streak = 0
+            day += timedelta(days=1)
+        
+        user_stats.current_no_spend_streak = streak
+        user_stats.last_no_spend_check = yesterday
+    
+    _upsert_no_spend_days(rows)
+    db.session.commit()
+    
+    # Achievements are rare events: only award the ones not completed yet, with the
+    # progress of the day they were first reached
+    if awards:
+        completed = set(db.session.query(Achievement.user_id, Achievement.code).filter(
+            Achievement.user_id.in_({user_id for user_id, _ in awards}),
+            Achievement.code.in_({code for _, code in awards}),
+            Achievement.is_completed == True
+        ))
+        for (user_id, code), progress in awards.items():
+            if (user_id, code) not in completed:
+                award_achievement(user_id, code, progress)
+    
+    return len(rows)
+
+
 def process_daily_no_spend_check(app):
     """Process end-of-day no-spend check for all users"""
     with app.app_context():
         try:
-            yesterday = date.today() - timedelta(days=1)
-            
-            # Get all users
-            from app.models import User
-            users = User.query.all()
-            
-            for user in users:
-                # Check if yesterday was a no-spend day
-                day_start = datetime.combine(yesterday, datetime.min.time())
-                day_end = datetime.combine(yesterday, datetime.max.time())
-                
-                total_spent = db.session.query(func.sum(Expense.amount)).filter(
-                    Expense.user_id == user.id,
-                    Expense.date >= day_start,
-                    Expense.date <= day_end
-                ).scalar() or 0
-                
-                # Get or create no-spend record
-                no_spend = NoSpendDay.query.filter_by(
-                    user_id=user.id,
-                    date=yesterday
-                ).first()
-                
-                if not no_spend:
-                    no_spend = NoSpendDay(
-                        user_id=user.id,
-                        date=yesterday
-                    )
-                    db.session.add(no_spend)
-                
-                no_spend.amount_spent = total_spent
-                no_spend.status = 'success' if total_spent == 0 else 'failed'
-                
-                # Update stats if successful
-                if total_spent == 0:
-                    stats = get_or_create_stats(user.id)
-                    stats.total_no_spend_days += 1
-                    
-                    # Award first no-spend achievement
-                    if stats.total_no_spend_days == 1:
-                        award_achievement(user.id, 'first_no_spend')
-                    
-                    # Update streak
-                    update_no_spend_streak(user.id)
-                else:
-                    # Reset streak if failed
-                    stats = get_or_create_stats(user.id)
-                    stats.current_no_spend_streak = 0
-            
-            db.session.commit()
-            current_app.logger.info("Daily no-spend check completed")
+            evaluated = evaluate_no_spend_days()
+            current_app.logger.info(f"Daily no-spend check completed ({evaluated} user-days evaluated)")
+            return evaluated
         except Exception as e:
             current_app.logger.error(f"Error in daily no-spend check: {e}")
             db.session.rollback()
+            raise
 
 
 def process_weekly_52_advance(app):
@@ -1048,6 +1134,7 @@ def process_weekly_52_advance(app):
                 is_active=True
             ).all()
             
+            advanced = 0
             for challenge in challenges:
                 # Calculate weeks since start
                 weeks_since_start = (datetime.utcnow() - challenge.start_date).days // 7
@@ -1056,9 +1143,12 @@ def process_weekly_52_advance(app):
                 if weeks_since_start > challenge.current_week:
                     challenge.current_week = min(52, weeks_since_start)
                     challenge.last_check_date = datetime.utcnow()
+                    advanced += 1
             
             db.session.commit()
             current_app.logger.info("Weekly 52-week challenge update completed")
+            return advanced
         except Exception as e:
             current_app.logger.error(f"Error in weekly 52-week update: {e}")
             db.session.rollback()
+            raise
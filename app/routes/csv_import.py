@@ -7,6 +7,8 @@ from flask_login import login_required, current_user
 from werkzeug.utils import secure_filename
 from app import db
 from app.models import Expense, Category
+from app.routes.recurring import find_recurring_suggestions
+from app.routes.subscriptions import find_subscription_suggestions
 from datetime import datetime, timedelta
 from sqlalchemy import and_, or_
 import csv
@@ -479,18 +481,28 @@ def import_transactions():
     # Commit all imports
     try:
         db.session.commit()
-        return jsonify({
-            'success': True,
-            'imported_count': len(imported),
-            'skipped_count': len(skipped),
-            'error_count': len(errors),
-            'imported': imported,
-            'skipped': skipped,
-            'errors': errors
-        })
     except Exception as e:
         db.session.rollback()
         return jsonify({'success': False, 'error': f'Database error: {str(e)}'}), 500
+    
+    # Imported statements are where repeating charges show up: run detection right away
+    # (cheap, it reads the pattern index the import just updated)
+    recurring_suggestions, subscription_suggestions = [], []
+    if imported:
+        recurring_suggestions, _ = find_recurring_suggestions(current_user.id)
+        subscription_suggestions, _ = find_subscription_suggestions(current_user.id)
+    
+    return jsonify({
+        'success': True,
+        'imported_count': len(imported),
+        'skipped_count': len(skipped),
+        'error_count': len(errors),
+        'imported': imported,
+        'skipped': skipped,
+        'errors': errors,
+        'recurring_suggestions': recurring_suggestions[:10],
+        'subscription_suggestions': subscription_suggestions[:15]
+    })
 
 
 @bp.route('/create-categories', methods=['POST'])
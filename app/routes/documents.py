@@ -6,7 +6,7 @@ from werkzeug.utils import secure_filename
 import os
 import mimetypes
 from datetime import datetime
-from app.ocr import extract_text_from_file
+from app.ocr_queue import enqueue as enqueue_ocr, latest_job as latest_ocr_job, supports_ocr
 
 bp = Blueprint('documents', __name__, url_prefix='/api/documents')
 
@@ -163,18 +163,6 @@ def upload_document():
     # Get document category from form data
     document_category = request.form.get('category', 'Other')
     
-    # Process OCR for supported file types (PDF, PNG, JPG, JPEG)
-    ocr_text = ""
-    if file_ext in ['pdf', 'png', 'jpg', 'jpeg']:
-        try:
-            # Get absolute path for OCR processing
-            abs_file_path = os.path.abspath(file_path)
-            ocr_text = extract_text_from_file(abs_file_path, file_ext)
-            print(f"OCR extracted {len(ocr_text)} characters from {original_filename}")
-        except Exception as e:
-            print(f"OCR processing failed for {original_filename}: {str(e)}")
-            # Continue without OCR text - non-critical failure
-    
     # Create document record - Security: user_id is current_user.id
     document = Document(
         filename=filename,
@@ -185,17 +173,24 @@ def upload_document():
         mime_type=ALLOWED_DOCUMENT_TYPES.get(file_ext, 'application/octet-stream'),
         document_category=document_category,
         status='uploaded',
-        ocr_text=ocr_text,
         user_id=current_user.id
     )
     
     db.session.add(document)
+    db.session.flush()
+    
+    # Queue OCR for supported file types (PDF, PNG, JPG, JPEG) - runs in the background
+    ocr_job = None
+    if supports_ocr(file_ext):
+        ocr_job = enqueue_ocr(document, file_path, file_ext)
+    
     db.session.commit()
     
     return jsonify({
         'success': True,
         'message': 'Document uploaded successfully',
-        'document': document.to_dict()
+        'document': document.to_dict(),
+        'ocr_job': ocr_job.to_dict() if ocr_job else None
     }), 201
 
 
@@ -280,6 +275,29 @@ def delete_document(document_id):
     return jsonify({'success': True, 'message': 'Document deleted successfully'})
 
 
+@bp.route('/<int:document_id>/ocr', methods=['GET'])
+@login_required
+def get_document_ocr_status(document_id):
+    """
+    Poll background OCR progress for a document
+    Security: Checks document belongs to current_user
+    """
+    # Security: Filter by user_id
+    document = Document.query.filter_by(id=document_id, user_id=current_user.id).first()
+    
+    if not document:
+        return jsonify({'success': False, 'message': 'Document not found'}), 404
+    
+    job = latest_ocr_job('document', document.id)
+    
+    return jsonify({
+        'success': True,
+        'status': document.status,
+        'job': job.to_dict() if job else None,
+        'has_text': bool(document.ocr_text)
+    })
+
+
 @bp.route('/<int:document_id>/status', methods=['PUT'])
 @login_required
 def update_document_status(document_id):
@@ -1,14 +1,16 @@
-from flask import Blueprint, request, jsonify, send_file, current_app
+from flask import Blueprint, request, jsonify, current_app
 from flask_login import login_required, current_user
-from app import db
+from app import db, aggregates
 from app.models import Expense, Category, Tag
+from app.pagination import keyset_page, page_limit
 from werkzeug.utils import secure_filename
 import os
 import csv
 import io
 from datetime import datetime
-from app.ocr import extract_text_from_file
+from app.ocr_queue import enqueue as enqueue_ocr, latest_job as latest_ocr_job, supports_ocr
 from app.auto_tagger import suggest_tags_for_expense
+from app.csv_export import csv_response, tag_names
 
 bp = Blueprint('expenses', __name__, url_prefix='/api/expenses')
 
@@ -18,9 +20,45 @@ def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
 
+def apply_suggested_tags(expense, suggested_tags):
+    """
+    Attach auto-suggested tags to an expense, creating missing auto tags
+    Security: Tags are looked up and created for the expense owner only
+    """
+    for tag_data in suggested_tags:
+        # Check if tag exists for user
+        tag = Tag.query.filter_by(
+            user_id=expense.user_id,
+            name=tag_data['name']
+        ).first()
+        
+        if not tag:
+            # Create new auto-generated tag
+            tag = Tag(
+                name=tag_data['name'],
+                color=tag_data['color'],
+                icon=tag_data['icon'],
+                user_id=expense.user_id,
+                is_auto=True,
+                use_count=0
+            )
+            db.session.add(tag)
+            db.session.flush()
+        
+        # Associate tag with expense
+        expense.add_tag(tag)
+
+
 @bp.route('/', methods=['GET'])
 @login_required
 def get_expenses():
+    """
+    List the user's expenses, newest first
+    Page-number mode (page, per_page) or, when a `cursor` parameter is
+    present (empty for the first page), keyset mode: pass back next_cursor
+    to continue; total=approx adds a count from the daily rollups
+    Security: Only returns expenses of current_user
+    """
     page = request.args.get('page', 1, type=int)
     per_page = request.args.get('per_page', 20, type=int)
     category_id = request.args.get('category_id', type=int)
@@ -55,12 +93,37 @@ def get_expenses():
         except ValueError:
             pass  # Invalid tag IDs, ignore filter
     
+    if 'cursor' in request.args:
+        try:
+            expenses, next_cursor = keyset_page(
+                query, Expense, request.args.get('cursor'), page_limit(request.args.get('per_page', type=int))
+            )
+        except ValueError:
+            return jsonify({'success': False, 'message': 'Invalid cursor'}), 400
+        
+        result = {
+            'expenses': Expense.to_dict_many(expenses),
+            'next_cursor': next_cursor,
+            'has_more': next_cursor is not None
+        }
+        if request.args.get('total') == 'approx':
+            # Rollup count for the user/category/date filters; an upper bound when
+            # search or tag filters narrow the listing further
+            result['total'] = aggregates.window_count(
+                Expense, current_user.id,
+                start=datetime.fromisoformat(start_date) if start_date else None,
+                end=datetime.fromisoformat(end_date) if end_date else None,
+                inclusive_end=True, category_id=category_id or None
+            )
+            result['total_is_estimate'] = bool(search or tag_ids)
+        return jsonify(result)
+    
     pagination = query.order_by(Expense.date.desc()).paginate(
         page=page, per_page=per_page, error_out=False
     )
     
     return jsonify({
-        'expenses': [expense.to_dict() for expense in pagination.items],
+        'expenses': Expense.to_dict_many(pagination.items),
         'total': pagination.total,
         'pages': pagination.pages,
         'current_page': page
@@ -97,7 +160,7 @@ def create_expense():
     
     # Handle receipt upload
     receipt_path = None
-    receipt_ocr_text = ""
+    receipt_file = None
     if 'receipt' in request.files:
         file = request.files['receipt']
         if file and file.filename and allowed_file(file.filename):
@@ -112,16 +175,7 @@ def create_expense():
             filepath = os.path.join(receipts_dir, filename)
             file.save(filepath)
             receipt_path = f'receipts/{filename}'
-            
-            # Process OCR for image receipts
-            file_ext = filename.rsplit('.', 1)[1].lower() if '.' in filename else ''
-            if file_ext in ['png', 'jpg', 'jpeg', 'pdf']:
-                try:
-                    abs_filepath = os.path.abspath(filepath)
-                    receipt_ocr_text = extract_text_from_file(abs_filepath, file_ext)
-                    print(f"OCR extracted {len(receipt_ocr_text)} characters from receipt {filename}")
-                except Exception as e:
-                    print(f"OCR processing failed for receipt {filename}: {str(e)}")
+            receipt_file = (filepath, filename.rsplit('.', 1)[1].lower() if '.' in filename else '')
     
     # Create expense
     expense = Expense(
@@ -131,7 +185,6 @@ def create_expense():
         category_id=validated_category_id,
         user_id=current_user.id,
         receipt_path=receipt_path,
-        receipt_ocr_text=receipt_ocr_text,
         date=datetime.fromisoformat(data.get('date')) if data.get('date') else datetime.utcnow()
     )
     
@@ -147,38 +200,18 @@ def create_expense():
     db.session.add(expense)
     db.session.flush()  # Get expense ID before handling tag objects
     
-    # Auto-suggest tags based on description and OCR text
+    # Auto-suggest tags based on description (receipt OCR text adds more once processed)
     enable_auto_tags = data.get('enable_auto_tags', True)  # Default to True
     if enable_auto_tags:
         suggested_tags = suggest_tags_for_expense(
             description=data.get('description'),
-            ocr_text=receipt_ocr_text,
             category_name=category.name
         )
-        
-        # Create or get tags and associate with expense
-        for tag_data in suggested_tags:
-            # Check if tag exists for user
-            tag = Tag.query.filter_by(
-                user_id=current_user.id,
-                name=tag_data['name']
-            ).first()
-            
-            if not tag:
-                # Create new auto-generated tag
-                tag = Tag(
-                    name=tag_data['name'],
-                    color=tag_data['color'],
-                    icon=tag_data['icon'],
-                    user_id=current_user.id,
-                    is_auto=True,
-                    use_count=0
-                )
-                db.session.add(tag)
-                db.session.flush()
-            
-            # Associate tag with expense
-            expense.add_tag(tag)
+        apply_suggested_tags(expense, suggested_tags)
+    
+    # Queue receipt OCR - runs in the background and auto-tags on completion
+    if receipt_file and supports_ocr(receipt_file[1]):
+        enqueue_ocr(expense, receipt_file[0], receipt_file[1], auto_tag=bool(enable_auto_tags))
     
     # Handle manual tag associations (tag IDs passed from frontend)
     if data.get('tag_ids'):
@@ -266,16 +299,12 @@ def update_expense(expense_id):
             filepath = os.path.join(receipts_dir, filename)
             file.save(filepath)
             expense.receipt_path = f'receipts/{filename}'
+            expense.receipt_ocr_text = None
             
-            # Process OCR for new receipt
+            # Queue OCR for the new receipt
             file_ext = filename.rsplit('.', 1)[1].lower() if '.' in filename else ''
-            if file_ext in ['png', 'jpg', 'jpeg', 'pdf']:
-                try:
-                    abs_filepath = os.path.abspath(filepath)
-                    expense.receipt_ocr_text = extract_text_from_file(abs_filepath, file_ext)
-                    print(f"OCR extracted {len(expense.receipt_ocr_text)} characters from receipt {filename}")
-                except Exception as e:
-                    print(f"OCR processing failed for receipt {filename}: {str(e)}")
+            if supports_ocr(file_ext):
+                enqueue_ocr(expense, filepath, file_ext)
     
     db.session.commit()
     
@@ -307,6 +336,28 @@ def delete_expense(expense_id):
     return jsonify({'success': True, 'message': 'Expense deleted'})
 
 
+@bp.route('/<int:expense_id>/ocr', methods=['GET'])
+@login_required
+def get_receipt_ocr_status(expense_id):
+    """
+    Poll background OCR progress for an expense receipt
+    Security: Checks expense belongs to current_user
+    """
+    expense = Expense.query.filter_by(id=expense_id, user_id=current_user.id).first()
+    
+    if not expense:
+        return jsonify({'success': False, 'message': 'Expense not found'}), 404
+    
+    job = latest_ocr_job('expense', expense.id)
+    
+    return jsonify({
+        'success': True,
+        'job': job.to_dict() if job else None,
+        'has_text': bool(expense.receipt_ocr_text),
+        'expense': expense.to_dict() if job and job.status == 'done' else None
+    })
+
+
 @bp.route('/categories', methods=['GET'])
 @login_required
 def get_categories():
@@ -504,32 +555,44 @@ def reorder_categories():
 @bp.route('/export/csv', methods=['GET'])
 @login_required
 def export_csv():
-    expenses = Expense.query.filter_by(user_id=current_user.id).order_by(Expense.date.desc()).all()
-    
-    output = io.StringIO()
-    writer = csv.writer(output)
-    
-    # Write header
-    writer.writerow(['Date', 'Description', 'Amount', 'Currency', 'Category', 'Tags'])
-    
-    # Write data
-    for expense in expenses:
-        writer.writerow([
-            expense.date.strftime('%Y-%m-%d %H:%M:%S'),
-            expense.description,
-            expense.amount,
-            expense.currency,
-            expense.category.name,
-            ', '.join(expense.get_tags())
-        ])
-    
-    output.seek(0)
-    
-    return send_file(
-        io.BytesIO(output.getvalue().encode('utf-8')),
-        mimetype='text/csv',
-        as_attachment=True,
-        download_name=f'fina_expenses_{datetime.utcnow().strftime("%Y%m%d")}.csv'
+    """
+    Stream the user's expenses as CSV, newest first
+    Optional filters: category_id, start_date, end_date (ISO dates)
+    Security: Only exports expenses of current_user
+    """
+    category_id = request.args.get('category_id', type=int)
+    start_date = request.args.get('start_date')
+    end_date = request.args.get('end_date')
+    
+    # Plain columns with the category joined in: no ORM objects, no per-row lazy loads
+    query = db.session.query(
+        Expense.date, Expense.description, Expense.amount, Expense.currency,
+        Category.name.label('category_name'), Expense.tags
+    ).outerjoin(Category, Expense.category_id == Category.id).filter(
+        Expense.user_id == current_user.id
+    )
+    
+    if category_id:
+        query = query.filter(Expense.category_id == category_id)
+    
+    if start_date:
+        query = query.filter(Expense.date >= datetime.fromisoformat(start_date))
+    
+    if end_date:
+        query = query.filter(Expense.date <= datetime.fromisoformat(end_date))
+    
+    return csv_response(
+        query.order_by(Expense.date.desc(), Expense.id.desc()),
+        ['Date', 'Description', 'Amount', 'Currency', 'Category', 'Tags'],
+        lambda row: [
+            row.date.strftime('%Y-%m-%d %H:%M:%S'),
+            row.description,
+            row.amount,
+            row.currency,
+            row.category_name or '',
+            tag_names(row.tags)
+        ],
+        f'fina_expenses_{datetime.utcnow().strftime("%Y%m%d")}.csv'
     )
 
 
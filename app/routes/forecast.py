@@ -11,12 +11,12 @@ Security: All queries filtered by current_user.id
 
 from flask import Blueprint, request, jsonify
 from flask_login import login_required, current_user
-from app import db
+from app import db, aggregates
 from app.models import Expense, Income, RecurringExpense, Category, User
+from app.cache import cached_response
 from datetime import datetime, timedelta
 from dateutil.relativedelta import relativedelta
 from sqlalchemy import func, and_, extract
-from collections import defaultdict
 import calendar
 
 bp = Blueprint('forecast', __name__, url_prefix='/api/forecast')
@@ -57,17 +57,7 @@ def get_historical_spending(user_id, months=6):
     today = datetime.utcnow()
     start_date = today - relativedelta(months=months)
     
-    expenses = Expense.query.filter(
-        Expense.user_id == user_id,
-        Expense.date >= start_date
-    ).all()
-    
-    monthly_totals = defaultdict(float)
-    for expense in expenses:
-        key = expense.date.strftime('%Y-%m')
-        monthly_totals[key] += expense.amount
-    
-    return dict(monthly_totals)
+    return aggregates.monthly_series(Expense, user_id, start_date)
 
 
 def get_category_spending_history(user_id, months=3):
@@ -121,6 +111,7 @@ def calculate_daily_average(user_id, days=30):
 
 @bp.route('/summary', methods=['GET'])
 @login_required
+@cached_response()
 def get_forecast_summary():
     """Get spending forecast summary for current month"""
     try:
@@ -255,6 +246,7 @@ def get_upcoming_bills_total(user_id, days):
 
 @bp.route('/cash-flow', methods=['GET'])
 @login_required
+@cached_response()
 def get_cash_flow_forecast():
     """Get cash flow forecast for the next 30 days"""
     try:
@@ -364,6 +356,7 @@ def get_cash_flow_forecast():
 
 @bp.route('/bills-calendar', methods=['GET'])
 @login_required
+@cached_response()
 def get_bills_calendar():
     """Get bill due date calendar data"""
     try:
@@ -479,6 +472,7 @@ def get_bills_calendar():
 
 @bp.route('/category-forecast', methods=['GET'])
 @login_required
+@cached_response()
 def get_category_forecast():
     """Get spending forecast by category"""
     try:
@@ -562,6 +556,7 @@ def get_category_forecast():
 
 @bp.route('/trends', methods=['GET'])
 @login_required
+@cached_response()
 def get_spending_trends():
     """Get spending trends for forecasting"""
     try:
@@ -626,6 +621,7 @@ def get_spending_trends():
 
 @bp.route('/upcoming-bills', methods=['GET'])
 @login_required  
+@cached_response()
 def get_upcoming_bills():
     """Get list of upcoming bills"""
     try:
@@ -700,6 +696,7 @@ def get_upcoming_bills():
 
 @bp.route('/income-forecast', methods=['GET'])
 @login_required
+@cached_response()
 def get_income_forecast():
     """Get upcoming income forecast"""
     try:
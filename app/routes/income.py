@@ -1,7 +1,9 @@
 from flask import Blueprint, request, jsonify, current_app
 from flask_login import login_required, current_user
-from app import db
+from app import db, aggregates
 from app.models import Income
+from app.pagination import keyset_page, page_limit
+from app.csv_export import csv_response, tag_names
 from datetime import datetime, timedelta
 from dateutil.relativedelta import relativedelta
 import json
@@ -42,6 +44,9 @@ def calculate_income_next_due_date(frequency, custom_days=None, from_date=None):
 @login_required
 def get_income():
     """Get income entries with filtering and pagination
+    Page-number mode (page, per_page) or, when a `cursor` parameter is present
+    (empty for the first page), keyset mode continuing from next_cursor;
+    total=approx adds a count from the daily rollups
     Security: Only returns income for current_user
     """
     current_app.logger.info(f"Getting income for user {current_user.id}")
@@ -67,6 +72,30 @@ def get_income():
     if search:
         query = query.filter(Income.description.ilike(f'%{search}%'))
     
+    if 'cursor' in request.args:
+        try:
+            income, next_cursor = keyset_page(
+                query, Income, request.args.get('cursor'), page_limit(request.args.get('per_page', type=int))
+            )
+        except ValueError:
+            return jsonify({'success': False, 'message': 'Invalid cursor'}), 400
+        
+        result = {
+            'income': [inc.to_dict() for inc in income],
+            'next_cursor': next_cursor,
+            'has_more': next_cursor is not None
+        }
+        if request.args.get('total') == 'approx':
+            # Rollup count for the date filters; an upper bound when source or search narrow it
+            result['total'] = aggregates.window_count(
+                Income, current_user.id,
+                start=datetime.fromisoformat(start_date) if start_date else None,
+                end=datetime.fromisoformat(end_date) if end_date else None,
+                inclusive_end=True
+            )
+            result['total_is_estimate'] = bool(source or search)
+        return jsonify(result)
+    
     pagination = query.order_by(Income.date.desc()).paginate(
         page=page, per_page=per_page, error_out=False
     )
@@ -81,6 +110,48 @@ def get_income():
     })
 
 
+@bp.route('/export/csv', methods=['GET'])
+@login_required
+def export_income_csv():
+    """Stream income entries as CSV, newest first
+    Optional filters: source, start_date, end_date (ISO dates)
+    Security: Only exports income of current_user
+    """
+    source = request.args.get('source')
+    start_date = request.args.get('start_date')
+    end_date = request.args.get('end_date')
+    
+    # Security: Filter by current user
+    query = db.session.query(
+        Income.date, Income.description, Income.amount, Income.currency,
+        Income.source, Income.frequency, Income.tags
+    ).filter(Income.user_id == current_user.id)
+    
+    if source:
+        query = query.filter(Income.source == source)
+    
+    if start_date:
+        query = query.filter(Income.date >= datetime.fromisoformat(start_date))
+    
+    if end_date:
+        query = query.filter(Income.date <= datetime.fromisoformat(end_date))
+    
+    return csv_response(
+        query.order_by(Income.date.desc(), Income.id.desc()),
+        ['Date', 'Description', 'Amount', 'Currency', 'Source', 'Frequency', 'Tags'],
+        lambda row: [
+            row.date.strftime('%Y-%m-%d %H:%M:%S'),
+            row.description,
+            row.amount,
+            row.currency,
+            row.source,
+            row.frequency or 'once',
+            tag_names(row.tags)
+        ],
+        f'fina_income_{datetime.utcnow().strftime("%Y%m%d")}.csv'
+    )
+
+
 @bp.route('/', methods=['POST'])
 @login_required
 def create_income():
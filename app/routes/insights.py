@@ -8,7 +8,8 @@ Security: All queries filtered by current_user.id
 
 from flask import Blueprint, request, jsonify
 from flask_login import login_required, current_user
-from app import db
+from app import db, aggregates
+from app.cache import cached_response
 from app.models import (
     Expense, Category, SpendingInsight, UserInsightPreferences, Income
 )
@@ -159,6 +160,7 @@ def update_preferences():
 
 @bp.route('/weekly-digest', methods=['GET'])
 @login_required
+@cached_response()
 def get_weekly_digest():
     """Get weekly spending digest data"""
     # Calculate date range (last 7 days)
@@ -167,23 +169,10 @@ def get_weekly_digest():
     prev_start = start_date - timedelta(days=7)
     prev_end = start_date
     
-    # Current week expenses
-    current_expenses = Expense.query.filter(
-        Expense.user_id == current_user.id,
-        Expense.date >= start_date,
-        Expense.date < end_date
-    ).all()
-    
-    # Previous week expenses for comparison
-    prev_expenses = Expense.query.filter(
-        Expense.user_id == current_user.id,
-        Expense.date >= prev_start,
-        Expense.date < prev_end
-    ).all()
-    
-    # Calculate totals
-    current_total = sum(e.amount for e in current_expenses)
-    prev_total = sum(e.amount for e in prev_expenses)
+    # Current and previous week totals, summed in SQL
+    current_total = aggregates.window_total(Expense, current_user.id, start_date, end_date)
+    prev_total = aggregates.window_total(Expense, current_user.id, prev_start, prev_end)
+    transaction_count = aggregates.window_count(Expense, current_user.id, start_date, end_date)
     
     # Calculate change
     if prev_total > 0:
@@ -194,19 +183,18 @@ def get_weekly_digest():
     # Group by category
     category_totals = defaultdict(lambda: {'current': 0, 'previous': 0})
     
-    for e in current_expenses:
-        cat_name = e.category.name if e.category else 'Uncategorized'
-        cat_color = e.category.color if e.category else '#666'
-        category_totals[cat_name]['current'] += e.amount
-        category_totals[cat_name]['color'] = cat_color
-        category_totals[cat_name]['id'] = e.category_id
+    for cat in aggregates.category_breakdown(current_user.id, start_date, end_date):
+        cat_name = cat.name or 'Uncategorized'
+        category_totals[cat_name]['current'] += cat.total
+        category_totals[cat_name]['color'] = cat.color or '#666'
+        category_totals[cat_name]['id'] = cat.category_id
     
-    for e in prev_expenses:
-        cat_name = e.category.name if e.category else 'Uncategorized'
-        category_totals[cat_name]['previous'] += e.amount
+    for cat in aggregates.category_breakdown(current_user.id, prev_start, prev_end):
+        cat_name = cat.name or 'Uncategorized'
+        category_totals[cat_name]['previous'] += cat.total
         if 'color' not in category_totals[cat_name]:
-            category_totals[cat_name]['color'] = e.category.color if e.category else '#666'
-            category_totals[cat_name]['id'] = e.category_id
+            category_totals[cat_name]['color'] = cat.color or '#666'
+            category_totals[cat_name]['id'] = cat.category_id
     
     # Calculate category changes and sort by current spending
     categories_data = []
@@ -231,20 +219,13 @@ def get_weekly_digest():
     
     # Get top spending day
     daily_spending = defaultdict(float)
-    for e in current_expenses:
-        day_key = e.date.strftime('%A')
-        daily_spending[day_key] += e.amount
+    for day, total in aggregates.daily_series(Expense, current_user.id, start_date, end_date).items():
+        daily_spending[day.strftime('%A')] += total
     
     top_day = max(daily_spending.items(), key=lambda x: x[1]) if daily_spending else ('', 0)
     
     # Current week income
-    current_income = Income.query.filter(
-        Income.user_id == current_user.id,
-        Income.date >= start_date,
-        Income.date < end_date
-    ).all()
-    
-    income_total = sum(i.amount for i in current_income)
+    income_total = aggregates.window_total(Income, current_user.id, start_date, end_date)
     net_flow = income_total - current_total
     
     return jsonify({
@@ -257,7 +238,7 @@ def get_weekly_digest():
             'total_spent': round(current_total, 2),
             'previous_total': round(prev_total, 2),
             'change_percentage': round(change_percentage, 1),
-            'transaction_count': len(current_expenses),
+            'transaction_count': transaction_count,
             'daily_average': round(current_total / 7, 2),
             'top_spending_day': top_day[0],
             'top_spending_day_amount': round(top_day[1], 2),
@@ -395,44 +376,24 @@ def get_category_comparison():
     prev_month_end = start_of_month - timedelta(days=1)
     prev_month_start = prev_month_end.replace(day=1)
     
-    # Get current month expenses
-    current_expenses = Expense.query.filter(
-        Expense.user_id == current_user.id,
-        Expense.date >= start_of_month,
-        Expense.date < end_date
-    ).all()
-    
-    # Get previous month expenses
-    prev_expenses = Expense.query.filter(
-        Expense.user_id == current_user.id,
-        Expense.date >= prev_month_start,
-        Expense.date <= prev_month_end
-    ).all()
-    
-    # Group by category
+    # Group by category (current and previous month, summed in SQL)
     current_by_cat = defaultdict(float)
     prev_by_cat = defaultdict(float)
     category_info = {}
     
-    for e in current_expenses:
-        cat_name = e.category.name if e.category else 'Uncategorized'
-        current_by_cat[cat_name] += e.amount
-        if cat_name not in category_info:
-            category_info[cat_name] = {
-                'id': e.category_id,
-                'color': e.category.color if e.category else '#666',
-                'icon': e.category.icon if e.category else 'category'
-            }
-    
-    for e in prev_expenses:
-        cat_name = e.category.name if e.category else 'Uncategorized'
-        prev_by_cat[cat_name] += e.amount
-        if cat_name not in category_info:
-            category_info[cat_name] = {
-                'id': e.category_id,
-                'color': e.category.color if e.category else '#666',
-                'icon': e.category.icon if e.category else 'category'
-            }
+    for by_cat, rows in (
+        (current_by_cat, aggregates.category_breakdown(current_user.id, start_of_month, end_date)),
+        (prev_by_cat, aggregates.category_breakdown(current_user.id, prev_month_start, prev_month_end, inclusive_end=True))
+    ):
+        for cat in rows:
+            cat_name = cat.name or 'Uncategorized'
+            by_cat[cat_name] += cat.total
+            if cat_name not in category_info:
+                category_info[cat_name] = {
+                    'id': cat.category_id,
+                    'color': cat.color or '#666',
+                    'icon': cat.icon or 'category'
+                }
     
     # Build comparison data
     prefs = get_or_create_preferences(current_user.id)
@@ -506,38 +467,50 @@ def get_money_leaks():
     
     start_date = datetime.utcnow() - timedelta(days=days)
     
-    expenses = Expense.query.filter(
+    # Group by similar description patterns: the normalized description
+    # (description_key, stored at write time) plus an approximate amount range
+    def pattern_key(description_key, amount):
+        amount_bucket = round(amount / 5) * 5  # Round to nearest £5
+        return f"{description_key}_{amount_bucket}"
+    
+    # Count occurrences in SQL first, so only expenses of recurring patterns are loaded
+    occurrence_counts = defaultdict(int)
+    for description_key, amount, count in db.session.query(
+        Expense.description_key, Expense.amount, func.count(Expense.id)
+    ).filter(
         Expense.user_id == current_user.id,
         Expense.date >= start_date
-    ).order_by(Expense.date.desc()).all()
+    ).group_by(Expense.description_key, Expense.amount).all():
+        occurrence_counts[(description_key, pattern_key(description_key, amount))] += count
+    recurring = {key for key, count in occurrence_counts.items() if count >= min_occurrences}
+    
+    expenses = db.session.query(
+        Expense.id, Expense.description, Expense.description_key, Expense.amount, Expense.date,
+        Category.name.label('category_name'), Category.color.label('category_color')
+    ).outerjoin(Category, Expense.category_id == Category.id).filter(
+        Expense.user_id == current_user.id,
+        Expense.date >= start_date,
+        Expense.description_key.in_({description_key for description_key, _ in recurring})
+    ).order_by(Expense.date.desc()).all() if recurring else []
     
-    # Group by similar description patterns
-    # (normalize: lowercase, remove special chars, similar amounts)
     patterns = defaultdict(lambda: {'expenses': [], 'total': 0, 'amounts': []})
     
     for expense in expenses:
-        # Normalize description
-        desc = expense.description.lower().strip()
-        # Remove common suffixes/numbers
-        import re
-        desc_clean = re.sub(r'[0-9#]+', '', desc).strip()
-        desc_clean = re.sub(r'\s+', ' ', desc_clean)
-        
-        # Key by description pattern + approximate amount range
-        amount_bucket = round(expense.amount / 5) * 5  # Round to nearest £5
-        key = f"{desc_clean}_{amount_bucket}"
+        key = pattern_key(expense.description_key, expense.amount)
+        if (expense.description_key, key) not in recurring:
+            continue
         
         patterns[key]['expenses'].append({
             'id': expense.id,
             'description': expense.description,
             'amount': expense.amount,
             'date': expense.date.isoformat(),
-            'category': expense.category.name if expense.category else None
+            'category': expense.category_name
         })
         patterns[key]['total'] += expense.amount
         patterns[key]['amounts'].append(expense.amount)
-        patterns[key]['category'] = expense.category.name if expense.category else None
-        patterns[key]['category_color'] = expense.category.color if expense.category else '#666'
+        patterns[key]['category'] = expense.category_name
+        patterns[key]['category_color'] = expense.category_color if expense.category_name is not None else '#666'
         patterns[key]['original_desc'] = expense.description
     
     # Filter to recurring patterns (min occurrences)
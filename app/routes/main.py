@@ -1,6 +1,7 @@
 from flask import Blueprint, render_template, request, jsonify
 from flask_login import login_required, current_user
-from app import db
+from app import db, aggregates
+from app.cache import cached_response
 from app.models import Expense, Category, Income
 from sqlalchemy import func, extract
 from datetime import datetime, timedelta
@@ -161,6 +162,7 @@ def available_years():
 
 @bp.route('/api/dashboard-stats')
 @login_required
+@cached_response()
 def dashboard_stats():
     now = datetime.utcnow()
     
@@ -182,35 +184,11 @@ def dashboard_stats():
     else:
         prev_month_start = current_month_start.replace(month=current_month_start.month-1)
     
-    # Total spent this month (all currencies - show user's preferred currency)
-    current_month_expenses = Expense.query.filter(
-        Expense.user_id == current_user.id,
-        Expense.date >= current_month_start
-    ).all()
-    current_month_total = sum(exp.amount for exp in current_month_expenses)
-    
-    # Previous month total
-    prev_month_expenses = Expense.query.filter(
-        Expense.user_id == current_user.id,
-        Expense.date >= prev_month_start,
-        Expense.date < current_month_start
-    ).all()
-    prev_month_total = sum(exp.amount for exp in prev_month_expenses)
-    
-    # Current month income
-    current_month_income = Income.query.filter(
-        Income.user_id == current_user.id,
-        Income.date >= current_month_start
-    ).all()
-    current_income_total = sum(inc.amount for inc in current_month_income)
-    
-    # Previous month income
-    prev_month_income = Income.query.filter(
-        Income.user_id == current_user.id,
-        Income.date >= prev_month_start,
-        Income.date < current_month_start
-    ).all()
-    prev_income_total = sum(inc.amount for inc in prev_month_income)
+    # Month totals (all currencies - show user's preferred currency), summed in SQL
+    current_month_total = aggregates.window_total(Expense, current_user.id, current_month_start)
+    prev_month_total = aggregates.window_total(Expense, current_user.id, prev_month_start, current_month_start)
+    current_income_total = aggregates.window_total(Income, current_user.id, current_month_start)
+    prev_income_total = aggregates.window_total(Income, current_user.id, prev_month_start, current_month_start)
     
     # Calculate profit/loss
     current_profit = current_income_total - current_month_total
@@ -222,14 +200,12 @@ def dashboard_stats():
     else:
         percent_change = 100 if current_month_total > 0 else 0
     
-    # Active categories
-    active_categories = Category.query.filter_by(user_id=current_user.id).count()
+    # Active categories (loaded once, reused for budget status below)
+    categories = {cat.id: cat for cat in Category.query.filter_by(user_id=current_user.id).all()}
+    active_categories = len(categories)
     
     # Total transactions this month
-    total_transactions = Expense.query.filter(
-        Expense.user_id == current_user.id,
-        Expense.date >= current_month_start
-    ).count()
+    total_transactions = aggregates.window_count(Expense, current_user.id, current_month_start)
     
     # Category breakdown for selected year (charts filter)
     selected_year_start = datetime(filter_year, 1, 1, 0, 0, 0)
@@ -248,41 +224,32 @@ def dashboard_stats():
         Expense.date < selected_year_end
     ).group_by(Category.id).order_by(Category.display_order, Category.created_at).all()
     
-    # Monthly breakdown for selected year - including income
+    # Monthly breakdown for selected year - including income (one grouped query per table)
+    monthly_expenses = aggregates.monthly_totals(Expense, current_user.id, filter_year)
+    monthly_income = aggregates.monthly_totals(Income, current_user.id, filter_year)
+    
     monthly_data = []
     for month_num in range(1, 13):
-        month_start = datetime(filter_year, month_num, 1, 0, 0, 0)
-        if month_num == 12:
-            month_end = datetime(filter_year + 1, 1, 1, 0, 0, 0)
-        else:
-            month_end = datetime(filter_year, month_num + 1, 1, 0, 0, 0)
-        
-        month_expenses = Expense.query.filter(
-            Expense.user_id == current_user.id,
-            Expense.date >= month_start,
-            Expense.date < month_end
-        ).all()
-        month_total = sum(exp.amount for exp in month_expenses)
-        
-        month_income_list = Income.query.filter(
-            Income.user_id == current_user.id,
-            Income.date >= month_start,
-            Income.date < month_end
-        ).all()
-        month_income = sum(inc.amount for inc in month_income_list)
-        
+        month_total = monthly_expenses[month_num]
+        month_income = monthly_income[month_num]
         monthly_data.append({
-            'month': month_start.strftime('%b'),
+            'month': datetime(filter_year, month_num, 1).strftime('%b'),
             'month_num': month_num,
             'expenses': float(month_total),
             'income': float(month_income),
             'profit': float(month_income - month_total)
         })
     
+    # Current month spend for every category in the breakdown, in one grouped query
+    month_spending = aggregates.category_spending(
+        current_user.id, current_month_start,
+        category_ids=[stat[0] for stat in category_stats]
+    )
+    
     # Add budget status to category breakdown
     category_breakdown = []
     for stat in category_stats:
-        cat = Category.query.get(stat[0])
+        cat = categories.get(stat[0])
         cat_data = {
             'id': stat[0],
             'name': stat[1],
@@ -292,7 +259,7 @@ def dashboard_stats():
             'count': stat[5]
         }
         if cat:
-            cat_data['budget_status'] = cat.get_budget_status()
+            cat_data['budget_status'] = cat.get_budget_status(spent=month_spending.get(cat.id, 0.0))
             cat_data['monthly_budget'] = cat.monthly_budget
             cat_data['budget_alert_threshold'] = cat.budget_alert_threshold
         category_breakdown.append(cat_data)
@@ -322,12 +289,13 @@ def recent_transactions():
         .all()
     
     return jsonify({
-        'transactions': [expense.to_dict() for expense in expenses]
+        'transactions': Expense.to_dict_many(expenses)
     })
 
 
 @bp.route('/api/reports-stats')
 @login_required
+@cached_response()
 def reports_stats():
     """
     Generate comprehensive financial reports including income tracking
@@ -369,48 +337,20 @@ def reports_stats():
         if period_start < year_start:
             period_start = year_start
     
-    # Query expenses with security filter
-    query = Expense.query.filter(
-        Expense.user_id == current_user.id,
-        Expense.date >= period_start,
-        Expense.date <= period_end
-    )
-    
-    if category_filter:
-        query = query.filter_by(category_id=category_filter)
-    
-    expenses = query.all()
-    
-    # Query income for the same period
-    income_query = Income.query.filter(
-        Income.user_id == current_user.id,
-        Income.date >= period_start,
-        Income.date <= period_end
+    # Totals for the period, summed in SQL - Security: filter by user_id
+    total_spent = aggregates.window_total(
+        Expense, current_user.id, period_start, period_end,
+        inclusive_end=True, category_id=category_filter or None
     )
-    incomes = income_query.all()
-    
-    # Total spent and earned in period
-    total_spent = sum(exp.amount for exp in expenses)
-    total_income = sum(inc.amount for inc in incomes)
+    total_income = aggregates.window_total(Income, current_user.id, period_start, period_end, inclusive_end=True)
     
     # Previous period comparison for expenses and income
     actual_days = (period_end - period_start).days or 1
     prev_period_start = period_start - timedelta(days=actual_days)
     prev_period_end = period_start
     
-    prev_expenses = Expense.query.filter(
-        Expense.user_id == current_user.id,
-        Expense.date >= prev_period_start,
-        Expense.date < prev_period_end
-    ).all()
-    prev_total = sum(exp.amount for exp in prev_expenses)
-    
-    prev_incomes = Income.query.filter(
-        Income.user_id == current_user.id,
-        Income.date >= prev_period_start,
-        Income.date < prev_period_end
-    ).all()
-    prev_income_total = sum(inc.amount for inc in prev_incomes)
+    prev_total = aggregates.window_total(Expense, current_user.id, prev_period_start, prev_period_end)
+    prev_income_total = aggregates.window_total(Income, current_user.id, prev_period_start, prev_period_end)
     
     # Calculate profit/loss
     current_profit = total_income - total_spent
@@ -436,13 +376,13 @@ def reports_stats():
     elif current_profit != 0:
         profit_percent_change = 100
     
-    # Top category (all currencies)
-    category_totals = {}
-    for exp in expenses:
-        cat_name = exp.category.name
-        category_totals[cat_name] = category_totals.get(cat_name, 0) + exp.amount
+    # Top category (all currencies) - breakdown is sorted largest first
+    category_totals = aggregates.category_breakdown(
+        current_user.id, period_start, period_end,
+        inclusive_end=True, category_id=category_filter or None
+    )
     
-    top_category = max(category_totals.items(), key=lambda x: x[1]) if category_totals else ('None', 0)
+    top_category = (category_totals[0].name, category_totals[0].total) if category_totals else ('None', 0)
     
     # Average daily spending (use actual_days for accurate calculation)
     avg_daily = total_spent / actual_days if actual_days > 0 else 0
@@ -484,38 +424,28 @@ def reports_stats():
     
     # Category breakdown for pie chart
     category_breakdown = []
-    for cat_name, amount in sorted(category_totals.items(), key=lambda x: x[1], reverse=True):
-        category = Category.query.filter_by(user_id=current_user.id, name=cat_name).first()
-        if category:
-            percentage = (amount / total_spent * 100) if total_spent > 0 else 0
+    for cat in category_totals:
+        if cat.name is not None:
+            percentage = (cat.total / total_spent * 100) if total_spent > 0 else 0
             category_breakdown.append({
-                'name': cat_name,
-                'color': category.color,
-                'amount': float(amount),
+                'name': cat.name,
+                'color': cat.color,
+                'amount': float(cat.total),
                 'percentage': round(percentage, 1)
             })
     
     # Daily spending and income trend (last 30 days of the selected period)
     daily_trend = []
     trend_days = min(30, actual_days)
+    trend_end = period_end.replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
+    trend_start = trend_end - timedelta(days=trend_days)
+    daily_expenses = aggregates.daily_series(Expense, current_user.id, trend_start, trend_end)
+    daily_incomes = aggregates.daily_series(Income, current_user.id, trend_start, trend_end)
+    
     for i in range(trend_days):
         day_date = period_end - timedelta(days=i)
-        day_start = day_date.replace(hour=0, minute=0, second=0, microsecond=0)
-        day_end = day_start + timedelta(days=1)
-        
-        day_expenses = Expense.query.filter(
-            Expense.user_id == current_user.id,
-            Expense.date >= day_start,
-            Expense.date < day_end
-        ).all()
-        day_total = sum(exp.amount for exp in day_expenses)
-        
-        day_incomes = Income.query.filter(
-            Income.user_id == current_user.id,
-            Income.date >= day_start,
-            Income.date < day_end
-        ).all()
-        day_income = sum(inc.amount for inc in day_incomes)
+        day_total = daily_expenses.get(day_date.date(), 0.0)
+        day_income = daily_incomes.get(day_date.date(), 0.0)
         
         daily_trend.insert(0, {
             'date': day_date.strftime('%d %b'),
@@ -525,46 +455,31 @@ def reports_stats():
         })
     
     # Monthly comparison with income (all 12 months of selected year)
+    monthly_expenses = aggregates.monthly_totals(Expense, current_user.id, filter_year)
+    monthly_incomes = aggregates.monthly_totals(Income, current_user.id, filter_year)
+    
     monthly_comparison = []
     for month in range(1, 13):
-        month_start = datetime(filter_year, month, 1)
-        if month == 12:
-            month_end = datetime(filter_year + 1, 1, 1)
-        else:
-            month_end = datetime(filter_year, month + 1, 1)
-        
-        month_expenses = Expense.query.filter(
-            Expense.user_id == current_user.id,
-            Expense.date >= month_start,
-            Expense.date < month_end
-        ).all()
-        month_total = sum(exp.amount for exp in month_expenses)
-        
-        month_incomes = Income.query.filter(
-            Income.user_id == current_user.id,
-            Income.date >= month_start,
-            Income.date < month_end
-        ).all()
-        month_income = sum(inc.amount for inc in month_incomes)
+        month_total = monthly_expenses[month]
+        month_income = monthly_incomes[month]
         
         monthly_comparison.append({
-            'month': month_start.strftime('%b'),
+            'month': datetime(filter_year, month, 1).strftime('%b'),
             'expenses': float(month_total),
             'income': float(month_income),
             'profit': float(month_income - month_total)
         })
     
     # Income sources breakdown
-    income_by_source = {}
-    for inc in incomes:
-        source = inc.source
-        income_by_source[source] = income_by_source.get(source, 0) + inc.amount
+    income_by_source = aggregates.income_source_breakdown(
+        current_user.id, period_start, period_end, inclusive_end=True
+    )
     
     income_breakdown = [{
-        'source': source,
-        'amount': float(amount),
-        'percentage': round((amount / total_income * 100) if total_income > 0 else 0, 1)
-    } for source, amount in sorted(income_by_source.items(), key=lambda x: x[1], reverse=True)]
+        'source': src.source,
+        'amount': float(src.total),
+        'percentage': round((src.total / total_income * 100) if total_income > 0 else 0, 1)
+    } for src in income_by_source]
     
     return jsonify({
         'total_spent': float(total_spent),
@@ -1,11 +1,10 @@
 from flask import Blueprint, request, jsonify, current_app
 from flask_login import login_required, current_user
-from app import db
+from app import db, aggregates, patterns
+from app.cache import mark_user_changed
 from app.models import RecurringExpense, Expense, Category
 from datetime import datetime, timedelta
 from dateutil.relativedelta import relativedelta
-from collections import defaultdict
-import re
 
 bp = Blueprint('recurring', __name__, url_prefix='/api/recurring')
 
@@ -233,45 +232,35 @@ def create_expense_from_recurring(recurring_id):
     }), 201
 
 
-@bp.route('/detect', methods=['POST'])
-@login_required
-def detect_recurring_patterns():
+def find_recurring_suggestions(user_id):
     """
-    Detect recurring expense patterns from historical expenses
-    Returns suggestions for potential recurring expenses
+    Detect recurring expense patterns from the user's last 6 months of expenses
+    Reads candidate groups from the incremental pattern index (app/patterns.py)
+    Returns: (suggestions sorted by confidence, message)
     """
-    # Get user's expenses from last 6 months
     six_months_ago = datetime.utcnow() - relativedelta(months=6)
-    expenses = Expense.query.filter(
-        Expense.user_id == current_user.id,
-        Expense.date >= six_months_ago
-    ).order_by(Expense.date.asc()).all()
+    if aggregates.window_count(Expense, user_id, six_months_ago) < 10:
+        return [], 'Not enough expense history to detect patterns'
     
-    if len(expenses) < 10:
-        return jsonify({
-            'suggestions': [],
-            'message': 'Not enough expense history to detect patterns'
-        })
+    # Need at least 3 occurrences; groups use 10 currency unit amount buckets
+    candidates = patterns.candidate_patterns(user_id, bucket_size=10, min_occurrences=3)
     
-    # Group expenses by similar descriptions and amounts
-    patterns = defaultdict(list)
-    
-    for expense in expenses:
-        # Normalize description (lowercase, remove numbers/special chars)
-        normalized_desc = re.sub(r'[^a-z\s]', '', expense.description.lower()).strip()
-        
-        # Create a key based on normalized description and approximate amount
-        amount_bucket = round(expense.amount / 10) * 10  # Group by 10 currency units
-        key = f"{normalized_desc}_{amount_bucket}_{expense.category_id}"
-        
-        patterns[key].append(expense)
+    # Existing recurring expenses and category details, fetched once for all candidates
+    existing = set(
+        db.session.query(RecurringExpense.name, RecurringExpense.category_id)
+        .filter(RecurringExpense.user_id == user_id).all()
+    )
+    categories = {
+        category.id: category for category in Category.query.filter(
+            Category.id.in_({pattern.category_id for pattern in candidates})
+        ).all()
+    } if candidates else {}
     
     suggestions = []
     
     # Analyze patterns
-    for key, expense_list in patterns.items():
-        if len(expense_list) < 3:  # Need at least 3 occurrences
-            continue
+    for pattern in candidates:
+        expense_list = pattern.occurrences
         
         # Calculate intervals between expenses
         intervals = []
@@ -279,10 +268,9 @@ def detect_recurring_patterns():
             days_diff = (expense_list[i].date - expense_list[i-1].date).days
             intervals.append(days_diff)
         
-        if not intervals:
-            continue
-        
         avg_interval = sum(intervals) / len(intervals)
+        if avg_interval <= 0:  # All on the same day: no period to detect
+            continue
         # Check variance to ensure consistency
         variance = sum((x - avg_interval) ** 2 for x in intervals) / len(intervals)
         std_dev = variance ** 0.5
@@ -315,22 +303,17 @@ def detect_recurring_patterns():
             # Use most recent expense data
             latest = expense_list[-1]
             avg_amount = sum(e.amount for e in expense_list) / len(expense_list)
+            category = categories.get(latest.category_id)
             
-            # Check if already exists as recurring expense
-            existing = RecurringExpense.query.filter_by(
-                user_id=current_user.id,
-                name=latest.description,
-                category_id=latest.category_id
-            ).first()
-            
-            if not existing:
+            # Skip patterns that already exist as a recurring expense
+            if category and (latest.description, latest.category_id) not in existing:
                 suggestions.append({
                     'name': latest.description,
                     'amount': round(avg_amount, 2),
                     'currency': latest.currency,
                     'category_id': latest.category_id,
-                    'category_name': latest.category.name,
-                    'category_color': latest.category.color,
+                    'category_name': category.name,
+                    'category_color': category.color,
                     'frequency': frequency,
                     'day_of_period': day_of_period,
                     'confidence_score': round(confidence, 1),
@@ -341,9 +324,20 @@ def detect_recurring_patterns():
     # Sort by confidence score
     suggestions.sort(key=lambda x: x['confidence_score'], reverse=True)
     
+    return suggestions, f'Found {len(suggestions)} potential recurring expenses'
+
+
+@bp.route('/detect', methods=['POST'])
+@login_required
+def detect_recurring_patterns():
+    """
+    Detect recurring expense patterns from historical expenses
+    Returns suggestions for potential recurring expenses
+    """
+    suggestions, message = find_recurring_suggestions(current_user.id)
     return jsonify({
         'suggestions': suggestions[:10],  # Return top 10
-        'message': f'Found {len(suggestions)} potential recurring expenses'
+        'message': message
     })
 
 
@@ -455,6 +449,7 @@ def sync_currency():
         RecurringExpense.query.filter_by(user_id=current_user.id).update(
             {'currency': current_user.currency}
         )
+        mark_user_changed(db.session, current_user.id)
         db.session.commit()
         
         return jsonify({
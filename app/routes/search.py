@@ -5,9 +5,11 @@ Security: All searches filtered by user_id to prevent data leakage
 """
 from flask import Blueprint, request, jsonify
 from flask_login import login_required, current_user
+from app import search_index, typeahead, cache
+from app.feature_index import FeatureIndex
 from app.models import Expense, Document, Category, RecurringExpense, Tag
 from sqlalchemy import or_, func
-from datetime import datetime
+from sqlalchemy.orm import joinedload
 
 bp = Blueprint('search', __name__, url_prefix='/api/search')
 
@@ -89,6 +91,153 @@ ADMIN_FEATURES = [
     }
 ]
 
+# Built once at import: the command palette searches features on every keypress
+FEATURE_INDEX = FeatureIndex(APP_FEATURES, ADMIN_FEATURES)
+
+
+def _expense_hits(user_id, query, limit, ids=None):
+    """Ranked full-text matches on description and receipt OCR text (app/search_index.py)"""
+    matches = search_index.search_expenses(user_id, query, limit, ids)
+    expenses = {
+        expense.id: expense for expense in Expense.query.options(joinedload(Expense.category)).filter(
+            Expense.user_id == user_id,
+            Expense.id.in_([expense_id for expense_id, _, _ in matches])
+        ).all()
+    } if matches else {}
+    
+    hits = []
+    for expense_id, snippet, ocr_match in matches:
+        expense = expenses.get(expense_id)
+        if expense is None:
+            continue
+        hits.append(({
+            'id': expense.id,
+            'type': 'expense',
+            'description': expense.description,
+            'amount': expense.amount,
+            'currency': expense.currency,
+            'category_name': expense.category.name if expense.category else None,
+            'category_color': expense.category.color if expense.category else None,
+            'date': expense.date.isoformat(),
+            'has_receipt': bool(expense.receipt_path),
+            'ocr_match': ocr_match,
+            'snippet': snippet,
+            'url': '/transactions'
+        }, search_index.match_key(expense.description, expense.receipt_ocr_text)))
+    return hits
+
+
+def _document_hits(user_id, query, limit, ids=None):
+    """Ranked full-text matches on filename and OCR text"""
+    matches = search_index.search_documents(user_id, query, limit, ids)
+    documents = {
+        doc.id: doc for doc in Document.query.filter(
+            Document.user_id == user_id,
+            Document.id.in_([doc_id for doc_id, _, _ in matches])
+        ).all()
+    } if matches else {}
+    
+    hits = []
+    for doc_id, snippet, ocr_match in matches:
+        doc = documents.get(doc_id)
+        if doc is None:
+            continue
+        hits.append(({
+            'id': doc.id,
+            'type': 'document',
+            'filename': doc.original_filename,
+            'file_type': doc.file_type,
+            'file_size': doc.file_size,
+            'category': doc.document_category,
+            'created_at': doc.created_at.isoformat(),
+            'ocr_match': ocr_match,
+            'snippet': snippet,
+            'url': '/documents'
+        }, search_index.match_key(doc.original_filename, doc.ocr_text)))
+    return hits
+
+
+def _category_hits(user_id, query, limit, ids=None):
+    categories = Category.query.filter_by(user_id=user_id).filter(
+        Category.name.ilike(f'%{query}%')
+    )
+    if ids is not None:
+        categories = categories.filter(Category.id.in_(ids))
+    categories = categories.order_by(Category.display_order).limit(limit).all()
+    
+    return [({
+        'id': category.id,
+        'type': 'category',
+        'name': category.name,
+        'color': category.color,
+        'icon': category.icon,
+        'url': '/transactions'
+    }, category.name.lower()) for category in categories]
+
+
+def _recurring_hits(user_id, query, limit, ids=None):
+    recurring = RecurringExpense.query.options(joinedload(RecurringExpense.category)).filter_by(
+        user_id=user_id
+    ).filter(
+        or_(
+            RecurringExpense.name.ilike(f'%{query}%'),
+            RecurringExpense.notes.ilike(f'%{query}%')
+        )
+    )
+    if ids is not None:
+        recurring = recurring.filter(RecurringExpense.id.in_(ids))
+    recurring = recurring.order_by(RecurringExpense.next_due_date).limit(limit).all()
+    
+    return [({
+        'id': rec.id,
+        'type': 'recurring',
+        'name': rec.name,
+        'amount': rec.amount,
+        'currency': rec.currency,
+        'frequency': rec.frequency,
+        'category_name': rec.category.name if rec.category else None,
+        'category_color': rec.category.color if rec.category else None,
+        'next_due_date': rec.next_due_date.isoformat(),
+        'is_active': rec.is_active,
+        'url': '/recurring'
+    }, '\n'.join(text.lower() for text in (rec.name, rec.notes) if text)) for rec in recurring]
+
+
+def _tag_hits(user_id, query, limit, ids=None):
+    tags = Tag.query.filter(
+        Tag.user_id == user_id,
+        Tag.name.ilike(f'%{query}%')
+    )
+    if ids is not None:
+        tags = tags.filter(Tag.id.in_(ids))
+    tags = tags.limit(limit).all()
+    
+    return [({
+        'id': tag.id,
+        'type': 'tag',
+        'name': tag.name,
+        'color': tag.color,
+        'icon': tag.icon,
+        'use_count': tag.use_count,
+        'is_auto': tag.is_auto
+    }, tag.name.lower()) for tag in tags]
+
+
+def _substring_matches(key, query):
+    """Mirror of the ILIKE '%query%' filters, for cached typeahead candidates"""
+    return query.lower() in key
+
+
+# Each source returns (result, match key) pairs, optionally among given ids; the key lets
+# typeahead re-filter cached candidates
+CONTENT_SOURCES = (
+    typeahead.Source('expenses', _expense_hits, search_index.match_key_matches),
+    typeahead.Source('documents', _document_hits, search_index.match_key_matches),
+    typeahead.Source('categories', _category_hits, _substring_matches),
+    typeahead.Source('recurring', _recurring_hits, _substring_matches),
+    typeahead.Source('tags', _tag_hits, _substring_matches),
+)
+
 
 @bp.route('/', methods=['GET'])
 @login_required
@@ -103,8 +252,9 @@ def global_search():
     
     Returns:
     - features: Matching app features/pages
-    - expenses: Matching expenses (by description or OCR text)
-    - documents: Matching documents (by filename or OCR text)
+    - expenses: Matching expenses (by description or OCR text), best match first
+    - documents: Matching documents (by filename or OCR text), best match first
+      (OCR matches carry an HTML-escaped snippet with <mark>ed terms)
     - categories: Matching categories
     - recurring: Matching recurring expenses
     """
@@ -126,146 +276,12 @@ def global_search():
         'tags': []
     }
     
-    # Search app features
-    query_lower = query.lower()
-    for feature in APP_FEATURES:
-        # Check if query matches any keyword
-        if any(query_lower in keyword.lower() for keyword in feature['keywords']):
-            results['features'].append({
-                'id': feature['id'],
-                'type': 'feature',
-                'name': feature['name'],
-                'name_ro': feature['name_ro'],
-                'description': feature['description'],
-                'description_ro': feature['description_ro'],
-                'icon': feature['icon'],
-                'url': feature['url']
-            })
-    
-    # Add admin features if user is admin
-    if current_user.is_admin:
-        for feature in ADMIN_FEATURES:
-            if any(query_lower in keyword.lower() for keyword in feature['keywords']):
-                results['features'].append({
-                    'id': feature['id'],
-                    'type': 'feature',
-                    'name': feature['name'],
-                    'name_ro': feature['name_ro'],
-                    'description': feature['description'],
-                    'description_ro': feature['description_ro'],
-                    'icon': feature['icon'],
-                    'url': feature['url']
-                })
+    # Search app features (ranked lookups in the index built at import time)
+    results['features'] = FEATURE_INDEX.search(query, include_admin=current_user.is_admin)
     
-    # Search expenses - Security: filter by user_id
-    expense_query = Expense.query.filter_by(user_id=current_user.id)
-    expense_query = expense_query.filter(
-        or_(
-            Expense.description.ilike(f'%{query}%'),
-            Expense.receipt_ocr_text.ilike(f'%{query}%')
-        )
-    )
-    expenses = expense_query.order_by(Expense.date.desc()).limit(limit).all()
-    
-    for expense in expenses:
-        # Check if match is from OCR text
-        ocr_match = expense.receipt_ocr_text and query_lower in expense.receipt_ocr_text.lower()
-        
-        results['expenses'].append({
-            'id': expense.id,
-            'type': 'expense',
-            'description': expense.description,
-            'amount': expense.amount,
-            'currency': expense.currency,
-            'category_name': expense.category.name if expense.category else None,
-            'category_color': expense.category.color if expense.category else None,
-            'date': expense.date.isoformat(),
-            'has_receipt': bool(expense.receipt_path),
-            'ocr_match': ocr_match,
-            'url': '/transactions'
-        })
-    
-    # Search documents - Security: filter by user_id
-    doc_query = Document.query.filter_by(user_id=current_user.id)
-    doc_query = doc_query.filter(
-        or_(
-            Document.original_filename.ilike(f'%{query}%'),
-            Document.ocr_text.ilike(f'%{query}%')
-        )
-    )
-    documents = doc_query.order_by(Document.created_at.desc()).limit(limit).all()
-    
-    for doc in documents:
-        # Check if match is from OCR text
-        ocr_match = doc.ocr_text and query_lower in doc.ocr_text.lower()
-        
-        results['documents'].append({
-            'id': doc.id,
-            'type': 'document',
-            'filename': doc.original_filename,
-            'file_type': doc.file_type,
-            'file_size': doc.file_size,
-            'category': doc.document_category,
-            'created_at': doc.created_at.isoformat(),
-            'ocr_match': ocr_match,
-            'url': '/documents'
-        })
-    
-    # Search categories - Security: filter by user_id
-    categories = Category.query.filter_by(user_id=current_user.id).filter(
-        Category.name.ilike(f'%{query}%')
-    ).order_by(Category.display_order).limit(limit).all()
-    
-    for category in categories:
-        results['categories'].append({
-            'id': category.id,
-            'type': 'category',
-            'name': category.name,
-            'color': category.color,
-            'icon': category.icon,
-            'url': '/transactions'
-        })
-    
-    # Search recurring expenses - Security: filter by user_id
-    recurring = RecurringExpense.query.filter_by(user_id=current_user.id).filter(
-        or_(
-            RecurringExpense.name.ilike(f'%{query}%'),
-            RecurringExpense.notes.ilike(f'%{query}%')
-        )
-    ).order_by(RecurringExpense.next_due_date).limit(limit).all()
-    
-    for rec in recurring:
-        results['recurring'].append({
-            'id': rec.id,
-            'type': 'recurring',
-            'name': rec.name,
-            'amount': rec.amount,
-            'currency': rec.currency,
-            'frequency': rec.frequency,
-            'category_name': rec.category.name if rec.category else None,
-            'category_color': rec.category.color if rec.category else None,
-            'next_due_date': rec.next_due_date.isoformat(),
-            'is_active': rec.is_active,
-            'url': '/recurring'
-        })
-    
-    # Search tags
-    # Security: Filtered by user_id
-    tags = Tag.query.filter(
-        Tag.user_id == current_user.id,
-        Tag.name.ilike(f'%{query}%')
-    ).limit(limit).all()
-    
-    for tag in tags:
-        results['tags'].append({
-            'id': tag.id,
-            'type': 'tag',
-            'name': tag.name,
-            'color': tag.color,
-            'icon': tag.icon,
-            'use_count': tag.use_count,
-            'is_auto': tag.is_auto
-        })
+    # Search user content - Security: every source filters by user_id
+    for source in CONTENT_SOURCES:
+        results[source.name] = [result for result, _ in source.fetch(current_user.id, query, limit)]
     
     # Calculate total results
     total_results = sum([
@@ -283,3 +299,60 @@ def global_search():
         'total_results': total_results,
         'results': results
     })
+
+
+@bp.route('/typeahead', methods=['GET'])
+@login_required
+def typeahead_search():
+    """
+    Search-as-you-type variant of global search
+    Security: All data searches filtered by current_user.id
+    
+    Query params:
+    - q: Search query string
+    - limit: Max results per category (default 5)
+    - seq: Increasing request number from the client (optional)
+    - client: Client/tab id that seq numbers belong to (optional)
+    
+    Returns the same result groups as global search. Extensions of a recent
+    query are answered from its cached candidates (app/typeahead.py). When a
+    newer request of the same client has arrived, returns stale=true without
+    results so the client can drop it.
+    """
+    query = request.args.get('q', '').strip()
+    limit = request.args.get('limit', 5, type=int)
+    seq = request.args.get('seq', type=int)
+    client = request.args.get('client', 'default')[:64]
+    
+    if not query or len(query) < typeahead.MIN_QUERY:
+        return jsonify({
+            'success': False,
+            'message': 'Query must be at least 2 characters'
+        }), 400
+    
+    def is_current():
+        return seq is None or cache.claim_sequence(current_user.id, f'search:{client}', seq) <= seq
+    
+    def stale():
+        return jsonify({'success': True, 'stale': True, 'seq': seq, 'query': query})
+    
+    if not is_current():
+        return stale()
+    
+    try:
+        content, cached = typeahead.search(current_user.id, query, CONTENT_SOURCES, limit, is_current)
+    except typeahead.Superseded:
+        return stale()
+    
+    results = {'features': FEATURE_INDEX.search(query, include_admin=current_user.is_admin)}
+    results.update(content)
+    
+    return jsonify({
+        'success': True,
+        'stale': False,
+        'seq': seq,
+        'query': query,
+        'cached': cached,
+        'total_results': sum(len(group) for group in results.values()),
+        'results': results
+    })
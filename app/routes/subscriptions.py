@@ -9,12 +9,11 @@ Security: All queries filtered by current_user.id
 """
 from flask import Blueprint, request, jsonify
 from flask_login import login_required, current_user
-from app import db
+from app import db, aggregates, patterns
 from app.models import RecurringExpense, Expense, Category
 from datetime import datetime, timedelta
 from dateutil.relativedelta import relativedelta
 from collections import defaultdict
-import re
 
 bp = Blueprint('subscriptions', __name__, url_prefix='/api/subscriptions')
 
@@ -323,6 +322,16 @@ SUBSCRIPTION_SERVICES = {
 }
 
 
+def _service_info(service_key):
+    service_info = SUBSCRIPTION_SERVICES[service_key]
+    return {
+        'service_name': service_key,
+        'icon': service_info['icon'],
+        'color': service_info['color'],
+        'category': service_info['category']
+    }
+
+
 def detect_subscription_service(description):
     """
     Detect if an expense description matches a known subscription service
@@ -333,12 +342,7 @@ def detect_subscription_service(description):
     for service_key, service_info in SUBSCRIPTION_SERVICES.items():
         for pattern in service_info['patterns']:
             if pattern in desc_lower:
-                return {
-                    'service_name': service_key,
-                    'icon': service_info['icon'],
-                    'color': service_info['color'],
-                    'category': service_info['category']
-                }
+                return _service_info(service_key)
     return None
 
 
@@ -601,68 +605,61 @@ def dismiss_reminder(subscription_id):
     })
 
 
-@bp.route('/detect', methods=['POST'])
-@login_required
-def detect_subscriptions():
+def find_subscription_suggestions(user_id):
     """
-    Auto-detect potential subscriptions from expense history
-    Enhanced detection using known subscription patterns
+    Detect potential subscriptions from the user's last 6 months of expenses
+    Reads candidate groups from the incremental pattern index (app/patterns.py)
+    Returns: (suggestions sorted by confidence, message)
     """
-    # Get user's expenses from last 6 months
     six_months_ago = datetime.utcnow() - relativedelta(months=6)
-    expenses = Expense.query.filter(
-        Expense.user_id == current_user.id,
-        Expense.date >= six_months_ago
-    ).order_by(Expense.date.asc()).all()
-    
-    if len(expenses) < 5:
-        return jsonify({
-            'suggestions': [],
-            'message': 'Not enough expense history to detect subscriptions'
-        })
-    
-    # Group expenses by similar descriptions and amounts
-    patterns = defaultdict(list)
+    if aggregates.window_count(Expense, user_id, six_months_ago) < 5:
+        return [], 'Not enough expense history to detect subscriptions'
     
-    for expense in expenses:
-        # First check if this matches a known subscription service
-        service_info = detect_subscription_service(expense.description)
-        
-        # Normalize description
-        normalized_desc = re.sub(r'[^a-z\s]', '', expense.description.lower()).strip()
-        
-        # Create a key based on normalized description and approximate amount
-        amount_bucket = round(expense.amount / 5) * 5  # Group by 5 currency units for subscriptions
-        key = f"{normalized_desc}_{amount_bucket}_{expense.category_id}"
-        
-        patterns[key].append({
-            'expense': expense,
-            'service_info': service_info
-        })
+    # Need at least 2 occurrences; groups use 5 currency unit amount buckets
+    candidates = patterns.candidate_patterns(user_id, bucket_size=5, min_occurrences=2)
     
-    suggestions = []
+    # Existing subscriptions and recurring expenses, fetched once to avoid duplicates
     existing_services = set()
+    existing_recurring = set()
+    existing_rows = db.session.query(
+        RecurringExpense.name, RecurringExpense.category_id,
+        RecurringExpense.is_subscription, RecurringExpense.service_name
+    ).filter(RecurringExpense.user_id == user_id).all()
+    for name, category_id, is_subscription, service_name in existing_rows:
+        existing_recurring.add((name, category_id))
+        if is_subscription:
+            if service_name:
+                existing_services.add(service_name)
+            existing_services.add(name.lower())
+    
+    categories = {
+        category.id: category for category in Category.query.filter(
+            Category.id.in_({pattern.category_id for pattern in candidates})
+        ).all()
+    } if candidates else {}
+    
+    # Known services were matched when each expense was written (expense_classifier)
+    services_by_description = dict(
+        db.session.query(Expense.description, Expense.service_name).filter(
+            Expense.user_id == user_id,
+            Expense.date >= six_months_ago,
+            Expense.service_name.isnot(None)
+        ).distinct().all()
+    ) if candidates else {}
     
-    # Get existing subscriptions to avoid duplicates
-    existing_subs = RecurringExpense.query.filter_by(
-        user_id=current_user.id,
-        is_subscription=True
-    ).all()
-    for sub in existing_subs:
-        if sub.service_name:
-            existing_services.add(sub.service_name)
-        existing_services.add(sub.name.lower())
+    suggestions = []
     
     # Analyze patterns
-    for key, expense_data_list in patterns.items():
-        if len(expense_data_list) < 2:  # Need at least 2 occurrences for subscriptions
-            continue
-        
-        expense_list = [ed['expense'] for ed in expense_data_list]
-        service_infos = [ed['service_info'] for ed in expense_data_list if ed['service_info']]
+    for pattern in candidates:
+        expense_list = pattern.occurrences
         
-        # If any expense matched a known service, prioritize that
-        service_info = service_infos[0] if service_infos else None
+        # If any expense matched a known subscription service, prioritize that
+        service_info = None
+        for e in expense_list:
+            service_key = services_by_description.get(e.description)
+            if service_key in SUBSCRIPTION_SERVICES:
+                service_info = _service_info(service_key)
+                break
         
         # Calculate intervals between expenses
         intervals = []
@@ -670,9 +667,6 @@ def detect_subscriptions():
             days_diff = (expense_list[i].date - expense_list[i-1].date).days
             intervals.append(days_diff)
         
-        if not intervals:
-            continue
-        
         avg_interval = sum(intervals) / len(intervals)
         variance = sum((x - avg_interval) ** 2 for x in intervals) / len(intervals)
         std_dev = variance ** 0.5
@@ -711,6 +705,7 @@ def detect_subscriptions():
         if frequency and confidence > 50:
             latest = expense_list[-1]
             avg_amount = sum(e.amount for e in expense_list) / len(expense_list)
+            category = categories.get(latest.category_id)
             
             # Check if already exists
             if service_info and service_info['service_name'] in existing_services:
@@ -719,20 +714,14 @@ def detect_subscriptions():
                 continue
             
             # Check if already exists as a regular recurring expense
-            existing = RecurringExpense.query.filter_by(
-                user_id=current_user.id,
-                name=latest.description,
-                category_id=latest.category_id
-            ).first()
-            
-            if not existing:
+            if category and (latest.description, latest.category_id) not in existing_recurring:
                 suggestion = {
                     'name': latest.description,
                     'amount': round(avg_amount, 2),
                     'currency': latest.currency,
                     'category_id': latest.category_id,
-                    'category_name': latest.category.name,
-                    'category_color': latest.category.color,
+                    'category_name': category.name,
+                    'category_color': category.color,
                     'frequency': frequency,
                     'day_of_period': day_of_period,
                     'confidence_score': round(confidence, 1),
@@ -751,9 +740,20 @@ def detect_subscriptions():
     # Sort by confidence score
     suggestions.sort(key=lambda x: x['confidence_score'], reverse=True)
     
+    return suggestions, f'Found {len(suggestions)} potential subscriptions'
+
+
+@bp.route('/detect', methods=['POST'])
+@login_required
+def detect_subscriptions():
+    """
+    Auto-detect potential subscriptions from expense history
+    Enhanced detection using known subscription patterns
+    """
+    suggestions, message = find_subscription_suggestions(current_user.id)
     return jsonify({
         'suggestions': suggestions[:15],
-        'message': f'Found {len(suggestions)} potential subscriptions'
+        'message': message
     })
 
 
@@ -190,7 +190,7 @@ def suggest_tags():
     if not data or not data.get('text'):
         return jsonify({'success': False, 'message': 'Text is required'}), 400
     
-    from app.utils.auto_tagger import extract_tags_from_text
+    from app.auto_tagger import extract_tags_from_text
     
     text = str(data.get('text'))
     max_tags = data.get('max_tags', 5)
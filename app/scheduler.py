@@ -3,230 +3,393 @@ Scheduler for background tasks like auto-creating recurring expenses and income,
 and generating spending insights
 """
 from apscheduler.schedulers.background import BackgroundScheduler
+from apscheduler.schedulers.blocking import BlockingScheduler
 from apscheduler.triggers.cron import CronTrigger
+from apscheduler.triggers.interval import IntervalTrigger
 from datetime import datetime, timedelta
-from app import db
-from app.models import RecurringExpense, Expense, Income, User, SpendingInsight, UserInsightPreferences
+from functools import wraps
+from flask import has_app_context, current_app
+from sqlalchemy import or_
+from sqlalchemy.exc import IntegrityError
+from app import db, rollups, patterns, expense_classifier, insight_pipeline, job_runs
+from app.cache import mark_user_changed
+from app.models import RecurringExpense, Expense, Income, User, SchedulerLock
 from app.routes.recurring import calculate_next_due_date
 from app.routes.income import calculate_income_next_due_date
-from collections import defaultdict
+import json
 import logging
-import re
+import os
+import signal
+import socket
+import uuid
 
 logger = logging.getLogger(__name__)
 
+# Leader election: one lease row shared by every process that runs a scheduler
+LEADER_LOCK = 'scheduler'
+LEADER_TTL = timedelta(seconds=90)
+HEARTBEAT_SECONDS = 30
+NODE_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+# Recurring auto-creation: due items are paged by id and created in batches
+RECURRING_BATCH_SIZE = 500
+# Occurrences created per overdue item in one run; the rest follow on the next run
+MAX_CATCH_UP = 60
+KEY_LOOKUP_CHUNK = 500
+
+# App captured when the jobs are registered; every run reuses it (and its engine)
+_job_app = None
+
+
+def _get_job_app():
+    """
+    App for a job run: the scheduler's app, the current app when called from a
+    request (manual trigger), or a worker-mode app built once on first use
+    """
+    global _job_app
+    if _job_app is None:
+        if has_app_context():
+            return current_app._get_current_object()
+        from app import create_worker_app
+        _job_app = create_worker_app()
+    return _job_app
+
+
+def _recurring_key(prefix, recurring_id, due):
+    """Idempotency key of one occurrence of a recurring item"""
+    return f"{prefix}:{recurring_id}:{due:%Y-%m-%d}"
+
+
+def _due_occurrences(first_due, advance, now):
+    """
+    Due dates from first_due up to now (catch-up, at most MAX_CATCH_UP) and
+    the next due date after them
+    """
+    occurrences = []
+    due = first_due
+    while due is not None and due <= now and len(occurrences) < MAX_CATCH_UP:
+        occurrences.append(due)
+        due = advance(due)
+    return occurrences, due
+
+
+def _existing_keys(model, keys):
+    """Idempotency keys that already have a created row (one query per chunk)"""
+    existing = set()
+    keys = list(keys)
+    for i in range(0, len(keys), KEY_LOOKUP_CHUNK):
+        existing.update(
+            key for (key,) in db.session.query(model.recurring_key).filter(
+                model.recurring_key.in_(keys[i:i + KEY_LOOKUP_CHUNK])
+            )
+        )
+    return existing
+
+
+def _create_due_batch(source, target, prefix, batch, advance, build_row, now):
+    """
+    Create the entries for one page of due recurring items and advance them
+    Returns the number of entries created
+    """
+    planned = []
+    updates = []
+    for item in batch:
+        occurrences, next_due = _due_occurrences(item.next_due_date, lambda due: advance(item, due), now)
+        if not occurrences:
+            continue
+        planned.extend((item, due, _recurring_key(prefix, item.id, due)) for due in occurrences)
+        updates.append({'id': item.id, 'next_due_date': next_due, 'last_created_date': now})
+    
+    existing = _existing_keys(target, (key for _, _, key in planned))
+    rows = []
+    for item, due, key in planned:
+        if key in existing:
+            continue
+        row = build_row(item, due)
+        row['recurring_key'] = key
+        rows.append(row)
+    
+    if rows:
+        # return_defaults fills in the new ids, which the pattern index keys occurrences by
+        db.session.bulk_insert_mappings(target, rows, return_defaults=target is Expense)
+        # Bulk writes skip flush events: keep rollups, patterns and cached analytics in step by hand
+        rollups.record_bulk_insert(db.session, target, rows)
+        if target is Expense:
+            patterns.record_bulk_insert(db.session, rows)
+        for user_id in {row['user_id'] for row in rows}:
+            mark_user_changed(db.session, user_id)
+    if updates:
+        db.session.bulk_update_mappings(source, updates)
+    db.session.commit()
+    return len(rows)
+
+
+def _process_due_recurring(source, target, prefix, columns, due_filters, advance, build_row):
+    """
+    Page through due recurring items by id and create their entries in batches
+    Returns the number of entries created
+    """
+    now = datetime.utcnow()
+    created_count = 0
+    last_id = 0
+    
+    while True:
+        batch = db.session.query(*columns).filter(
+            *due_filters,
+            source.next_due_date <= now,
+            source.id > last_id
+        ).order_by(source.id).limit(RECURRING_BATCH_SIZE).all()
+        if not batch:
+            break
+        last_id = batch[-1].id
+        
+        try:
+            created_count += _create_due_batch(source, target, prefix, batch, advance, build_row, now)
+        except Exception as e:
+            logger.error(f"Error processing recurring {source.__tablename__} ids {batch[0].id}-{last_id}: {str(e)}")
+            db.session.rollback()
+    
+    return created_count
+
+
 def process_due_recurring_expenses():
     """
     Process all due recurring expenses and create actual expenses for them
+    Items several periods overdue get one expense per missed occurrence
     Security: User isolation is maintained through foreign keys
     """
     try:
-        from app import create_app
-        app = create_app()
+        app = _get_job_app()
         
         with app.app_context():
-            today = datetime.utcnow().date()
-            
-            # Find all active recurring expenses that are due today or overdue and have auto_create enabled
-            due_recurring = RecurringExpense.query.filter(
-                RecurringExpense.is_active == True,
-                RecurringExpense.auto_create == True,
-                RecurringExpense.next_due_date <= datetime.utcnow()
-            ).all()
-            
-            created_count = 0
-            
-            for recurring in due_recurring:
-                try:
-                    # Check if we already created an expense today for this recurring expense
-                    # to avoid duplicates
-                    existing_today = Expense.query.filter(
-                        Expense.user_id == recurring.user_id,
-                        Expense.description == recurring.name,
-                        Expense.category_id == recurring.category_id,
-                        db.func.date(Expense.date) == today
-                    ).first()
-                    
-                    if existing_today:
-                        logger.info(f"Expense already exists for recurring ID {recurring.id} today, skipping")
-                        continue
-                    
-                    # Create the expense
-                    expense = Expense(
-                        amount=recurring.amount,
-                        currency=recurring.currency,
-                        description=recurring.name,
-                        category_id=recurring.category_id,
-                        user_id=recurring.user_id,
-                        tags=['recurring', recurring.frequency, 'auto-created'],
-                        date=datetime.utcnow()
-                    )
-                    expense.set_tags(['recurring', recurring.frequency, 'auto-created'])
-                    
-                    db.session.add(expense)
-                    
-                    # Update recurring expense
-                    recurring.last_created_date = datetime.utcnow()
-                    recurring.next_due_date = calculate_next_due_date(
-                        recurring.frequency,
-                        recurring.day_of_period,
-                        recurring.next_due_date
-                    )
-                    
-                    created_count += 1
-                    logger.info(f"Created expense from recurring ID {recurring.id} for user {recurring.user_id}")
-                    
-                except Exception as e:
-                    logger.error(f"Error processing recurring expense ID {recurring.id}: {str(e)}")
-                    db.session.rollback()
-                    continue
+            created_count = _process_due_recurring(
+                RecurringExpense, Expense, 'expense',
+                columns=(
+                    RecurringExpense.id, RecurringExpense.user_id, RecurringExpense.name,
+                    RecurringExpense.amount, RecurringExpense.currency, RecurringExpense.category_id,
+                    RecurringExpense.frequency, RecurringExpense.day_of_period, RecurringExpense.next_due_date
+                ),
+                due_filters=(
+                    RecurringExpense.is_active == True,
+                    RecurringExpense.auto_create == True
+                ),
+                advance=lambda item, due: calculate_next_due_date(item.frequency, item.day_of_period, due),
+                build_row=lambda item, due: {
+                    'amount': item.amount,
+                    'currency': item.currency,
+                    'description': item.name,
+                    'category_id': item.category_id,
+                    'user_id': item.user_id,
+                    'tags': json.dumps(['recurring', item.frequency, 'auto-created']),
+                    'date': due,
+                    # Bulk inserts skip the flush-time classifier
+                    **expense_classifier.classify(item.name)
+                }
+            )
             
             if created_count > 0:
-                db.session.commit()
                 logger.info(f"Successfully created {created_count} expenses from recurring expenses")
             else:
                 logger.info("No recurring expenses due for processing")
+            return created_count
                 
     except Exception as e:
         logger.error(f"Error in process_due_recurring_expenses: {str(e)}")
+        raise
 
 
 def process_due_recurring_income():
     """
     Process all due recurring income and create actual income entries for them
+    Items several periods overdue get one entry per missed occurrence
     Security: User isolation is maintained through foreign keys
     """
     try:
-        from app import create_app
-        app = create_app()
+        app = _get_job_app()
         
         with app.app_context():
-            today = datetime.utcnow().date()
-            
-            # Find all active recurring income that are due today or overdue and have auto_create enabled
-            due_recurring = Income.query.filter(
-                Income.is_active == True,
-                Income.auto_create == True,
-                Income.frequency != 'once',
-                Income.next_due_date <= datetime.utcnow()
-            ).all()
-            
-            created_count = 0
-            
-            for recurring in due_recurring:
-                try:
-                    # Check if we already created income today for this recurring income
-                    # to avoid duplicates
-                    existing_today = Income.query.filter(
-                        Income.user_id == recurring.user_id,
-                        Income.description == recurring.description,
-                        Income.source == recurring.source,
-                        Income.frequency == 'once',  # Only check one-time income entries
-                        db.func.date(Income.date) == today
-                    ).first()
-                    
-                    if existing_today:
-                        logger.info(f"Income already exists for recurring ID {recurring.id} today, skipping")
-                        continue
-                    
-                    # Create the income entry
-                    income = Income(
-                        amount=recurring.amount,
-                        currency=recurring.currency,
-                        description=recurring.description,
-                        source=recurring.source,
-                        user_id=recurring.user_id,
-                        tags=recurring.tags,
-                        frequency='once',  # Created income is one-time
-                        date=datetime.utcnow()
-                    )
-                    
-                    db.session.add(income)
-                    
-                    # Update recurring income
-                    recurring.last_created_date = datetime.utcnow()
-                    recurring.next_due_date = calculate_income_next_due_date(
-                        recurring.frequency,
-                        recurring.custom_days,
-                        recurring.last_created_date
-                    )
-                    
-                    created_count += 1
-                    logger.info(f"Created income from recurring ID {recurring.id} for user {recurring.user_id}")
-                    
-                except Exception as e:
-                    logger.error(f"Error processing recurring income ID {recurring.id}: {str(e)}")
-                    db.session.rollback()
-                    continue
+            created_count = _process_due_recurring(
+                Income, Income, 'income',
+                columns=(
+                    Income.id, Income.user_id, Income.amount, Income.currency, Income.description,
+                    Income.source, Income.tags, Income.frequency, Income.custom_days, Income.next_due_date
+                ),
+                due_filters=(
+                    Income.is_active == True,
+                    Income.auto_create == True,
+                    Income.frequency != 'once'
+                ),
+                advance=lambda item, due: calculate_income_next_due_date(item.frequency, item.custom_days, due),
+                build_row=lambda item, due: {
+                    'amount': item.amount,
+                    'currency': item.currency,
+                    'description': item.description,
+                    'source': item.source,
+                    'user_id': item.user_id,
+                    'tags': item.tags,
+                    'frequency': 'once',  # Created income is one-time
+                    'date': due
+                }
+            )
             
             if created_count > 0:
-                db.session.commit()
                 logger.info(f"Successfully created {created_count} income entries from recurring income")
             else:
                 logger.info("No recurring income due for processing")
+            return created_count
                 
     except Exception as e:
         logger.error(f"Error in process_due_recurring_income: {str(e)}")
+        raise
 
 
-def init_scheduler(app):
-    """Initialize the background scheduler"""
-    scheduler = BackgroundScheduler()
+def hold_leadership():
+    """
+    Acquire or renew the scheduler lease (needs an app context)
+    Returns True while this process is the leader
+    """
+    now = datetime.utcnow()
+    renewed = SchedulerLock.query.filter(
+        SchedulerLock.name == LEADER_LOCK,
+        or_(SchedulerLock.owner == NODE_ID, SchedulerLock.expires_at < now)
+    ).update({'owner': NODE_ID, 'expires_at': now + LEADER_TTL}, synchronize_session=False)
+    
+    if renewed:
+        db.session.commit()
+        return True
+    
+    # No row yet: the first node to insert it becomes leader
+    try:
+        db.session.add(SchedulerLock(name=LEADER_LOCK, owner=NODE_ID, expires_at=now + LEADER_TTL))
+        db.session.commit()
+        return True
+    except IntegrityError:
+        db.session.rollback()
+        return False
+
+
+def release_leadership():
+    """Give up the lease so a standby node can take over immediately"""
+    SchedulerLock.query.filter_by(name=LEADER_LOCK, owner=NODE_ID).delete()
+    db.session.commit()
+
+
+def _leader_only(app, func):
+    """Wrap a job so it only runs on the node holding the scheduler lease"""
+    @wraps(func)
+    def job():
+        try:
+            with app.app_context():
+                is_leader = hold_leadership()
+        except Exception as e:
+            logger.error(f"Scheduler leader check failed, skipping {func.__name__}: {str(e)}")
+            return
+        if not is_leader:
+            logger.debug(f"Not the scheduler leader, skipping {func.__name__}")
+            return
+        func()
+    return job
+
+
+def _recorded(app, job_id, func):
+    """Wrap a job so every run is recorded in job_runs"""
+    @wraps(func)
+    def job():
+        return job_runs.run_recorded(app, job_id, func, NODE_ID)
+    return job
+
+
+def _replay_missed_runs(app, jobs):
+    """Run once at startup: replay each job whose latest fire time passed while no scheduler was up"""
+    try:
+        with app.app_context():
+            missed = job_runs.missed_jobs({job_id: trigger for job_id, (_, trigger) in jobs.items()})
+    except Exception as e:
+        logger.error(f"Missed-run check failed: {str(e)}")
+        return
+    for job_id in missed:
+        logger.warning(f"Replaying missed run of {job_id}")
+        job_runs.run_recorded(app, job_id, jobs[job_id][0], NODE_ID, catch_up=True)
+
+
+def _heartbeat(app):
+    """Keep the lease alive on the leader; lets a standby take over an expired one"""
+    try:
+        with app.app_context():
+            hold_leadership()
+    except Exception as e:
+        logger.error(f"Scheduler heartbeat failed: {str(e)}")
+
+
+def add_jobs(app, scheduler):
+    """Register all background jobs on a scheduler; jobs run inside this app"""
+    global _job_app
+    _job_app = app
+    jobs = {}
+    
+    def add_job(job_id, name, func, trigger):
+        # Leader check first, then the recorded run
+        scheduler.add_job(
+            func=_leader_only(app, _recorded(app, job_id, func)),
+            trigger=trigger,
+            id=job_id,
+            name=name,
+            replace_existing=True
+        )
+        jobs[job_id] = (func, trigger)
     
-    # Run every hour to check for due recurring expenses
     scheduler.add_job(
-        func=process_due_recurring_expenses,
-        trigger=CronTrigger(minute=0),  # Run at the start of every hour
-        id='process_recurring_expenses',
-        name='Process due recurring expenses',
+        func=_heartbeat,
+        args=(app,),
+        trigger=IntervalTrigger(seconds=HEARTBEAT_SECONDS),
+        id='scheduler_heartbeat',
+        name='Renew scheduler leader lease',
         replace_existing=True
     )
     
+    # Run every hour to check for due recurring expenses
+    add_job('process_recurring_expenses', 'Process due recurring expenses', process_due_recurring_expenses,
+            CronTrigger(minute=0))  # Run at the start of every hour
+    
     # Run every hour to check for due recurring income
-    scheduler.add_job(
-        func=process_due_recurring_income,
-        trigger=CronTrigger(minute=5),  # Run 5 minutes past every hour
-        id='process_recurring_income',
-        name='Process due recurring income',
-        replace_existing=True
-    )
+    add_job('process_recurring_income', 'Process due recurring income', process_due_recurring_income,
+            CronTrigger(minute=5))  # Run 5 minutes past every hour
     
     # Run daily at 8 AM to generate spending insights
-    scheduler.add_job(
-        func=process_daily_insights,
-        trigger=CronTrigger(hour=8, minute=0),  # Run at 8:00 AM
-        id='process_daily_insights',
-        name='Generate daily spending insights',
-        replace_existing=True
-    )
+    add_job('process_daily_insights', 'Generate daily spending insights', process_daily_insights,
+            CronTrigger(hour=8, minute=0))  # Run at 8:00 AM
     
     # Run weekly on Monday at 8 AM to generate weekly digests
-    scheduler.add_job(
-        func=process_weekly_digests,
-        trigger=CronTrigger(day_of_week='mon', hour=8, minute=30),  # Monday 8:30 AM
-        id='process_weekly_digests',
-        name='Generate weekly spending digests',
-        replace_existing=True
-    )
+    add_job('process_weekly_digests', 'Generate weekly spending digests', process_weekly_digests,
+            CronTrigger(day_of_week='mon', hour=8, minute=30))  # Monday 8:30 AM
     
     # Run daily at 11:59 PM to process no-spend day checks
-    scheduler.add_job(
-        func=process_no_spend_checks,
-        trigger=CronTrigger(hour=23, minute=59),  # 11:59 PM
-        id='process_no_spend_checks',
-        name='Process daily no-spend day checks',
-        replace_existing=True
-    )
+    add_job('process_no_spend_checks', 'Process daily no-spend day checks', process_no_spend_checks,
+            CronTrigger(hour=23, minute=59))  # 11:59 PM
     
     # Run weekly on Sunday to advance 52-week challenges
+    add_job('process_52_week_advance', 'Advance 52-week challenges', process_52_week_advance,
+            CronTrigger(day_of_week='sun', hour=23, minute=30))  # Sunday 11:30 PM
+    
+    # Once, right after start: replay runs missed while no scheduler was up
+    def replay_missed_runs():
+        _replay_missed_runs(app, jobs)
+    
     scheduler.add_job(
-        func=process_52_week_advance,
-        trigger=CronTrigger(day_of_week='sun', hour=23, minute=30),  # Sunday 11:30 PM
-        id='process_52_week_advance',
-        name='Advance 52-week challenges',
+        func=_leader_only(app, replay_missed_runs),
+        id='replay_missed_runs',
+        name='Replay missed job runs',
         replace_existing=True
     )
-    
+
+
+def init_scheduler(app):
+    """
+    Run the scheduler inside this process (RUN_SCHEDULER=true)
+    The leader lease still ensures jobs fire on one process only
+    """
+    scheduler = BackgroundScheduler()
+    add_jobs(app, scheduler)
     scheduler.start()
     logger.info("Scheduler initialized - recurring expenses, income, insights, and challenges will be processed")
     
@@ -237,342 +400,91 @@ def init_scheduler(app):
     return scheduler
 
 
+def main():
+    """Dedicated scheduler process: python -m app.scheduler"""
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+    
+    from app import create_worker_app
+    app = create_worker_app()
+    
+    scheduler = BlockingScheduler()
+    add_jobs(app, scheduler)
+    
+    def shutdown(signum, frame):
+        scheduler.shutdown(wait=False)
+    signal.signal(signal.SIGTERM, shutdown)
+    
+    with app.app_context():
+        if hold_leadership():
+            logger.info(f"Scheduler {NODE_ID} is the leader")
+        else:
+            logger.info(f"Scheduler {NODE_ID} is on standby")
+    
+    try:
+        scheduler.start()
+    except (KeyboardInterrupt, SystemExit):
+        pass
+    finally:
+        with app.app_context():
+            release_leadership()
+        logger.info("Scheduler stopped")
+
+
 def process_daily_insights():
     """
     Process daily spending insights for all users
-    Checks for unusual spending patterns and category spikes
+    Checks for unusual spending patterns and category spikes, one shard of users at a time
+    (money leaks are checked weekly, with the digests)
     """
     try:
-        from app import create_app
-        app = create_app()
+        app = _get_job_app()
         
         with app.app_context():
-            users = User.query.all()
-            
-            for user in users:
-                try:
-                    process_user_insights(user)
-                except Exception as e:
-                    logger.error(f"Error processing insights for user {user.id}: {str(e)}")
-                    continue
-            
-            db.session.commit()
-            logger.info(f"Daily insights processed for {len(users)} users")
+            user_ids = [user_id for (user_id,) in db.session.query(User.id)]
+            insight_pipeline.ensure_preferences(user_ids)
+            users, created = insight_pipeline.run(app, insight_pipeline.daily_shard, 'daily')
+            logger.info(f"Daily insights processed for {users} users ({created} created)")
+            return created
             
     except Exception as e:
         logger.error(f"Error in process_daily_insights: {str(e)}")
-
-
-def process_user_insights(user):
-    """Process insights for a single user"""
-    prefs = UserInsightPreferences.query.filter_by(user_id=user.id).first()
-    if not prefs:
-        prefs = UserInsightPreferences(user_id=user.id)
-        db.session.add(prefs)
-    
-    # Check unusual spending
-    if prefs.unusual_spending_enabled:
-        check_and_create_unusual_spending_insight(user, prefs.unusual_spending_threshold)
-    
-    # Check category spikes
-    if prefs.category_alerts_enabled:
-        check_and_create_category_spike_insights(user, prefs.category_alert_threshold)
-    
-    # Check money leaks (less frequent - weekly)
-    # This is handled in weekly digests
-
-
-def check_and_create_unusual_spending_insight(user, threshold):
-    """Check for unusual spending and create insight if detected"""
-    end_date = datetime.utcnow()
-    start_date = end_date - timedelta(days=7)
-    baseline_start = start_date - timedelta(days=30)
-    
-    recent = Expense.query.filter(
-        Expense.user_id == user.id,
-        Expense.date >= start_date
-    ).all()
-    
-    baseline = Expense.query.filter(
-        Expense.user_id == user.id,
-        Expense.date >= baseline_start,
-        Expense.date < start_date
-    ).all()
-    
-    if not baseline:
-        return
-    
-    baseline_daily = sum(e.amount for e in baseline) / 30
-    recent_daily = sum(e.amount for e in recent) / 7 if recent else 0
-    
-    if baseline_daily > 0 and recent_daily > baseline_daily * threshold:
-        # Check for existing similar insight
-        existing = SpendingInsight.query.filter(
-            SpendingInsight.user_id == user.id,
-            SpendingInsight.insight_type == 'unusual_spending',
-            SpendingInsight.created_at > datetime.utcnow() - timedelta(days=3)
-        ).first()
-        
-        if not existing:
-            insight = SpendingInsight(
-                user_id=user.id,
-                insight_type='unusual_spending',
-                priority='high',
-                title_key='insights.unusual.overallSpike.title',
-                message_key='insights.unusual.overallSpike.message',
-                icon='trending_up',
-                amount=round(recent_daily * 7, 2),
-                action_key='insights.unusual.action.reviewSpending',
-                expires_at=datetime.utcnow() + timedelta(days=7)
-            )
-            insight.set_message_params({
-                'percentage': round(((recent_daily / baseline_daily) - 1) * 100),
-                'currency': user.currency
-            })
-            db.session.add(insight)
-            logger.info(f"Created unusual spending insight for user {user.id}")
-
-
-def check_and_create_category_spike_insights(user, threshold):
-    """Check for category spending spikes"""
-    now = datetime.utcnow()
-    start_of_month = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-    prev_month_end = start_of_month - timedelta(days=1)
-    prev_month_start = prev_month_end.replace(day=1)
-    
-    current = Expense.query.filter(
-        Expense.user_id == user.id,
-        Expense.date >= start_of_month
-    ).all()
-    
-    previous = Expense.query.filter(
-        Expense.user_id == user.id,
-        Expense.date >= prev_month_start,
-        Expense.date <= prev_month_end
-    ).all()
-    
-    current_by_cat = defaultdict(float)
-    prev_by_cat = defaultdict(float)
-    cat_ids = {}
-    
-    for e in current:
-        cat_name = e.category.name if e.category else 'Uncategorized'
-        current_by_cat[cat_name] += e.amount
-        cat_ids[cat_name] = e.category_id
-    
-    for e in previous:
-        cat_name = e.category.name if e.category else 'Uncategorized'
-        prev_by_cat[cat_name] += e.amount
-    
-    for cat_name, current_amount in current_by_cat.items():
-        prev_amount = prev_by_cat.get(cat_name, 0)
-        if prev_amount > 0 and current_amount > prev_amount * threshold and (current_amount - prev_amount) > 20:
-            # Check for existing similar insight
-            existing = SpendingInsight.query.filter(
-                SpendingInsight.user_id == user.id,
-                SpendingInsight.insight_type == 'category_spike',
-                SpendingInsight.category_id == cat_ids.get(cat_name),
-                SpendingInsight.created_at > datetime.utcnow() - timedelta(days=7)
-            ).first()
-            
-            if not existing:
-                change = ((current_amount / prev_amount) - 1) * 100
-                insight = SpendingInsight(
-                    user_id=user.id,
-                    insight_type='category_spike',
-                    priority='high' if change > 100 else 'medium',
-                    title_key='insights.category.spike.title',
-                    message_key='insights.category.spike.message',
-                    category_id=cat_ids.get(cat_name),
-                    amount=round(current_amount, 2),
-                    icon='trending_up',
-                    action_key='insights.category.action.reviewCategory',
-                    expires_at=datetime.utcnow() + timedelta(days=14)
-                )
-                insight.set_message_params({
-                    'category': cat_name,
-                    'percentage': round(change),
-                    'currency': user.currency,
-                    'amount': round(current_amount - prev_amount, 2)
-                })
-                insight.set_comparison_data({
-                    'current': round(current_amount, 2),
-                    'previous': round(prev_amount, 2)
-                })
-                db.session.add(insight)
-                logger.info(f"Created category spike insight for user {user.id}, category: {cat_name}")
+        raise
 
 
 def process_weekly_digests():
     """
     Process weekly spending digests for all users
-    Creates weekly summary insights
+    Creates weekly summary and money leak insights, one shard of users at a time
     """
     try:
-        from app import create_app
-        app = create_app()
+        app = _get_job_app()
         
         with app.app_context():
-            users = User.query.all()
-            
-            for user in users:
-                try:
-                    create_weekly_digest_insight(user)
-                    check_and_create_money_leak_insights(user)
-                except Exception as e:
-                    logger.error(f"Error creating weekly digest for user {user.id}: {str(e)}")
-                    continue
-            
-            db.session.commit()
-            logger.info(f"Weekly digests processed for {len(users)} users")
+            users, created = insight_pipeline.run(app, insight_pipeline.weekly_shard, 'weekly')
+            logger.info(f"Weekly digests processed for {users} users ({created} insights created)")
+            return created
             
     except Exception as e:
         logger.error(f"Error in process_weekly_digests: {str(e)}")
+        raise
 
 
-def create_weekly_digest_insight(user):
-    """Create weekly digest summary insight"""
-    prefs = UserInsightPreferences.query.filter_by(user_id=user.id).first()
-    if prefs and not prefs.weekly_digest_enabled:
-        return
-    
-    end_date = datetime.utcnow()
-    start_date = end_date - timedelta(days=7)
-    prev_start = start_date - timedelta(days=7)
-    
-    current = Expense.query.filter(
-        Expense.user_id == user.id,
-        Expense.date >= start_date
-    ).all()
-    
-    previous = Expense.query.filter(
-        Expense.user_id == user.id,
-        Expense.date >= prev_start,
-        Expense.date < start_date
-    ).all()
-    
-    current_total = sum(e.amount for e in current)
-    prev_total = sum(e.amount for e in previous)
-    
-    if prev_total > 0:
-        change = ((current_total - prev_total) / prev_total) * 100
-    else:
-        change = 0
-    
-    # Find top category
-    category_totals = defaultdict(float)
-    for e in current:
-        cat_name = e.category.name if e.category else 'Uncategorized'
-        category_totals[cat_name] += e.amount
-    
-    top_category = max(category_totals.items(), key=lambda x: x[1])[0] if category_totals else 'None'
-    
-    insight = SpendingInsight(
-        user_id=user.id,
-        insight_type='weekly_digest',
-        priority='low',
-        title_key='insights.weeklyDigest.title',
-        message_key='insights.weeklyDigest.message',
-        amount=round(current_total, 2),
-        icon='summarize',
-        period_start=start_date,
-        period_end=end_date,
-        expires_at=datetime.utcnow() + timedelta(days=14)
-    )
-    insight.set_message_params({
-        'total': round(current_total, 2),
-        'change': round(change, 1),
-        'top_category': top_category,
-        'transaction_count': len(current),
-        'currency': user.currency
-    })
-    insight.set_comparison_data({
-        'current': round(current_total, 2),
-        'previous': round(prev_total, 2),
-        'change_percentage': round(change, 1)
-    })
-    db.session.add(insight)
-    logger.info(f"Created weekly digest for user {user.id}")
-
-
-def check_and_create_money_leak_insights(user):
-    """Check for recurring small expenses (money leaks)"""
-    prefs = UserInsightPreferences.query.filter_by(user_id=user.id).first()
-    if prefs and not prefs.money_leak_detection_enabled:
-        return
-    
-    min_occurrences = prefs.money_leak_min_occurrences if prefs else 3
-    start_date = datetime.utcnow() - timedelta(days=90)
-    
-    expenses = Expense.query.filter(
-        Expense.user_id == user.id,
-        Expense.date >= start_date
-    ).all()
-    
-    patterns = defaultdict(lambda: {'total': 0, 'count': 0})
-    
-    for expense in expenses:
-        desc = expense.description.lower().strip()
-        desc_clean = re.sub(r'[0-9#]+', '', desc).strip()
-        desc_clean = re.sub(r'\s+', ' ', desc_clean)
-        amount_bucket = round(expense.amount / 5) * 5
-        key = f"{desc_clean}_{amount_bucket}"
-        
-        patterns[key]['total'] += expense.amount
-        patterns[key]['count'] += 1
-        patterns[key]['desc'] = expense.description
-    
-    for key, data in patterns.items():
-        if data['count'] >= min_occurrences:
-            yearly_projection = (data['total'] / 90) * 365
-            if yearly_projection > 200:  # Only flag significant leaks
-                # Check for existing
-                existing = SpendingInsight.query.filter(
-                    SpendingInsight.user_id == user.id,
-                    SpendingInsight.insight_type == 'money_leak',
-                    SpendingInsight.created_at > datetime.utcnow() - timedelta(days=30)
-                ).count()
-                
-                if existing < 3:  # Max 3 leak insights at a time
-                    insight = SpendingInsight(
-                        user_id=user.id,
-                        insight_type='money_leak',
-                        priority='medium',
-                        title_key='insights.moneyLeak.title',
-                        message_key='insights.moneyLeak.message',
-                        amount=round(data['total'], 2),
-                        icon='water_drop',
-                        action_key='insights.moneyLeak.action.reviewHabit',
-                        expires_at=datetime.utcnow() + timedelta(days=30)
-                    )
-                    insight.set_message_params({
-                        'description': data['desc'],
-                        'count': data['count'],
-                        'yearly': round(yearly_projection, 2),
-                        'currency': user.currency
-                    })
-                    insight.set_comparison_data({
-                        'occurrences': data['count'],
-                        'yearly_projection': round(yearly_projection, 2)
-                    })
-                    db.session.add(insight)
-                    logger.info(f"Created money leak insight for user {user.id}: {data['desc']}")
-
 def process_no_spend_checks():
     """
     Process end-of-day no-spend checks for all users
     Runs at 11:59 PM to determine if each day was a no-spend day
     """
     try:
-        from app import create_app
-        app = create_app()
+        app = _get_job_app()
         
         with app.app_context():
             from app.routes.challenges import process_daily_no_spend_check
-            process_daily_no_spend_check(app)
+            evaluated = process_daily_no_spend_check(app)
             logger.info("Daily no-spend checks completed")
+            return evaluated
     except Exception as e:
         logger.error(f"Error in process_no_spend_checks: {str(e)}")
+        raise
 
 
 def process_52_week_advance():
@@ -580,12 +492,20 @@ def process_52_week_advance():
     Advance 52-week challenges on Sunday nights
     """
     try:
-        from app import create_app
-        app = create_app()
+        app = _get_job_app()
         
         with app.app_context():
             from app.routes.challenges import process_weekly_52_advance
-            process_weekly_52_advance(app)
+            advanced = process_weekly_52_advance(app)
             logger.info("52-week challenge advancement completed")
+            return advanced
     except Exception as e:
-        logger.error(f"Error in process_52_week_advance: {str(e)}")
\ No newline at end of file
+        logger.error(f"Error in process_52_week_advance: {str(e)}")
+        raise
+
+
+if __name__ == '__main__':
+    # Run the importable app.scheduler module, not this __main__ copy, so the
+    # leader identity and jobs are the same objects the rest of the app sees
+    from app.scheduler import main as run_scheduler
+    run_scheduler()
@@ -0,0 +1,236 @@
+"""
+Full-text index for global search
+Expense descriptions/receipt OCR text and document filenames/OCR text are
+searched through a word index instead of leading-wildcard LIKE scans:
+- SQLite: FTS5 external-content tables kept in sync by triggers (so bulk SQL
+  writes are covered too), BM25 ranking and snippet() highlighting
+- PostgreSQL: GIN expression indexes over weighted tsvectors, ts_rank and
+  ts_headline
+Every query word matches as a prefix ('star' finds 'Starbucks'). Other
+databases, or SQLite builds without FTS5, fall back to LIKE matching.
+Security: All queries filtered by user_id
+"""
+from app import db
+from app.models import Expense, Document
+from app.feature_index import normalize
+from markupsafe import Markup, escape
+from sqlalchemy import or_, bindparam
+import logging
+import re
+
+logger = logging.getLogger(__name__)
+
+MAX_TERMS = 8
+SNIPPET_WORDS = 12
+# Private-use characters mark matches in snippets until they are turned into <mark> tags
+_MATCH_START, _MATCH_END = '\ue000', '\ue001'
+_TERM = re.compile(r'[^\W_]+')
+
+# table -> (FTS table, indexed columns, column holding OCR text)
+_SOURCES = {
+    'expenses': ('expenses_fts', ('description', 'receipt_ocr_text'), 'receipt_ocr_text'),
+    'documents': ('documents_fts', ('original_filename', 'ocr_text'), 'ocr_text'),
+}
+# BM25 column weights: a hit in the description/filename ranks above one in OCR text
+# (the PostgreSQL vectors weight them 'A' and 'B' for ts_rank)
+_WEIGHTS = (10.0, 1.0)
+
+_backends = {}
+
+
+def _sqlite_statements(table, fts_table, columns):
+    column_list = ', '.join(columns)
+    new_values = ', '.join(f'new.{column}' for column in columns)
+    old_values = ', '.join(f'old.{column}' for column in columns)
+    delete_old = (f"INSERT INTO {fts_table}({fts_table}, rowid, {column_list}) "
+                  f"VALUES ('delete', old.id, {old_values});")
+    insert_new = f"INSERT INTO {fts_table}(rowid, {column_list}) VALUES (new.id, {new_values});"
+    return [
+        f"CREATE TRIGGER IF NOT EXISTS {fts_table}_ai AFTER INSERT ON {table} BEGIN {insert_new} END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts_table}_ad AFTER DELETE ON {table} BEGIN {delete_old} END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts_table}_au AFTER UPDATE OF {column_list} ON {table} "
+        f"BEGIN {delete_old} {insert_new} END",
+    ]
+
+
+def _tsvector(alias, columns):
+    first, second = columns
+    return (f"(setweight(to_tsvector('simple', coalesce({alias}{first}, '')), 'A') || "
+            f"setweight(to_tsvector('simple', coalesce({alias}{second}, '')), 'B'))")
+
+
+def _ensure_sqlite(connection):
+    existing = {row[0] for row in connection.execute(db.text(
+        "SELECT name FROM sqlite_master WHERE type = 'table'"
+    ))}
+    for table, (fts_table, columns, _) in _SOURCES.items():
+        created = fts_table not in existing
+        if created:
+            connection.execute(db.text(
+                f"CREATE VIRTUAL TABLE {fts_table} USING fts5({', '.join(columns)}, "
+                f"content='{table}', content_rowid='id', tokenize='unicode61 remove_diacritics 2')"
+            ))
+        for statement in _sqlite_statements(table, fts_table, columns):
+            connection.execute(db.text(statement))
+        if created:
+            print(f"Migration: Building full-text index {fts_table}...")
+            connection.execute(db.text(f"INSERT INTO {fts_table}({fts_table}) VALUES ('rebuild')"))
+
+
+def _ensure_postgres(connection):
+    for table, (_, columns, _) in _SOURCES.items():
+        connection.execute(db.text(
+            f"CREATE INDEX IF NOT EXISTS ix_{table}_search ON {table} USING GIN ({_tsvector('', columns)})"
+        ))
+
+
+def ensure_index():
+    """Create the full-text tables/triggers (SQLite) or GIN indexes (PostgreSQL) if missing"""
+    dialect = db.engine.dialect.name
+    try:
+        with db.engine.begin() as connection:
+            if dialect == 'sqlite':
+                _ensure_sqlite(connection)
+            elif dialect == 'postgresql':
+                _ensure_postgres(connection)
+    except Exception as e:
+        # e.g. SQLite compiled without FTS5: search keeps working through LIKE
+        logger.warning(f"Full-text search index unavailable, using LIKE search: {e}")
+    _backends.pop(str(db.engine.url), None)
+
+
+def _backend():
+    key = str(db.engine.url)
+    if key not in _backends:
+        dialect = db.engine.dialect.name
+        if dialect == 'sqlite':
+            has_fts = db.session.execute(db.text(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'expenses_fts'"
+            )).first() is not None
+            _backends[key] = 'fts5' if has_fts else 'like'
+        else:
+            _backends[key] = 'tsvector' if dialect == 'postgresql' else 'like'
+    return _backends[key]
+
+
+def search_terms(query):
+    """Words of a search query, lowercased (punctuation and underscores split words)"""
+    return _TERM.findall(query.lower())[:MAX_TERMS]
+
+
+def match_key(*texts):
+    """
+    Compact form of a row's searchable text for match_key_matches()
+    Distinct words, diacritics removed, each preceded by a space (the
+    lowercased text itself when search falls back to LIKE)
+    """
+    if _backend() == 'like':
+        return '\n'.join(text.lower() for text in texts if text)
+    words = {word for text in texts if text for word in _TERM.findall(normalize(text))}
+    return ''.join(f' {word}' for word in sorted(words))
+
+
+def match_key_matches(key, query):
+    """Whether a row with this match_key() is a search hit for query (same rules as the index)"""
+    if _backend() == 'like':
+        return query.lower() in key
+    terms = search_terms(normalize(query))
+    return bool(terms) and all(f' {term}' in key for term in terms)
+
+
+def _highlight(snippet):
+    """Snippet with escaped text and <mark> around matches, or None when it has no match"""
+    if not snippet or _MATCH_START not in snippet:
+        return None
+    return str(escape(snippet).replace(_MATCH_START, Markup('<mark>')).replace(_MATCH_END, Markup('</mark>')))
+
+
+def _restrict(sql, params, ids):
+    """Text query restricted to rows t.id IN ids (no restriction when ids is None)"""
+    if ids is None:
+        return db.text(sql.format(ids='')), params
+    params = dict(params, ids=list(ids))
+    return db.text(sql.format(ids='AND t.id IN :ids ')).bindparams(bindparam('ids', expanding=True)), params
+
+
+def _search_fts5(table, user_id, terms, order_column, limit, ids):
+    fts_table, columns, ocr_column = _SOURCES[table]
+    # Quoted terms cannot be parsed as FTS5 operators; '*' makes each a prefix query
+    match = ' '.join(f'"{term}"*' for term in terms)
+    ocr_index = columns.index(ocr_column)
+    return db.session.execute(*_restrict(
+        f"SELECT t.id, snippet({fts_table}, {ocr_index}, :start, :end, '…', {SNIPPET_WORDS}) AS snippet "
+        f"FROM {fts_table} JOIN {table} t ON t.id = {fts_table}.rowid "
+        f"WHERE {fts_table} MATCH :match AND t.user_id = :user_id {{ids}}"
+        f"ORDER BY bm25({fts_table}, {_WEIGHTS[0]}, {_WEIGHTS[1]}), t.{order_column} DESC "
+        f"LIMIT :limit",
+        {'start': _MATCH_START, 'end': _MATCH_END, 'match': match, 'user_id': user_id, 'limit': limit}, ids
+    )).all()
+
+
+def _search_tsvector(table, user_id, terms, order_column, limit, ids):
+    _, columns, ocr_column = _SOURCES[table]
+    vector = _tsvector('t.', columns)
+    options = f'StartSel={_MATCH_START}, StopSel={_MATCH_END}, MaxWords={SNIPPET_WORDS}, MinWords=4'
+    return db.session.execute(*_restrict(
+        f"SELECT t.id, CASE WHEN to_tsvector('simple', coalesce(t.{ocr_column}, '')) @@ q "
+        f"THEN ts_headline('simple', t.{ocr_column}, q, :options) END AS snippet "
+        f"FROM {table} t, to_tsquery('simple', :tsquery) q "
+        f"WHERE t.user_id = :user_id AND {vector} @@ q {{ids}}"
+        f"ORDER BY ts_rank({vector}, q) DESC, t.{order_column} DESC "
+        f"LIMIT :limit",
+        {
+            'options': options, 'user_id': user_id, 'limit': limit,
+            'tsquery': ' & '.join(f'{term}:*' for term in terms)
+        }, ids
+    )).all()
+
+
+def _search_like(model, text_columns, user_id, query, order_column, limit, ids):
+    ocr_column = text_columns[1]
+    rows = db.session.query(model.id, ocr_column).filter(
+        model.user_id == user_id,
+        or_(*(column.ilike(f'%{query}%') for column in text_columns))
+    )
+    if ids is not None:
+        rows = rows.filter(model.id.in_(ids))
+    rows = rows.order_by(order_column.desc()).limit(limit).all()
+    query_lower = query.lower()
+    return [(row_id, None, bool(ocr_text and query_lower in ocr_text.lower())) for row_id, ocr_text in rows]
+
+
+def _search(table, model, text_columns, order_column, user_id, query, limit, ids):
+    backend = _backend()
+    if backend == 'like':
+        return _search_like(model, text_columns, user_id, query, order_column, limit, ids)
+
+    terms = search_terms(query)
+    if not terms:
+        return []
+    search = _search_fts5 if backend == 'fts5' else _search_tsvector
+    rows = search(table, user_id, terms, order_column.key, limit, ids)
+    results = []
+    for row_id, snippet in rows:
+        highlighted = _highlight(snippet)
+        results.append((row_id, highlighted, highlighted is not None))
+    return results
+
+
+def search_expenses(user_id, query, limit, ids=None):
+    """
+    Best matching expenses by description and receipt OCR text
+    ids: only rank these expenses (e.g. cached typeahead candidates)
+    Returns: list of (expense id, OCR snippet HTML or None, matched in OCR text)
+    """
+    return _search('expenses', Expense, (Expense.description, Expense.receipt_ocr_text),
+                   Expense.date, user_id, query, limit, ids)
+
+
+def search_documents(user_id, query, limit, ids=None):
+    """
+    Best matching documents by filename and OCR text
+    ids: only rank these documents (e.g. cached typeahead candidates)
+    Returns: list of (document id, OCR snippet HTML or None, matched in OCR text)
+    """
+    return _search('documents', Document, (Document.original_filename, Document.ocr_text),
+                   Document.created_at, user_id, query, limit, ids)
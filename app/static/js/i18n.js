@@ -275,6 +275,8 @@ const translations = {
         'import.errors': 'Errors',
         'import.viewTransactions': 'View Transactions',
         'import.importAnother': 'Import Another File',
+        'import.recurringDetected': 'Recurring payments detected',
+        'import.reviewSuggestions': 'Review suggestions',
         
         // Reports
         'reports.title': 'Financial Reports',
@@ -581,6 +583,7 @@ const translations = {
         'income.title': 'Income',
         'income.subtitle': 'Track your income sources',
         'income.addNew': 'Add Income',
+        'income.export': 'Export CSV',
         'income.add': 'Add Income',
         'income.edit': 'Edit Income',
         'income.save': 'Save Income',
@@ -1468,6 +1471,8 @@ const translations = {
         'import.errors': 'Erori',
         'import.viewTransactions': 'Vezi Tranzacții',
         'import.importAnother': 'Importă Alt Fișier',
+        'import.recurringDetected': 'Plăți recurente detectate',
+        'import.reviewSuggestions': 'Vezi sugestiile',
                 // Reports
         'reports.title': 'Rapoarte Financiare',
         'reports.export': 'Exportă CSV',
@@ -1732,6 +1737,7 @@ const translations = {
         'income.title': 'Venit',
         'income.subtitle': 'Urmărește sursele de venit',
         'income.addNew': 'Adaugă Venit',
+        'income.export': 'Exportă CSV',
         'income.add': 'Adaugă Venit',
         'income.edit': 'Editează Venit',
         'income.save': 'Salvează Venit',
@@ -623,6 +623,8 @@ class CSVImporter {
     renderImportComplete(result) {
         const stepContent = document.getElementById('stepContent');
         const hasErrors = result.errors && result.errors.length > 0;
+        const recurringCount = (result.recurring_suggestions || []).length;
+        const detectedCount = recurringCount + (result.subscription_suggestions || []).length;
         
         stepContent.innerHTML = `
             <div class="text-center">
@@ -674,6 +676,16 @@ class CSVImporter {
                     </div>
                 ` : ''}
 
+                ${detectedCount > 0 ? `
+                    <div class="mb-6 max-w-2xl mx-auto bg-blue-50 dark:bg-blue-900/20 border border-blue-200 dark:border-blue-900/30 rounded-lg p-4 text-sm text-text-main dark:text-white">
+                        <span class="material-symbols-outlined align-middle text-primary mr-1">autorenew</span>
+                        ${window.getTranslation('import.recurringDetected', 'Recurring payments detected')}: ${detectedCount}
+                        <a href="${recurringCount > 0 ? '/recurring' : '/subscriptions'}" class="ml-2 text-primary font-semibold hover:underline">
+                            ${window.getTranslation('import.reviewSuggestions', 'Review suggestions')}
+                        </a>
+                    </div>
+                ` : ''}
+
                 <div class="flex gap-4 justify-center">
                     <button onclick="window.location.href='/transactions'" 
                             class="px-6 py-2 bg-primary text-white rounded-lg hover:bg-primary/90">
@@ -200,6 +200,11 @@ function openIncomeModal() {
     }
 }
 
+// Download income entries as CSV
+function exportIncomeCsv() {
+    window.location.href = '/api/income/export/csv';
+}
+
 // Close income modal
 function closeIncomeModal() {
     const modal = document.getElementById('income-modal');
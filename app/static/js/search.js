@@ -2,6 +2,9 @@
 // Provides unified search across all app content and features
 let searchTimeout;
 let currentSearchQuery = '';
+// Typeahead requests are numbered so late responses to older keystrokes can be dropped
+let searchSequence = 0;
+const searchClientId = Math.random().toString(36).slice(2, 10);
 
 // Initialize global search
 document.addEventListener('DOMContentLoaded', () => {
@@ -63,7 +66,7 @@ function initGlobalSearch() {
             // Debounce search
             searchTimeout = setTimeout(() => {
                 performSearch(query);
-            }, 300);
+            }, 150);
         } else if (query.length === 0) {
             showSearchPlaceholder();
         } else {
@@ -106,13 +109,20 @@ function showSearchPlaceholder() {
 
 async function performSearch(query) {
     currentSearchQuery = query;
+    const seq = ++searchSequence;
     const searchResults = document.getElementById('global-search-results');
     
     try {
-        const response = await apiCall(`/api/search/?q=${encodeURIComponent(query)}`, {
+        const params = new URLSearchParams({ q: query, seq, client: searchClientId });
+        const response = await apiCall(`/api/search/typeahead?${params}`, {
             method: 'GET'
         });
         
+        // A newer keystroke has been sent (or the server saw one): drop this response
+        if (seq !== searchSequence || response.stale) {
+            return;
+        }
+        
         if (response.success) {
             displaySearchResults(response);
         } else {
@@ -167,6 +177,8 @@ function displaySearchResults(response) {
         results.expenses.forEach(expense => {
             const date = new Date(expense.date).toLocaleDateString(userLang === 'ro' ? 'ro-RO' : 'en-US', { month: 'short', day: 'numeric' });
             const ocrBadge = expense.ocr_match ? '<span class="text-xs bg-green-100 dark:bg-green-900/30 text-green-700 dark:text-green-400 px-2 py-0.5 rounded" data-translate="search.ocrMatch">OCR Match</span>' : '';
+            // Snippets come HTML-escaped from the server, with matches wrapped in <mark>
+            const snippet = expense.snippet ? `<div class="text-xs text-text-muted dark:text-[#92adc9] mt-1 truncate">${expense.snippet}</div>` : '';
             html += `
                 <a href="${expense.url}" data-search-result tabindex="0" class="flex items-center gap-3 p-3 rounded-lg hover:bg-slate-50 dark:hover:bg-[#233648] transition-colors focus:outline-none focus:ring-2 focus:ring-primary">
                     <div class="size-10 rounded-lg flex items-center justify-center" style="background-color: ${expense.category_color}20">
@@ -180,6 +192,7 @@ function displaySearchResults(response) {
                             <span>${date}</span>
                             ${ocrBadge}
                         </div>
+                        ${snippet}
                     </div>
                     <div class="text-sm font-semibold text-text-main dark:text-white">${formatCurrency(expense.amount, expense.currency)}</div>
                 </a>
@@ -194,6 +207,7 @@ function displaySearchResults(response) {
         results.documents.forEach(doc => {
             const date = new Date(doc.created_at).toLocaleDateString(userLang === 'ro' ? 'ro-RO' : 'en-US', { month: 'short', day: 'numeric' });
             const ocrBadge = doc.ocr_match ? '<span class="text-xs bg-green-100 dark:bg-green-900/30 text-green-700 dark:text-green-400 px-2 py-0.5 rounded" data-translate="search.ocrMatch">OCR Match</span>' : '';
+            const snippet = doc.snippet ? `<div class="text-xs text-text-muted dark:text-[#92adc9] mt-1 truncate">${doc.snippet}</div>` : '';
             const fileIcon = doc.file_type === 'PDF' ? 'picture_as_pdf' : 'image';
             html += `
                 <button onclick="openDocumentFromSearch(${doc.id}, '${doc.file_type}', '${escapeHtml(doc.filename)}')" data-search-result tabindex="0" class="w-full flex items-center gap-3 p-3 rounded-lg hover:bg-slate-50 dark:hover:bg-[#233648] transition-colors focus:outline-none focus:ring-2 focus:ring-primary text-left">
@@ -206,6 +220,7 @@ function displaySearchResults(response) {
                             <span>${date}</span>
                             ${ocrBadge}
                         </div>
+                        ${snippet}
                     </div>
                     <span class="material-symbols-outlined text-text-muted text-sm">visibility</span>
                 </button>
@@ -366,9 +366,13 @@ document.getElementById('more-filters-btn').addEventListener('click', toggleAdva
 // Date filter button (same as more filters for now)
 document.getElementById('date-filter-btn').addEventListener('click', toggleAdvancedFilters);
 
-// Export CSV
+// Export CSV (with the active category/date filters)
 document.getElementById('export-csv-btn').addEventListener('click', () => {
-    window.location.href = '/api/expenses/export/csv';
+    const params = new URLSearchParams();
+    ['category_id', 'start_date', 'end_date'].forEach(key => {
+        if (filters[key]) params.set(key, filters[key]);
+    });
+    window.location.href = `/api/expenses/export/csv?${params}`;
 });
 
 // Import CSV
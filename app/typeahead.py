@@ -0,0 +1,93 @@
+"""
+Typeahead mode for global search
+While the user types, every query usually extends the previous one, and the
+hits for 'starb' are a subset of the hits for 'star'. Each search therefore
+caches its candidate set - the ids of up to CANDIDATE_LIMIT hits per source,
+each with a compact match key - per user for a short TTL (app/cache.py:
+Redis or the local LRU, invalidated when the user's data changes). A longer
+query filters the candidates of its longest cached prefix by match key and
+only asks the source to rank those ids, so ranking and snippets are those of
+the current query without searching the whole table again. Sources whose
+candidate list was truncated run a full search.
+Requests carry a sequence number per client; a request that has been
+superseded by a newer one stops before doing further database work.
+Security: Candidates are cached and read per authenticated user id
+"""
+from app import cache
+from collections import namedtuple
+import json
+import re
+
+CANDIDATE_LIMIT = 50
+CANDIDATE_TTL = 60
+MIN_QUERY = 2
+CACHE_NAME = 'typeahead'
+
+# fetch(user_id, query, limit, ids=None) -> list of (result dict with 'id', match key),
+# best first; with ids, only rows among those ids are considered
+# matches(match key, query) -> bool, with the same rules as fetch
+Source = namedtuple('Source', 'name fetch matches')
+
+_SPACES = re.compile(r'\s+')
+
+
+class Superseded(Exception):
+    """A newer typeahead request from the same client has arrived"""
+
+
+def cache_query(query):
+    """Cache key form of a query: lowercased, whitespace collapsed"""
+    return _SPACES.sub(' ', query.lower()).strip()
+
+
+def _cache_name(query):
+    return f"{CACHE_NAME}:{cache_query(query)}"
+
+
+def _cached_prefix(user_id, query):
+    """(prefix, candidates) for the longest cached prefix of query, or (None, None)"""
+    normalized = cache_query(query)
+    for end in range(len(normalized), MIN_QUERY - 1, -1):
+        stored = cache.get_user_value(user_id, _cache_name(normalized[:end]))
+        if stored is not None:
+            return normalized[:end], json.loads(stored)
+    return None, None
+
+
+def search(user_id, query, sources, limit, is_current=lambda: True):
+    """
+    Typeahead results for query
+    is_current() is checked before each database fetch; once it returns
+    False the search raises Superseded
+    Returns: ({source name: first `limit` results}, whether any source was
+    answered from cached candidates)
+    """
+    _, cached = _cached_prefix(user_id, query)
+    candidates = {}
+    results = {}
+    reused = False
+
+    for source in sources:
+        entry = (cached or {}).get(source.name)
+        if entry is not None and entry['complete']:
+            # Every hit of the prefix is cached, so the hits of query are among them
+            items = [item for item in entry['items'] if source.matches(item[1], query)]
+            candidates[source.name] = {'complete': True, 'items': items}
+            reused = True
+            hits = []
+            if items:
+                if not is_current():
+                    raise Superseded()
+                hits = source.fetch(user_id, query, limit, ids=[item_id for item_id, _ in items])
+        else:
+            if not is_current():
+                raise Superseded()
+            hits = source.fetch(user_id, query, CANDIDATE_LIMIT)
+            candidates[source.name] = {
+                'complete': len(hits) < CANDIDATE_LIMIT,
+                'items': [[result['id'], key] for result, key in hits]
+            }
+        results[source.name] = [result for result, _ in hits[:limit]]
+
+    cache.set_user_value(user_id, _cache_name(query), json.dumps(candidates), CANDIDATE_TTL)
+    return results, reused
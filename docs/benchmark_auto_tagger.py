@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the auto-tagger keyword matcher.
+Compares extract_tags_from_text against the previous per-keyword regex
+implementation on large synthetic OCR texts and checks both return the
+same tags in the same order.
+
+Usage: python docs/benchmark_auto_tagger.py  (exit code 1 on mismatch)
+"""
+import os
+import re
+import sys
+import random
+import timeit
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.auto_tagger import TAG_PATTERNS, extract_tags_from_text
+
+
+def legacy_extract_tags_from_text(text, max_tags=5):
+    """The previous implementation: one re.search per keyword per call"""
+    if not text:
+        return []
+
+    normalized_text = text.lower()
+    normalized_text = re.sub(r'[^\w\s]', ' ', normalized_text)
+
+    detected_tags = []
+    for tag_name, pattern_info in TAG_PATTERNS.items():
+        for keyword in pattern_info['keywords']:
+            if re.search(r'\b' + re.escape(keyword.lower()) + r'\b', normalized_text):
+                detected_tags.append({
+                    'name': tag_name,
+                    'color': pattern_info['color'],
+                    'icon': pattern_info['icon']
+                })
+                break
+
+    unique_tags = []
+    seen = set()
+    for tag in detected_tags:
+        if tag['name'] not in seen:
+            seen.add(tag['name'])
+            unique_tags.append(tag)
+            if len(unique_tags) >= max_tags:
+                break
+    return unique_tags
+
+
+FILLER = ['total', 'subtotal', 'tva', 'cash', 'card', 'qty', 'lei', 'eur', 'receipt', 'bon',
+          'fiscal', 'nr', 'ora', 'data', 'cui', 'str', 'client', 'ref', 'item', 'price']
+
+
+def make_ocr_text(rnd, words, keyword_rate):
+    """Receipt-like text: filler words, amounts, punctuation and some real keywords"""
+    keywords = [k for p in TAG_PATTERNS.values() for k in p['keywords']]
+    lines, line = [], []
+    for _ in range(words):
+        roll = rnd.random()
+        if roll < keyword_rate:
+            word = rnd.choice(keywords)
+            if rnd.random() < 0.3:
+                word = word.upper()
+        elif roll < 0.3:
+            word = f"{rnd.randint(1, 999)}.{rnd.randint(0, 99):02d}"
+        else:
+            word = rnd.choice(FILLER) + rnd.choice(['', '', ':', ',', '-', '*'])
+        line.append(word)
+        if len(line) >= rnd.randint(4, 12):
+            lines.append(' '.join(line))
+            line = []
+    lines.append(' '.join(line))
+    return '\n'.join(lines)
+
+
+def check_equivalence(rnd, samples=2000):
+    mismatches = 0
+    for _ in range(samples):
+        text = make_ocr_text(rnd, rnd.randint(1, 80), rnd.choice([0.0, 0.02, 0.1, 0.5]))
+        max_tags = rnd.randint(1, 8)
+        if extract_tags_from_text(text, max_tags) != legacy_extract_tags_from_text(text, max_tags):
+            mismatches += 1
+            print(f"✗ Mismatch for max_tags={max_tags}: {text[:120]!r}")
+    return mismatches
+
+
+def benchmark(rnd):
+    print(f"{'text':>24} {'legacy':>12} {'matcher':>12} {'speedup':>8}")
+    for label, words, rate in [
+        ('description (8 words)', 8, 0.1),
+        ('receipt (300 words)', 300, 0.01),
+        ('PDF, 10 pages (5k words)', 5000, 0.002),
+    ]:
+        text = make_ocr_text(rnd, words, rate)
+        runs = 200 if words < 1000 else 20
+        legacy = min(timeit.repeat(lambda: legacy_extract_tags_from_text(text), number=runs, repeat=3)) / runs
+        current = min(timeit.repeat(lambda: extract_tags_from_text(text), number=runs, repeat=3)) / runs
+        print(f"{label:>24} {legacy * 1000:>10.3f}ms {current * 1000:>10.3f}ms {legacy / current:>7.1f}x")
+
+
+if __name__ == '__main__':
+    rnd = random.Random(1234)
+    mismatches = check_equivalence(rnd)
+    print(f"{'✓' if not mismatches else '✗'} Equivalence: {mismatches} mismatches\n")
+    benchmark(rnd)
+    sys.exit(1 if mismatches else 0)
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Query count regression check for the expense listing endpoints.
+Seeds users with few and many tagged expenses in a fresh SQLite database and
+fails if an endpoint issues more queries for a bigger page than for a small
+one, i.e. if serialization went back to lazy loading per row (N+1).
+
+Usage: python docs/test_query_counts.py  (exit code 1 on regression)
+"""
+import os
+import sys
+from datetime import datetime, timedelta
+
+os.environ.setdefault('DATABASE_URL', 'sqlite://')
+os.environ.setdefault('SECRET_KEY', 'query-count-check')
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import event
+from app import create_app, db, limiter
+from app.models import User, Category, Expense, Tag
+
+
+def seed_user(name, expense_count):
+    """A user with two categories, three tags and expense_count tagged expenses"""
+    user = User(username=name, email=f'{name}@example.com', password_hash='x')
+    db.session.add(user)
+    db.session.flush()
+
+    categories = [Category(name=f'Category {i}', user_id=user.id) for i in range(2)]
+    tags = [Tag(name=f'tag{i}', user_id=user.id) for i in range(3)]
+    db.session.add_all(categories + tags)
+    db.session.flush()
+
+    now = datetime.utcnow()
+    for i in range(expense_count):
+        expense = Expense(
+            amount=10 + i, description=f'Expense {i}', user_id=user.id,
+            category_id=categories[i % 2].id, date=now - timedelta(hours=i)
+        )
+        db.session.add(expense)
+        expense.add_tag(tags[i % 3])
+        if i % 2:
+            expense.add_tag(tags[(i + 1) % 3])
+    db.session.commit()
+    return user.id
+
+
+def count_queries(app, engine, user_id, url):
+    """Number of SQL statements executed while serving url for user_id"""
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(user_id)
+        session['_fresh'] = True
+        session['last_activity'] = datetime.utcnow().isoformat()
+
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, 'before_cursor_execute', record)
+    try:
+        response = client.get(url)
+    finally:
+        event.remove(engine, 'before_cursor_execute', record)
+    assert response.status_code == 200, f"{url} returned {response.status_code}"
+    return len(statements)
+
+
+def test_listing_query_counts():
+    app = create_app()
+    app.config['TESTING'] = True
+    app.config['RESPONSE_CACHE_ENABLED'] = False
+    limiter.enabled = False
+
+    with app.app_context():
+        few = seed_user('few', 3)
+        many = seed_user('many', 60)
+        engine = db.engine
+
+    # Requests run outside the seeding app context so each one gets its own
+    # (flask_login caches the current user per app context)
+
+    # (name, (user, url) of a small response, (user, url) of a large one)
+    cases = [
+        ('expenses: page', (many, '/api/expenses/?per_page=5'), (many, '/api/expenses/?per_page=50')),
+        ('expenses: cursor', (many, '/api/expenses/?cursor=&per_page=5'),
+         (many, '/api/expenses/?cursor=&per_page=50')),
+        ('dashboard: recent transactions', (many, '/api/recent-transactions?limit=5'),
+         (many, '/api/recent-transactions?limit=50')),
+        ('backup: export', (few, '/api/backup/export'), (many, '/api/backup/export')),
+    ]
+
+    failures = {}
+    for name, small, large in cases:
+        count_queries(app, engine, *small)  # warm up first-request lookups
+        small_count = count_queries(app, engine, *small)
+        large_count = count_queries(app, engine, *large)
+        status = 'FAIL' if large_count > small_count else 'ok'
+        print(f"[{status}] {name}: {small_count} queries small, {large_count} queries large")
+        if large_count > small_count:
+            failures[name] = (small_count, large_count)
+
+    assert not failures, f"Query count grows with the number of rows: {failures}"
+
+
+if __name__ == '__main__':
+    try:
+        test_listing_query_counts()
+    except AssertionError as e:
+        print(f"\n✗ {e}")
+        sys.exit(1)
+    print("\n✓ Listing endpoints use a constant number of queries")
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Query plan regression check for the hot dashboard/report queries.
+Runs EXPLAIN QUERY PLAN on each query against a fresh SQLite schema and
+fails if any of them falls back to a full table scan.
+
+Usage: python docs/test_query_plans.py  (exit code 1 on regression)
+"""
+import os
+import sys
+from datetime import datetime, timedelta
+
+os.environ.setdefault('DATABASE_URL', 'sqlite://')
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import func
+from app import create_app, db
+from app.models import (Expense, Income, Category, RecurringExpense, SpendingInsight,
+                        UserSession, NoSpendDay, DailySpendRollup)
+
+
+def explain(query):
+    """Return the EXPLAIN QUERY PLAN detail lines for an ORM query"""
+    compiled = query.statement.compile(dialect=db.engine.dialect)
+    params = tuple(compiled.params[name] for name in compiled.positiontup)
+    rows = db.session.connection().exec_driver_sql(
+        'EXPLAIN QUERY PLAN ' + str(compiled), params
+    ).fetchall()
+    return [row[-1] for row in rows]
+
+
+def full_scans(plan):
+    """Plan lines that walk a whole table (or a whole index) instead of searching it"""
+    return [line for line in plan if line.startswith('SCAN ') and 'CONSTANT ROW' not in line]
+
+
+def hot_queries():
+    """The per-user queries that run on every dashboard/report/scheduler pass"""
+    user_id = 1
+    now = datetime.utcnow()
+    month_start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    prev_month_start = month_start - timedelta(days=31)
+
+    return {
+        'dashboard: month expense total': db.session.query(func.sum(Expense.amount)).filter(
+            Expense.user_id == user_id,
+            Expense.date >= prev_month_start,
+            Expense.date < month_start
+        ),
+        'dashboard: month income total': db.session.query(func.sum(Income.amount)).filter(
+            Income.user_id == user_id,
+            Income.date >= prev_month_start,
+            Income.date < month_start
+        ),
+        'dashboard: rollup category totals': db.session.query(
+            DailySpendRollup.category_id,
+            func.sum(DailySpendRollup.total)
+        ).filter(
+            DailySpendRollup.user_id == user_id,
+            DailySpendRollup.day >= prev_month_start.date(),
+            DailySpendRollup.day < month_start.date()
+        ).group_by(DailySpendRollup.category_id),
+        'dashboard: category breakdown': db.session.query(
+            Category.id,
+            func.sum(Expense.amount),
+            func.count(Expense.id)
+        ).join(Expense).filter(
+            Expense.user_id == user_id,
+            Expense.date >= prev_month_start,
+            Expense.date < month_start
+        ).group_by(Category.id).order_by(Category.display_order, Category.created_at),
+        'dashboard: recent transactions': Expense.query.filter_by(user_id=user_id)
+            .order_by(Expense.date.desc()).limit(10),
+        'reports: category filtered expenses': Expense.query.filter(
+            Expense.user_id == user_id,
+            Expense.category_id == 1,
+            Expense.date >= prev_month_start,
+            Expense.date <= now
+        ),
+        'budget: category month spending': db.session.query(func.sum(Expense.amount)).filter(
+            Expense.category_id == 1,
+            Expense.date >= month_start
+        ),
+        'scheduler: due recurring expenses': RecurringExpense.query.filter(
+            RecurringExpense.is_active == True,
+            RecurringExpense.auto_create == True,
+            RecurringExpense.next_due_date <= now
+        ),
+        'scheduler: due recurring income': Income.query.filter(
+            Income.is_active == True,
+            Income.auto_create == True,
+            Income.frequency != 'once',
+            Income.next_due_date <= now
+        ),
+        'insights: recent insight of type': SpendingInsight.query.filter(
+            SpendingInsight.user_id == user_id,
+            SpendingInsight.insight_type == 'category_spike',
+            SpendingInsight.created_at > now - timedelta(days=7)
+        ),
+        'insights: undismissed list': SpendingInsight.query.filter(
+            SpendingInsight.user_id == user_id,
+            SpendingInsight.is_dismissed == False
+        ).order_by(SpendingInsight.created_at.desc()),
+        'settings: active sessions': UserSession.query.filter_by(
+            user_id=user_id,
+            is_active=True
+        ).order_by(UserSession.last_activity.desc()),
+        'sessions: cleanup expired': UserSession.query.filter(
+            UserSession.last_activity < now - timedelta(days=30)
+        ),
+        'challenges: no-spend calendar': NoSpendDay.query.filter(
+            NoSpendDay.user_id == user_id,
+            NoSpendDay.date >= month_start.date(),
+            NoSpendDay.date <= now.date()
+        ),
+    }
+
+
+def test_hot_queries_use_indexes():
+    app = create_app()
+
+    with app.app_context():
+        failures = {}
+        for name, query in hot_queries().items():
+            plan = explain(query)
+            scans = full_scans(plan)
+            status = 'FAIL' if scans else 'ok'
+            print(f"[{status}] {name}")
+            for line in plan:
+                print(f"    {line}")
+            if scans:
+                failures[name] = scans
+
+        assert not failures, f"Full table scans detected: {failures}"
+
+
+if __name__ == '__main__':
+    try:
+        test_hot_queries_use_indexes()
+    except AssertionError as e:
+        print(f"\n✗ {e}")
+        sys.exit(1)
+    print("\n✓ All hot queries use indexes")
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Rollup consistency check for the daily spend/income rollup tables.
+Writes expenses and income through the ORM against a fresh SQLite database
+(inserts with datetimes and with plain dates as CSV import assigns them,
+edits that move rows between days/categories, deletes) and fails if the
+incrementally maintained rollups differ from totals computed from raw rows.
+
+Usage: python docs/test_rollups.py  (exit code 1 on regression)
+"""
+import os
+import sys
+from datetime import datetime, date, timedelta
+
+os.environ.setdefault('DATABASE_URL', 'sqlite://')
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import func
+from app import create_app, db
+from app.models import User, Category, Expense, Income, DailySpendRollup, DailyIncomeRollup
+
+
+def raw_totals(model, key):
+    """{(user, group, day): (total, count)} computed from the raw rows"""
+    group_col = getattr(model, key)
+    day = func.date(model.date)
+    rows = db.session.query(
+        model.user_id, group_col, day, func.sum(model.amount), func.count(model.id)
+    ).group_by(model.user_id, group_col, day).all()
+    return {(user_id, group, str(day)): (round(total, 2), count) for user_id, group, day, total, count in rows}
+
+
+def rollup_totals(rollup, key):
+    """{(user, group, day): (total, count)} as stored in the rollup table"""
+    return {
+        (row.user_id, getattr(row, key), row.day.isoformat()): (round(row.total, 2), row.count)
+        for row in rollup.query.all()
+    }
+
+
+def check(name, failures):
+    """Compare both rollup tables against the raw rows after a write step"""
+    mismatches = {}
+    for model, rollup, key in ((Expense, DailySpendRollup, 'category_id'), (Income, DailyIncomeRollup, 'source')):
+        expected, stored = raw_totals(model, key), rollup_totals(rollup, key)
+        if expected != stored:
+            mismatches[rollup.__tablename__] = {'raw': expected, 'rollup': stored}
+    status = 'FAIL' if mismatches else 'ok'
+    print(f"[{status}] {name}")
+    if mismatches:
+        failures[name] = mismatches
+
+
+def test_rollups_match_raw_rows():
+    app = create_app()
+
+    with app.app_context():
+        user = User(username='rollups', email='rollups@example.com', password_hash='x')
+        db.session.add(user)
+        db.session.flush()
+        food, rent = Category(name='Food', user_id=user.id), Category(name='Rent', user_id=user.id)
+        db.session.add_all([food, rent])
+        db.session.commit()
+
+        failures = {}
+        now = datetime.utcnow().replace(hour=12)
+        yesterday = now - timedelta(days=1)
+
+        def add_expense(amount, when, category):
+            expense = Expense(amount=amount, description='Check', user_id=user.id,
+                              category_id=category.id, date=when)
+            db.session.add(expense)
+            return expense
+
+        try:
+            first = add_expense(10, now, food)
+            second = add_expense(5.5, now, food)
+            add_expense(20, yesterday, rent)
+            db.session.add(Income(amount=100, currency='USD', description='Pay', source='Salary',
+                                  user_id=user.id, date=now))
+            db.session.commit()
+            check('insert with datetimes', failures)
+
+            # CSV import assigns plain dates to Expense.date / Income.date
+            add_expense(7.25, date.today() - timedelta(days=3), rent)
+            db.session.add(Income(amount=40, currency='USD', description='Gift', source='Gift',
+                                  user_id=user.id, date=date.today() - timedelta(days=3)))
+            db.session.commit()
+            check('insert with plain dates', failures)
+
+            first.amount = 12
+            second.date = yesterday
+            second.category_id = rent.id
+            db.session.commit()
+            check('edit amount, day and category', failures)
+
+            db.session.delete(first)
+            db.session.commit()
+            check('delete', failures)
+        except Exception as e:
+            db.session.rollback()
+            print(f"[FAIL] write raised {type(e).__name__}: {e}")
+            failures['write'] = repr(e)
+
+        assert not failures, f"Rollups differ from raw rows: {failures}"
+
+
+if __name__ == '__main__':
+    try:
+        test_rollups_match_raw_rows()
+    except AssertionError as e:
+        print(f"\n✗ {e}")
+        sys.exit(1)
+    print("\n✓ Rollups match the raw rows")
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Typeahead consistency check for global search.
+Types queries character by character against a fresh SQLite database, with
+writes to every searched model in between (expenses, documents - including
+OCR text filled in later - categories, recurring expenses, tags), and fails
+if a typeahead response ever differs from /api/search/ for the same query,
+e.g. because cached candidates survived a write.
+
+Usage: python docs/test_typeahead.py  (exit code 1 on regression)
+"""
+import os
+import sys
+from datetime import datetime
+
+os.environ.setdefault('DATABASE_URL', 'sqlite://')
+os.environ.setdefault('SECRET_KEY', 'typeahead-check')
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import create_app, db, limiter
+from app.models import User, Category, Expense, Document, RecurringExpense, Tag
+
+
+def compare(client, query, failures):
+    """Typeahead and global search results for query; records a failure if they differ"""
+    typeahead = client.get('/api/search/typeahead', query_string={'q': query}).get_json()
+    search = client.get('/api/search/', query_string={'q': query}).get_json()
+    same = typeahead['results'] == search['results']
+    print(f"[{'ok' if same else 'FAIL'}] {query!r} (cached candidates: {typeahead['cached']})")
+    if not same:
+        failures[query] = {'typeahead': typeahead['results'], 'search': search['results']}
+
+
+def test_typeahead_matches_search_after_writes():
+    app = create_app()
+    app.config['TESTING'] = True
+    app.config['RESPONSE_CACHE_ENABLED'] = False
+    limiter.enabled = False
+
+    with app.app_context():
+        user = User(username='typeahead', email='typeahead@example.com', password_hash='x')
+        db.session.add(user)
+        db.session.flush()
+        user_id = user.id
+        category = Category(name='Office', user_id=user_id)
+        db.session.add(category)
+        db.session.commit()
+        category_id = category.id
+
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(user_id)
+        session['_fresh'] = True
+        session['last_activity'] = datetime.utcnow().isoformat()
+
+    # (query typed before the write, write, longer query typed after it)
+    def add_tag():
+        db.session.add(Tag(name='invoice', user_id=user_id))
+
+    def add_document():
+        db.session.add(Document(
+            filename='invoice_march.pdf', original_filename='invoice_march.pdf',
+            file_path='/tmp/invoice_march.pdf', file_size=1, file_type='pdf',
+            mime_type='application/pdf', user_id=user_id
+        ))
+
+    def fill_ocr_text():
+        document = Document.query.filter_by(user_id=user_id).first()
+        document.ocr_text = 'Receipt for printer paper'
+
+    def add_expense():
+        db.session.add(Expense(amount=12, description='Printer ink', user_id=user_id,
+                               category_id=category_id, date=datetime.utcnow()))
+
+    def add_recurring():
+        db.session.add(RecurringExpense(name='Printer lease', amount=30, currency='USD',
+                                        frequency='monthly', category_id=category_id,
+                                        user_id=user_id, next_due_date=datetime.utcnow()))
+
+    def tag_expense():
+        expense = Expense.query.filter_by(user_id=user_id).first()
+        expense.add_tag(Tag.query.filter_by(user_id=user_id).first())
+
+    steps = [
+        ('in', add_tag, 'inv'),
+        ('inv', add_document, 'invo'),
+        ('rec', fill_ocr_text, 'rece'),
+        ('pr', add_expense, 'pri'),
+        ('pri', add_recurring, 'prin'),
+        ('prin', tag_expense, 'print'),
+    ]
+
+    failures = {}
+    for before, write, after in steps:
+        compare(client, before, failures)
+        with app.app_context():
+            write()
+            db.session.commit()
+        compare(client, after, failures)
+
+    assert not failures, f"Typeahead differs from global search: {failures}"
+
+
+if __name__ == '__main__':
+    try:
+        test_typeahead_matches_search_after_writes()
+    except AssertionError as e:
+        print(f"\n✗ {e}")
+        sys.exit(1)
+    print("\n✓ Typeahead matches global search after writes")
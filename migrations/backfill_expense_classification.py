@@ -0,0 +1,25 @@
+"""
+Re-evaluate the description-derived expense columns (want/need, small
+purchase type, subscription service, money-leak key)
+Run after editing the keyword dictionaries, or to repair rows written by bulk SQL
+Run with: python migrations/backfill_expense_classification.py [user_id]
+"""
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app, expense_classifier
+
+
+def migrate(user_id=None):
+    app = create_app()
+    with app.app_context():
+        updated = expense_classifier.backfill(user_id)
+
+        scope = f"user {user_id}" if user_id is not None else "all users"
+        print(f"✓ Expense classification current for {scope} (rules {expense_classifier.rules_version()})")
+        print(f"  expenses reclassified: {updated}")
+
+
+if __name__ == '__main__':
+    migrate(int(sys.argv[1]) if len(sys.argv) > 1 else None)
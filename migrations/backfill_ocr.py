@@ -1,6 +1,7 @@
 """
 Backfill OCR text for existing documents and receipts
 This will process all uploaded files that don't have OCR text yet
+Files identical to one OCRed before are served from the OCR result cache
 """
 import sys
 import os
@@ -0,0 +1,25 @@
+"""
+Rebuild the recurring/subscription pattern index from raw expense rows
+Run after bulk SQL edits that bypass the ORM, or to repair a drifted index
+Run with: python migrations/rebuild_expense_patterns.py [user_id]
+"""
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app, patterns
+from app.models import ExpensePattern
+
+
+def migrate(user_id=None):
+    app = create_app()
+    with app.app_context():
+        patterns.rebuild(user_id)
+
+        scope = f"user {user_id}" if user_id is not None else "all users"
+        print(f"✓ Expense pattern index rebuilt for {scope}")
+        print(f"  expense_patterns rows: {ExpensePattern.query.count()}")
+
+
+if __name__ == '__main__':
+    migrate(int(sys.argv[1]) if len(sys.argv) > 1 else None)
@@ -0,0 +1,26 @@
+"""
+Rebuild the daily spend/income rollup tables from raw expense/income rows
+Run after bulk SQL edits that bypass the ORM, or to repair drifted totals
+Run with: python migrations/rebuild_rollups.py [user_id]
+"""
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app, rollups
+from app.models import DailySpendRollup, DailyIncomeRollup
+
+
+def migrate(user_id=None):
+    app = create_app()
+    with app.app_context():
+        rollups.rebuild(user_id)
+
+        scope = f"user {user_id}" if user_id is not None else "all users"
+        print(f"✓ Rollups rebuilt for {scope}")
+        print(f"  daily_spend_rollup rows: {DailySpendRollup.query.count()}")
+        print(f"  daily_income_rollup rows: {DailyIncomeRollup.query.count()}")
+
+
+if __name__ == '__main__':
+    migrate(int(sys.argv[1]) if len(sys.argv) > 1 else None)
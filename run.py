@@ -1,6 +1,10 @@
 from app import create_app
 import os
 
+if __name__ == '__main__':
+    # The development server is a single process: run scheduled jobs in it
+    os.environ.setdefault('RUN_SCHEDULER', 'true')
+
 app = create_app()
 
 if __name__ == '__main__':